@@ -21,14 +21,38 @@ __maintainer__ = "Richard Leir"
 __email__ = "rleir at leirtech ddot com"
 __status__ = "Production"
 
-from xlrd import open_workbook  # type: ignore
 # from typing import Dict, List
 import os
-import geopy    # pip install geopy
-import geopy.geocoders
-from geopy.geocoders import GoogleV3
-import json
-from geojsonfile import write_geojson_file
+import argparse
+import cProfile
+from geopy.geocoders import GoogleV3    # pip install geopy
+from geojsonfile import write_all_outputs
+from locationstore import open_location_store
+from addressnorm import AddressIndex
+from records import LocRecord
+from aggregate import count_rows
+from incremental import RunState, row_blocks
+from watch import Watcher, default_interval
+from gazetteer import Gazetteer
+from failcache import FailureCache, default_failuresFileName
+from failcache import default_reportFileName
+from quota import GeocodeQuota, order_pending, default_quotaFileName
+from metrics import Metrics, NULL_METRICS
+from precompress import precompress, report, remove_stale
+from precompress import brotli_available
+from geotiles import write_tiles, default_minzoom, default_maxzoom
+import clusters
+from colocate import consolidate
+from binexport import write_binary_file
+from geocoding import geocode_all, GeocodeQueue, default_workers
+from geocoding import default_rate
+from geocoding import default_timeout, default_retries
+from sheetcolumns import column_values, join_addresses, join_org_names
+from sheetcolumns import zip_coords, find_header, row_chunks
+from sheetcolumns import default_chunk_rows
+from sheetreader import open_reader, READERS
+from sheetcolumns import INST_DEPT_LABEL, INST_NAME_LABEL  # noqa: F401
+from sheetcolumns import default_header_search_rows
 
 # input xlsx spreadsheet
 default_inputfilename = "input.xlsx"
@@ -36,6 +60,12 @@ default_inputfilename = "input.xlsx"
 # Input and Output locations file
 default_locFileName = 'locations.json'
 
+# Input gazetteer of well known places, optional
+default_gazetteerFileName = 'gazetteer.csv'
+
+# Saved state for incremental runs
+default_stateFileName = 'addLatLong.state.json'
+
 # Output locations-with-counts file
 default_locCountsFilename = 'locationsCounts.json'
 default_locCountsGeoJSON = 'acquisitions.geojson'
@@ -44,15 +74,95 @@ default_locCountsGeoJSON = 'acquisitions.geojson'
 default_locInstFilename = 'locationsInstitutions.json'
 default_locInstGeoJSON = 'acquisitionsInst.geojson'
 
-INST_DEPT_LABEL = "Inst Dept"
-INST_NAME_LABEL = "Inst Name"
 warn_blank_cells = False
 
+# Decimals kept in compact GeoJSON, 5 is about a metre
+default_coord_precision = 5
+
+# During development we limit the number of google searches per run
+default_geocode_limit = 10
+
+# rows counted at a time with --pipeline, each chunk's lookups start after it
+default_pipeline_chunk_rows = 500
+
 
 class AcqInfo:
 
     all_data = None  # type: Dict
     coords_found_in_xlsx = None
+    location_store = None
+    # spelling variants of an address share one record
+    normalise_addresses = True
+    address_index = None
+    # also write the locations DB in the locations.json format
+    locExportFileName = None
+    header_search_rows = default_header_search_rows
+    # the class of the all_data records, see records.record_class
+    record_class = LocRecord
+    # the workbook reader, see sheetreader.open_reader
+    reader = "auto"
+    chunk_rows = default_chunk_rows
+
+    # incremental runs, see incremental.py
+    run_state = None
+    skipped = False
+    locations_found = 0
+
+    # decimals kept in compact GeoJSON, None for the full GeoJSON
+    coord_precision = None
+    # also write .gz and .br copies of the GeoJSON files
+    precompress_outputs = False
+
+    # also write tiled GeoJSON under this directory, see geotiles.py
+    tilesDir = None
+    tile_minzoom = default_minzoom
+    tile_maxzoom = default_maxzoom
+
+    # also write clustered GeoJSON for each zoom, see clusters.py
+    clustersDir = None
+    cluster_minzoom = clusters.default_minzoom
+    cluster_maxzoom = clusters.default_maxzoom
+    cluster_radius = clusters.default_radius
+
+    # also write the places as a binary file, see binexport.py
+    binFileName = None
+
+    # merge the addresses geocoded within this many metres of each
+    #   other in the outputs, see colocate.py
+    merge_distance = None
+
+    # timers and counters for the run, see metrics.py
+    metrics = NULL_METRICS
+
+    # well known places are looked up here before asking Google
+    gazetteerFileName = default_gazetteerFileName
+    gazetteer = None
+
+    # the addresses which failed to geocode, see failcache.py; None to
+    #   try every address on every run
+    failuresFileName = None
+    failures = None
+    # look them all up again, still recording how they do
+    retry_failures = False
+    # the quarantined addresses are listed here
+    quarantineFileName = default_reportFileName
+
+    # geocoder settings, the geocoder defaults to GoogleV3
+    geocoder = None
+    geocode_limit = default_geocode_limit
+    # the lookups of a day, over all runs, None for no limit
+    geocode_daily_limit = None
+    # lookups made today and how long each address has waited, see quota.py
+    quotaFileName = None
+    quota = None
+    geocode_workers = default_workers
+    geocode_rate = default_rate
+    geocode_timeout = default_timeout
+    geocode_retries = default_retries
+    # look the new addresses up while the spreadsheet is still being read
+    pipeline_geocodes = False
+    pipeline_chunk_rows = default_pipeline_chunk_rows
+    geocode_queue = None
 
     def __init__(self,
                  locFileName,
@@ -67,161 +177,213 @@ class AcqInfo:
         self.locInstGeoJSON = locInstGeoJSON
 
     def scan_spreadsheet(self, xlsx_filename):
-        # read xls, find sheets
-        wb = open_workbook(xlsx_filename)
-        for sheet in wb.sheets():
-            addrCols   = None
-            orgCols    = None
-            coordsCols = None
-            for row in range(sheet.nrows):
-                # the header row might not be the first one, so
-                # try to get get the header row until we find it
-                if addrCols is None:
-                    addrCols = self.get_address_columns(sheet, row)
-                    orgCols = self.get_org_columns(sheet, row)
-                    coordsCols = self.get_coords_columns(sheet, row)
-                    if coordsCols is not None:
-                        self.coords_found_in_xlsx = True
-                else:
-                    if self.all_data is None:
-                        if self.coords_found_in_xlsx is not None:
-                            self.all_data = {}
-                        else:
-                            # read existing locations DB
-                            with open(self.locFileName) as json_file:
-                                self.all_data = json.load(json_file)
-
-                                # init the reference counting
-                                for addr in self.all_data:
-                                    self.all_data[addr]["magnitude"] = 0
-
-                    addr = self.get_row_address(sheet, row, addrCols)
-                    if not(addr == ""):
-                        self.save_row_address(addr)
-                        # add the Institution names
-                        if orgCols is not None:
-                            orgName = self.get_inst_names(sheet, row, orgCols)
-                            self.add_inst_names(addr, orgName)
-                    if coordsCols is not None:
-                        coords = self.get_row_coords(sheet, row, coordsCols)
-                        self.save_row_coords(addr, coords)
+        # before any lookups are paid for
+        self.check_output_settings()
+        state = self.run_state
+        if (state is not None and
+                state.unchanged(xlsx_filename, self.locFileName,
+                                self.output_settings()) and
+                self.outputs_exist()):
+            print("no change since the last run, outputs not rewritten")
+            self.skipped = True
+            return
+
+        with self.metrics.phase("read"):
+            coordsCols = self.read_spreadsheet(xlsx_filename)
 
         # get any latlong info
         if coordsCols is None:
-            self.get_info()
-
-        # write augmented data including insti names to a file
-        self.write_loc_inst_file()
-
-        # remove insti name information
-        self.remove_inst_element()
+            with self.metrics.phase("geocode"):
+                self.get_info()
+        elif self.geocode_queue is not None:
+            # an earlier sheet had addresses, save what was looked up
+            self.finish_geocode_queue()
+            self.save_failures()
+            self.open_quota().save()
+
+        if state is not None:
+            print("{0} row blocks scanned, {1} reused from the last run"
+                  .format(state.blocks_scanned, state.blocks_reused))
+            if (not state.changed() and self.locations_found == 0 and
+                    self.outputs_exist()):
+                print("counts unchanged, outputs not rewritten")
+                return
 
-        # write basic location count data to a file
-        self.write_loc_counts_file()
+        # write location count data, with and without insti names
+        self.write_outputs()
 
-    def get_address_columns(self, sheet, row):
-        ''' determine which spreadsheet columns contain address info '''
-        locaCol    = None
-        cityCol    = None
-        provCol    = None
-        countryCol = None
-        addrCols   = None
+    def read_spreadsheet(self, xlsx_filename):
+        ''' count the addresses and org names in all the sheets
 
-        for col in range(sheet.ncols):
-            hdr = sheet.cell(row, col).value
-            try:
-                if "Location" == hdr:
-                    locaCol = col
-                elif hdr.startswith("City"):
-                    cityCol = col
-                elif "Prov./state" == hdr:
-                    provCol = col
-                elif "Province" == hdr:
-                    provCol = col
-                elif "Country" == hdr:
-                    countryCol = col
-            except AttributeError:
-                print("looking for a col header, but cell value is ", hdr)
-
-            if warn_blank_cells:
-                if cityCol is None:
-                    print(" cityCol not found")
-                if provCol is None:
-                    print(" provCol not found")
-                if countryCol is None:
-                    print(" countryCol not found")
-
-            if cityCol is None and provCol is None and countryCol is None:
-                if warn_blank_cells:
-                    print(" no addr cols found")
-            else:
-                addrCols = (locaCol, cityCol,  provCol,  countryCol)
-        return addrCols
-
-    def get_org_columns(self, sheet, row):
-        ''' determine which spreadsheet cols contain organization name info '''
-        deptCol = None
-        nameCol = None
-        orgCols = None
-
-        for col in range(sheet.ncols):
-            hdr = sheet.cell(row, col).value
-            if INST_DEPT_LABEL == hdr:
-                deptCol = col
-            elif INST_NAME_LABEL == hdr:
-                nameCol = col
-
-            if warn_blank_cells:
-                if deptCol is None:
-                    print(" org dept Col not found")
-                if nameCol is None:
-                    print(" org name Col not found")
-
-            if deptCol is None and nameCol is None:
-                if warn_blank_cells:
-                    print(" no org cols found")
-            else:
-                orgCols = (deptCol, nameCol)
-        return orgCols
+        The input can be a workbook, a csv or a parquet file.
+        Returns the coords columns of the last sheet, if it had them.
+        '''
+        state = self.run_state
+        if state is not None and state.input_unchanged():
+            # the counts of the whole file were saved by the last run
+            return self.reuse_sheets(state.last_sheets())
 
-    def get_coords_columns(self, sheet, row):
-        ''' determine which spreadsheet cols contain lat lon info '''
-        latCol     = None
-        lonCol     = None
+        # read xls, find sheets
         coordsCols = None
+        reader = open_reader(xlsx_filename, self.reader)
+        for sheet in reader.sheets():
+            coordsCols = None
+            if state is not None:
+                last_sheet = state.last_sheet(sheet.name, sheet.fingerprint)
+                if last_sheet is not None:
+                    coordsCols = self.reuse_sheets([last_sheet])
+                    continue
+            rows = sheet.iter_rows()
+            # the header row might not be the first one, so
+            # look through the top rows until we find it
+            header = find_header(rows, self.header_search_rows)
+            if header is None:
+                if warn_blank_cells:
+                    print(" no header found in sheet ", sheet.name)
+                if state is not None:
+                    state.start_sheet(sheet.name, None, sheet.fingerprint)
+                continue
 
-        for col in range(sheet.ncols):
-            hdr = sheet.cell(row, col).value
-            if "Latitude" == hdr:
-                latCol = col
-            elif "Longitude" == hdr:
-                lonCol = col
-
-        if latCol is None or lonCol is None:
-            if warn_blank_cells:
-                print(" no coords cols found")
-        else:
-            coordsCols = (latCol, lonCol)
+            (row, addrCols, orgCols, coordsCols) = header
+            if coordsCols is not None:
+                self.coords_found_in_xlsx = True
+            hdrCols = (addrCols, orgCols, coordsCols)
+            if state is None:
+                for chunk in row_chunks(rows, self.scan_chunk_rows()):
+                    self.scan_rows(chunk, *hdrCols)
+            else:
+                self.scan_blocks(sheet.name, row, hdrCols, rows,
+                                 sheet.fingerprint)
+        reader.close()
         return coordsCols
 
-    def get_row_address(self, sheet, row, addrCols):
-        ''' get address info from a spreadsheet row '''
-        addr = ""
+    def reuse_sheets(self, last_sheets):
+        ''' count sheets from the counts the last run saved for them
 
-        try:
-            for col in range(sheet.ncols):
-                if col in addrCols:
-                    cellval = sheet.cell(row, col).value
-                    addr += cellval
-                    addr += ' '
-        except TypeError:
-            print("looking for an address string, but cell value is ", cellval)
+        Returns the coords columns of the last sheet, if it had them.
+        '''
+        coordsCols = None
+        for last_sheet in last_sheets:
+            (header, partials) = self.run_state.reuse_sheet(last_sheet)
+            coordsCols = None if header is None else header[3]
+            if coordsCols is not None:
+                self.coords_found_in_xlsx = True
+            for partial in partials:
+                self.metrics.count("row blocks reused")
+                self.merge_partial(partial)
+        return coordsCols
 
-        addr = addr.rstrip()  # remove the last space
-        addr = addr.lstrip()  # remove any leading spaces
-        return addr
+    def scan_chunk_rows(self):
+        ''' the rows counted at a time
+
+        When pipelining, the new addresses of a chunk are queued once it
+        is counted, so the chunks are kept small.
+        '''
+        if self.pipeline_geocodes:
+            return min(self.chunk_rows, self.pipeline_chunk_rows)
+        return self.chunk_rows
+
+    def scan_blocks(self, name, row, hdrCols, rows, fingerprint=None):
+        ''' count the blocks of rows which changed since the last run '''
+        state = self.run_state
+        sheet_key = state.start_sheet(name, (row,) + hdrCols, fingerprint)
+        for (digest, chunk) in row_blocks(sheet_key, rows,
+                                          self.scan_chunk_rows()):
+            partial = state.cached_block(digest)
+            reused = partial is not None
+            if reused:
+                self.metrics.count("row blocks reused")
+            else:
+                partial = self.count_chunk(chunk, *hdrCols)
+            state.add_block(digest, partial, reused)
+            self.merge_partial(partial)
 
-    def save_row_address(self, addr):
+    def scan_rows(self, chunk, addrCols, orgCols, coordsCols):
+        ''' get a chunk of data rows below the header, a column at a time '''
+        if len(chunk) <= 0:
+            return
+        self.merge_partial(self.count_chunk(chunk,
+                                            addrCols, orgCols, coordsCols))
+
+    def count_chunk(self, chunk, addrCols, orgCols, coordsCols):
+        ''' the partial counts (see aggregate.py) of a chunk of rows '''
+        nrows = len(chunk)
+        self.metrics.count("rows scanned", nrows)
+
+        addrColumns = [column_values(chunk, col)
+                       for col in sorted(c for c in addrCols if c is not None)]
+        addrs = join_addresses(addrColumns, nrows)
+
+        orgNames = None
+        if orgCols is not None:
+            (deptCol, nameCol) = orgCols
+            deptFirst = (nameCol is None or
+                         (deptCol is not None and deptCol < nameCol))
+            orgNames = join_org_names(column_values(chunk, deptCol),
+                                      column_values(chunk, nameCol),
+                                      deptFirst, nrows)
+
+        coords = None
+        if coordsCols is not None:
+            (latCol, lonCol) = coordsCols
+            coords = zip_coords(column_values(chunk, latCol),
+                                column_values(chunk, lonCol),
+                                nrows)
+
+        return count_rows(addrs, orgNames, coords)
+
+    def merge_partial(self, partial):
+        ''' add the counts of some rows (see aggregate.py) to all_data '''
+        self.init_all_data()
+        index = self.address_index
+        for (addr, (count, orgs, coords)) in partial.items():
+            if index is not None:
+                # count spelling variants under one record
+                addr = index.resolve(addr)
+            self.save_row_address(addr, count)
+            # add the Institution names
+            if orgs is not None:
+                for (orgName, orgCount) in orgs.items():
+                    self.add_inst_names(addr, orgName, orgCount)
+            if coords is not None:
+                self.save_row_coords(addr, coords)
+
+    def init_all_data(self):
+        ''' start the records, from the locations DB unless xlsx has coords '''
+        if self.all_data is not None:
+            return
+        if self.coords_found_in_xlsx is not None:
+            self.all_data = {}
+        elif not self.open_location_store().preload:
+            # addresses are looked up in the locations DB as they are found
+            self.all_data = {}
+        else:
+            # read existing locations DB
+            self.all_data = {addr: self.record_class.from_dict(geo_loc)
+                             for (addr, geo_loc)
+                             in self.location_store.load_all().items()}
+
+            # init the reference counting
+            for addr in self.all_data:
+                self.all_data[addr]["magnitude"] = 0
+
+        if self.normalise_addresses:
+            store = self.location_store
+            stored = None
+            if (self.coords_found_in_xlsx is None and store is not None and
+                    not store.preload):
+                # a variant of a stored address resolves to its record
+                stored = store.find_variant
+            self.address_index = AddressIndex(stored)
+            for addr in self.all_data:
+                self.address_index.add(addr)
+
+    def open_location_store(self):
+        if self.location_store is None:
+            self.location_store = open_location_store(self.locFileName)
+        return self.location_store
+
+    def save_row_address(self, addr, count=1):
         '''make sure we have a record for addr and count references to it'''
 
         if addr == "":
@@ -233,50 +395,29 @@ class AcqInfo:
 
         if addr in self.all_data.keys():
             try:
-                self.all_data[addr]["magnitude"] += 1
+                self.all_data[addr]["magnitude"] += count
             except (Exception,  KeyError) as err:
                 print("missing addr entry: {0}".format(err))
                 print(addr)
 
         else:
-            geo_loc = {}
-            geo_loc["magnitude"] = 1
-            geo_loc["org names"] = []
+            geo_loc = self.record_class()
+            geo_loc["magnitude"] = count
+            if (self.coords_found_in_xlsx is None and
+                    self.location_store is not None and
+                    not self.location_store.preload):
+                known = self.location_store.get(addr)
+                if known is not None:
+                    geo_loc.update(known)
             self.all_data[addr] = geo_loc
 
-    def get_inst_names(self, sheet, row, orgCols):
-        ''' get address info from a spreadsheet row '''
-        orgName = ""
-        orgInst = ""
-        orgDept = ""
-
-        for col in range(sheet.ncols):
-            if col in orgCols:
-                if col is orgCols[0]:
-                    orgDept = sheet.cell(row, col).value
-                    if orgDept != "":
-                        orgName += orgDept
-                        orgName += ', '
-                elif col is orgCols[1]:
-                    orgInst = sheet.cell(row, col).value
-                    if orgInst != "":
-                        orgName += orgInst
-        return orgName
-
-    def get_row_coords(self, sheet, row, coordsCols):
-        ''' get coords info from a spreadsheet row '''
-        (latCol, lonCol) = coordsCols
-        latVal = None
-        lonVal = None
-
-        for col in range(sheet.ncols):
-            if col == latCol:
-                latVal = sheet.cell(row, col).value
-            elif col == lonCol:
-                lonVal = sheet.cell(row, col).value
-        return (latVal, lonVal)
-
-    def add_inst_names(self, addr,  orgName):
+        if self.pipeline_geocodes:
+            geo_loc = self.all_data[addr]
+            # the first rows with an address not located yet
+            if geo_loc["magnitude"] == count and "latitude" not in geo_loc:
+                self.queue_lookup(addr)
+
+    def add_inst_names(self, addr,  orgName, count=1):
         # Do not show anything starting with 'Estate ',
         #   for privacy: it will be followed by a person's name
         if orgName.startswith("Estate "):
@@ -292,17 +433,7 @@ class AcqInfo:
             if addr != "":
                 print("===addr not found " + addr)
         else:
-            if "org names" not in self.all_data[addr].keys():
-                self.all_data[addr]["org names"] = {orgName: 1}
-            else:
-                if orgName in self.all_data[addr]["org names"]:
-                    self.all_data[addr]["org names"][orgName] += 1
-                else:
-                    try:
-                        self.all_data[addr]["org names"][orgName] = 1
-                    except (Exception,  TypeError) as err:
-                        print("missing orgname entry: {0}".format(err))
-                        print(addr)
+            self.all_data[addr].add_org_name(orgName, count)
 
     def save_row_coords(self, addr, coords):
         (latVal, lonVal) = coords
@@ -313,18 +444,257 @@ class AcqInfo:
         else:
             # In this case, coords do not come from the locations db,
             #   they come from the xlsx row.
-            geo_loc = {}
-            geo_loc["magnitude"] = 1
+            geo_loc = self.all_data[addr]
             geo_loc["address"] = addr
             geo_loc["latitude"]  = latVal
             geo_loc["longitude"] = lonVal
-            self.all_data[addr] = geo_loc
 
     def get_info(self) -> None:
         ''' Google lat lon position for each address '''
 
-        g = None
-        gcount = 0
+        if self.address_index is not None:
+            print("{0} geocoder calls saved by address normalisation"
+                  .format(self.address_index.calls_saved))
+
+        pending = self.pending_addresses()
+        metrics = self.metrics
+        if metrics.enabled:
+            metrics.set("unique addresses", len(self.all_data))
+            metrics.set("locations DB hits",
+                        sum(1 for geo_loc in self.all_data.values()
+                            if "latitude" in geo_loc))
+            metrics.set("locations DB misses", len(pending))
+            if self.address_index is not None:
+                metrics.set("calls saved by normalisation",
+                            self.address_index.calls_saved)
+
+        limit = self.geocode_limit
+        if self.geocode_queue is not None:
+            queued = self.finish_geocode_queue()
+            if limit is not None:
+                limit = max(0, limit - len(queued))
+            # the queued addresses which failed are not tried twice
+            tried = {result.addr for result in queued}
+            pending = [addr for addr in self.pending_addresses()
+                       if addr not in tried]
+
+        pending = self.resolve_offline(pending)
+        quota = self.open_quota()
+        quota.note_waiting(pending, self.all_data)
+        pending = self.schedule_lookups(self.skip_failures(pending), limit)
+        if pending:
+            for addr in pending:
+                print(addr)
+            results = geocode_all(self.open_geocoder(), pending,
+                                  workers=self.geocode_workers,
+                                  rate=self.geocode_rate,
+                                  timeout=self.geocode_timeout,
+                                  retries=self.geocode_retries,
+                                  on_results=self.save_locations)
+            self.merge_geocodes(results)
+
+        self.save_failures()
+        quota.save()
+
+    def open_geocoder(self):
+        if self.geocoder is None:
+            API_KEY = os.getenv("GOOGLEAPI")
+            self.geocoder = GoogleV3(api_key=API_KEY)
+        return self.geocoder
+
+    def open_quota(self):
+        if self.quota is None:
+            self.quota = GeocodeQuota(self.quotaFileName,
+                                      self.geocode_daily_limit)
+        return self.quota
+
+    def queue_lookup(self, addr):
+        ''' start looking up a new address while the spreadsheet is read
+
+        The addresses in the gazetteer, and the failures which are not
+        due again, are left for get_info. So is every address when the
+        lookups are limited, so that the most used are looked up first.
+        '''
+        if self.coords_found_in_xlsx is not None:
+            return
+        if self.geocode_queue is None:
+            if self.open_quota().budget(self.geocode_limit) is not None:
+                print("lookups are limited, so they wait for the whole"
+                      " spreadsheet to be read (--limit 0 to pipeline)")
+                self.pipeline_geocodes = False
+                return
+            self.geocode_queue = GeocodeQueue(
+                self.open_geocoder(),
+                workers=self.geocode_workers,
+                rate=self.geocode_rate,
+                timeout=self.geocode_timeout,
+                retries=self.geocode_retries)
+        if self.open_gazetteer() is not None:
+            if self.gazetteer.resolve(addr) is not None:
+                return
+        failures = self.open_failures()
+        if (failures is not None and not self.retry_failures and
+                not failures.due(addr)):
+            return
+        self.geocode_queue.put(addr)
+
+    def finish_geocode_queue(self):
+        ''' merge the lookups queued during the scan, and return them '''
+        results = self.geocode_queue.finish()
+        self.geocode_queue = None
+        print("{0} addresses looked up while the spreadsheet was read"
+              .format(len(results)))
+        self.save_locations(results)
+        self.merge_geocodes(results)
+        return results
+
+    def merge_geocodes(self, results):
+        ''' the located addresses into all_data, the failures noted '''
+        metrics = self.metrics
+        # merge in the order the addresses were found
+        for result in results:
+            addr = result.addr
+            location = result.location
+            metrics.count("geocoder calls", result.attempts)
+            self.quota.use(result.attempts)
+            metrics.count("geocoder retries", result.attempts - 1)
+            metrics.observe("geocoder seconds", result.seconds)
+            if location is None:
+                metrics.count("geocoder failures")
+                if result.error is not None:
+                    print("geopy error: {0}".format(result.error))
+                print('... Failed to get a location for {0}'.format(addr))
+                if self.failures is not None:
+                    self.failures.record(addr, result.error)
+                continue
+
+            if self.failures is not None:
+                self.failures.forget(addr)
+            self.quota.located(addr)
+            self.locations_found += 1
+            geo_loc = self.all_data[addr]
+            geo_loc["latitude"]  = location.latitude
+            geo_loc["longitude"] = location.longitude
+            # geo_loc["id"]    = location.place_id
+            geo_loc["address"] = location.address
+
+    def schedule_lookups(self, pending, limit):
+        ''' the addresses to look up this run, the most used first
+
+        At most limit, and no more than is left of the daily limit.
+        '''
+        if not pending:
+            return pending
+        quota = self.quota
+        pending = order_pending(pending, self.all_data, quota.waiting)
+        budget = quota.budget(limit)
+        if budget is not None:
+            if quota.remaining_today() == 0:
+                print("the daily limit of {0} lookups is used up"
+                      .format(quota.daily_limit))
+            pending_count = len(pending)
+            pending = pending[:budget]
+            projection = quota.projection(pending_count - len(pending),
+                                          self.geocode_limit)
+            self.metrics.set("addresses left", projection["remaining"])
+            if projection["remaining"]:
+                days = ""
+                if projection["days"]:
+                    days = ", {0} days".format(projection["days"])
+                print("{0} addresses left after this run, {1} more runs{2}"
+                      .format(projection["remaining"], projection["runs"],
+                              days))
+        return pending
+
+    def skip_failures(self, pending):
+        ''' leave out the addresses which failed before, until they are due
+
+        Returns the addresses which may be looked up this run.
+        '''
+        if not pending or self.open_failures() is None:
+            return pending
+        if self.retry_failures:
+            return pending
+        eligible = self.failures.eligible(pending)
+        skipped = len(pending) - len(eligible)
+        self.metrics.count("failed addresses skipped", skipped)
+        if skipped:
+            print("{0} addresses which failed before are not tried this run"
+                  .format(skipped))
+        return eligible
+
+    def open_failures(self):
+        if self.failures is None and self.failuresFileName is not None:
+            self.failures = FailureCache(self.failuresFileName)
+        return self.failures
+
+    def save_failures(self):
+        ''' keep the failures for the next run, and report the quarantined '''
+        if self.failures is None:
+            return
+        self.failures.save()
+        if self.quarantineFileName is None:
+            return
+        count = self.failures.write_report(self.quarantineFileName,
+                                           self.all_data)
+        if count:
+            print("{0} addresses quarantined, see {1}".format(
+                count, self.quarantineFileName))
+
+    def open_gazetteer(self):
+        ''' the gazetteer, or None if there is no gazetteer file '''
+        if self.gazetteer is None:
+            if self.gazetteerFileName is None:
+                return None
+            if not os.path.exists(self.gazetteerFileName):
+                return None
+            self.gazetteer = Gazetteer(self.gazetteerFileName)
+            print("gazetteer loaded in {0:.3f}s{1}".format(
+                self.gazetteer.load_seconds,
+                " from snapshot" if self.gazetteer.from_snapshot else ""))
+        return self.gazetteer
+
+    def resolve_offline(self, pending):
+        ''' answer the well known places from the gazetteer, if we have one
+
+        Returns the addresses which still need Google.
+        '''
+        if not pending or self.open_gazetteer() is None:
+            return pending
+
+        unresolved = []
+        records = []
+        for addr in pending:
+            place = self.gazetteer.resolve(addr)
+            if place is None:
+                unresolved.append(addr)
+            else:
+                self.all_data[addr].update(place)
+                records.append((addr, place))
+                self.locations_found += 1
+        self.metrics.count("gazetteer hits", len(records))
+        if self.location_store is not None:
+            self.location_store.put_many(records)
+        print("{0} addresses found in the gazetteer".format(len(records)))
+        return unresolved
+
+    def save_locations(self, results):
+        ''' commit a batch of successful geocodes to the locations DB '''
+        if self.location_store is None:
+            return
+        records = []
+        for result in results:
+            location = result.location
+            if location is not None:
+                records.append((result.addr,
+                                {"latitude": location.latitude,
+                                 "longitude": location.longitude,
+                                 "address": location.address}))
+        self.location_store.put_many(records)
+
+    def pending_addresses(self):
+        ''' addresses which do not have location data yet '''
+        pending = []
         for addr in self.all_data:
             if addr.startswith("various"):
                 continue
@@ -332,71 +702,130 @@ class AcqInfo:
                 continue
 
             # if we already have location data, then skip to the next addr
-            geo_loc = self.all_data[addr]
-            if "latitude" in geo_loc:
+            if "latitude" in self.all_data[addr]:
                 continue
-
-            print(addr)
-            if g is None:
-                API_KEY = os.getenv("GOOGLEAPI")
-                g = GoogleV3(api_key=API_KEY)
-
-            location = None
-
-            try:
-                location = g.geocode(addr)
-                geo_loc["latitude"]  = location.latitude
-                geo_loc["longitude"] = location.longitude
-                # geo_loc["id"]    = location.place_id
-                geo_loc["address"] = location.address
-
-                self.all_data[addr] = geo_loc
-                # print(location) # gives  location.address
-                # print(location.raw)
-
-                # print(addr[:50] + ' -- ' + location.address)
-                # print('Lat/Lon: {0}, {1}'
-                #       .format(location.latitude,location.longitude))
-                # print('https://www.google.ca/maps/@{0},{1},17z'
-                #       .format(location.latitude,location.longitude))
-            except (Exception,  geopy.exc.GeocoderQueryError) as err:
-                print("geopy error: {0}".format(err))
-                print('... Failed to get a location for {0}'.format(addr))
-
-            # limit the number of google lookups per run
-            if gcount >= 10:
-                return
-            gcount = gcount+1
-
-    # remove all the "org names" elements
-    def remove_inst_element(self):
-        for i, (k, v) in enumerate(self.all_data.items()):
-            v.pop("org names", None)
-
-    def write_loc_counts_file(self):
-        # still write the old files
-        # write the trad counts output file
-        filename = self.locCountsFileName
-        with open(filename, 'w', encoding='utf8') as json_file:
-            json.dump(self.all_data, json_file)
-
-        filename = self.locCountsGeoJSON
-        write_geojson_file(self.all_data, filename, and_properties=False)
-
-    def write_loc_inst_file(self):
-
-        # still write the old files
-        # write the trad inst output file
-        filename = self.locInstFilename
-        with open(filename, 'w', encoding='utf8') as json_file:
-            json.dump(self.all_data, json_file)
-
-        filename = self.locInstGeoJSON
-        write_geojson_file(self.all_data, filename, and_properties=True)
+            pending.append(addr)
+        return pending
+
+    def outputs_exist(self):
+        return all(os.path.exists(filename) for filename in
+                   (self.locInstFilename, self.locCountsFileName,
+                    self.locInstGeoJSON, self.locCountsGeoJSON,
+                    self.binFileName, self.tilesDir, self.clustersDir)
+                   if filename is not None)
+
+    def output_settings(self):
+        ''' what decides the outputs, besides the input and locations '''
+        return {"files": [self.locCountsFileName, self.locCountsGeoJSON,
+                          self.locInstFilename, self.locInstGeoJSON],
+                "precision": self.coord_precision,
+                "precompress": self.precompress_outputs,
+                "merge distance": self.merge_distance,
+                "binary": self.binFileName,
+                "tiles": [self.tilesDir, self.tile_minzoom,
+                          self.tile_maxzoom],
+                "clusters": [self.clustersDir, self.cluster_minzoom,
+                             self.cluster_maxzoom, self.cluster_radius]}
+
+    def check_output_settings(self):
+        ''' raise ValueError if the outputs could not be written '''
+        if (self.tilesDir is not None and
+                not 1 <= self.tile_minzoom <= self.tile_maxzoom):
+            raise ValueError("the tiles need 1 <= minzoom <= maxzoom")
+        if (self.clustersDir is not None and
+                not 0 <= self.cluster_minzoom <= self.cluster_maxzoom):
+            raise ValueError("the clusters need 0 <= minzoom <= maxzoom")
+
+    def precompress_geojson(self):
+        ''' gzip and brotli copies of the GeoJSON files, for the sites '''
+        if not brotli_available():
+            print("brotli is not installed, only .gz copies are written")
+        with self.metrics.phase("precompress"):
+            for filename in (self.locInstGeoJSON, self.locCountsGeoJSON):
+                sizes = precompress(filename)
+                for line in report(filename, sizes):
+                    print(line)
+                for (suffix, size) in sizes.items():
+                    if suffix:
+                        self.metrics.count("output bytes " + suffix, size)
+
+    def save_run_state(self):
+        ''' for the next incremental run, after the locations DB is saved '''
+        if self.run_state is None or self.skipped:
+            return
+        pending = 0
+        if self.all_data is not None and self.coords_found_in_xlsx is None:
+            # a quarantined address is not worth another run
+            pending = sum(1 for addr in self.pending_addresses()
+                          if self.failures is None or
+                          not self.failures.is_quarantined(addr))
+        self.run_state.save(self.locFileName, pending)
+
+    def output_data(self):
+        ''' all_data, or a copy with the co-located addresses merged '''
+        if self.merge_distance is None:
+            return self.all_data
+        with self.metrics.phase("merge co-located"):
+            (out, merged) = consolidate(self.all_data, self.merge_distance)
+        print("{0} co-located addresses merged".format(merged))
+        self.metrics.set("co-located addresses merged", merged)
+        return out
+
+    def write_outputs(self):
+        ''' write the counts and inst files, json and GeoJSON, in one pass '''
+        out = self.output_data()
+        with self.metrics.phase("write outputs"):
+            write_all_outputs(out,
+                              self.locInstFilename,
+                              self.locCountsFileName,
+                              self.locInstGeoJSON,
+                              self.locCountsGeoJSON,
+                              self.coord_precision)
+        if self.binFileName is not None:
+            with self.metrics.phase("write binary"):
+                count = write_binary_file(out, self.binFileName)
+            print("{0} places written to {1}".format(count, self.binFileName))
+        if self.tilesDir is not None:
+            with self.metrics.phase("write tiles"):
+                pyramid = write_tiles(out, self.tilesDir,
+                                      self.tile_minzoom, self.tile_maxzoom,
+                                      self.coord_precision)
+            print("{0} tiles written to {1}".format(
+                len(pyramid.manifest()["tiles"]), self.tilesDir))
+        if self.clustersDir is not None:
+            with self.metrics.phase("write clusters"):
+                levels = clusters.build_clusters(out,
+                                                 self.cluster_minzoom,
+                                                 self.cluster_maxzoom,
+                                                 self.cluster_radius)
+                clusters.write_clusters(levels, self.clustersDir,
+                                        self.coord_precision)
+            print("clusters written to {0}, {1} marks at zoom {2}".format(
+                self.clustersDir, len(levels[self.cluster_minzoom]),
+                self.cluster_minzoom))
+        if self.precompress_outputs:
+            self.precompress_geojson()
+        else:
+            # copies from an earlier run would no longer match
+            for filename in (self.locInstGeoJSON, self.locCountsGeoJSON):
+                for removed in remove_stale(filename):
+                    print("removed the old {0}".format(removed))
+        if self.metrics.enabled:
+            self.metrics.set("output bytes", sum(
+                os.path.getsize(filename) for filename in
+                (self.locInstFilename, self.locCountsFileName,
+                 self.locInstGeoJSON, self.locCountsGeoJSON)))
 
     def write_location_DB(self):
         # if we did not use the locations DB, then do not update it
-        if self.coords_found_in_xlsx is not None:
+        if self.coords_found_in_xlsx is not None or self.skipped:
+            return
+
+        store = self.open_location_store()
+        if not store.preload:
+            # the geocodes were committed as they were found
+            if self.locExportFileName is not None:
+                store.export_json(self.locExportFileName)
             return
 
         # remove the location counts and Inst names
@@ -411,20 +840,170 @@ class AcqInfo:
                 print("missing mag entry: {0}".format(err))
 
         # update the location DB file
-        filename = self.locFileName
-        with open(filename, 'w', encoding='utf8') as json_file:
-            json.dump(self.all_data, json_file)
-
-
-if __name__ == "__main__":
-    # execute only if run as a script
-
-    a1 = AcqInfo(default_locFileName,
+        with self.metrics.phase("write locations"):
+            store.save_all(self.all_data)
+
+
+def add_run_arguments(parser):
+    ''' the options of the lookups and outputs, shared by batchscan.py '''
+    parser.add_argument("--reader", choices=READERS, default="auto",
+                        help="workbook reader, openpyxl streams .xlsx rows")
+    parser.add_argument("--locations", default=default_locFileName,
+                        help="locations DB, a .json file or a .sqlite file")
+    parser.add_argument("--export-locations", metavar="FILE",
+                        help="also write a .sqlite locations DB as json")
+    parser.add_argument("--gazetteer", default=default_gazetteerFileName,
+                        help="csv of well known places, found without Google")
+    parser.add_argument("--failures", default=default_failuresFileName,
+                        help="addresses which failed to geocode, retried"
+                             " with backoff")
+    parser.add_argument("--retry-all", action="store_true",
+                        help="try the failed and quarantined addresses too")
+    parser.add_argument("--quarantine", default=default_reportFileName,
+                        help="csv report of the addresses not found")
+    parser.add_argument("--no-normalise", action="store_true",
+                        help="keep each spelling of an address separate")
+    parser.add_argument("--limit", type=int, default=default_geocode_limit,
+                        help="max google lookups per run, 0 for no limit")
+    parser.add_argument("--daily-limit", type=int,
+                        help="max google lookups per day, over all runs")
+    parser.add_argument("--quota", default=default_quotaFileName,
+                        help="lookups made today and addresses waiting")
+    parser.add_argument("--workers", type=int, default=default_workers,
+                        help="concurrent google lookups")
+    parser.add_argument("--rate", type=float, default=default_rate,
+                        help="max google lookups per second")
+    parser.add_argument("--merge-within", type=float, metavar="METRES",
+                        help="merge addresses geocoded this close together"
+                             " in the outputs")
+    parser.add_argument("--compact", action="store_true",
+                        help="round the GeoJSON coordinates, leave out"
+                             " the dummy fields and spaces")
+    parser.add_argument("--precision", type=int,
+                        default=default_coord_precision,
+                        help="decimals kept by --compact")
+    parser.add_argument("--binary", metavar="FILE",
+                        help="also write the places as typed array columns")
+    parser.add_argument("--tiles", metavar="DIR",
+                        help="also write tiled GeoJSON, z/x/y.geojson")
+    parser.add_argument("--tile-zooms", type=int, nargs=2,
+                        metavar=("MIN", "MAX"),
+                        default=[default_minzoom, default_maxzoom],
+                        help="the zoom levels of the tiles")
+    parser.add_argument("--clusters", metavar="DIR",
+                        help="also write clustered GeoJSON for each zoom")
+    parser.add_argument("--cluster-zooms", type=int, nargs=2,
+                        metavar=("MIN", "MAX"),
+                        default=[clusters.default_minzoom,
+                                 clusters.default_maxzoom],
+                        help="the zoom levels of the clusters")
+    parser.add_argument("--cluster-radius", type=float,
+                        default=clusters.default_radius,
+                        help="marks closer than this many pixels cluster")
+    parser.add_argument("--precompress", action="store_true",
+                        help="also write .gz and .br GeoJSON files")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write timers and counters for the run as json")
+
+
+def check_run_arguments(parser, args):
+    (minzoom, maxzoom) = args.tile_zooms
+    if not 1 <= minzoom <= maxzoom:
+        parser.error("--tile-zooms needs 1 <= MIN <= MAX")
+    (minzoom, maxzoom) = args.cluster_zooms
+    if not 0 <= minzoom <= maxzoom:
+        parser.error("--cluster-zooms needs 0 <= MIN <= MAX")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="add latlong data to a xlsx for use in a d3js map")
+    parser.add_argument("--input", default=default_inputfilename,
+                        help="the input workbook")
+    add_run_arguments(parser)
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rescan rows changed since the last run")
+    parser.add_argument("--state", default=default_stateFileName,
+                        help="state file kept for --incremental")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running, rebuilding when input is saved")
+    parser.add_argument("--interval", type=float, default=default_interval,
+                        help="seconds between checks of the input, --watch")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="look up new addresses while the spreadsheet"
+                             " is still being read, needs --limit 0")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="write a cProfile dump of the run")
+    args = parser.parse_args(argv)
+    check_run_arguments(parser, args)
+    if args.pipeline and (args.limit or args.daily_limit is not None):
+        # a limited run looks up the most used addresses first, so it
+        # has to count the whole spreadsheet before any lookup
+        parser.error("--pipeline needs --limit 0 and no --daily-limit")
+    return args
+
+
+def make_acq(args):
+    ''' an AcqInfo set up from the command line, see add_run_arguments '''
+    a1 = AcqInfo(args.locations,
                  default_locCountsFilename,
                  default_locCountsGeoJSON,
                  default_locInstFilename,
                  default_locInstGeoJSON)
+    a1.geocode_limit = args.limit or None
+    a1.geocode_daily_limit = args.daily_limit
+    a1.quotaFileName = args.quota
+    a1.geocode_workers = args.workers
+    a1.pipeline_geocodes = args.pipeline
+    a1.geocode_rate = args.rate
+    a1.locExportFileName = args.export_locations
+    a1.normalise_addresses = not args.no_normalise
+    a1.gazetteerFileName = args.gazetteer
+    a1.failuresFileName = args.failures
+    a1.retry_failures = args.retry_all
+    a1.quarantineFileName = args.quarantine
+    a1.reader = args.reader
+    if args.compact:
+        a1.coord_precision = args.precision
+    a1.precompress_outputs = args.precompress
+    a1.merge_distance = args.merge_within
+    a1.binFileName = args.binary
+    a1.tilesDir = args.tiles
+    (a1.tile_minzoom, a1.tile_maxzoom) = args.tile_zooms
+    a1.clustersDir = args.clusters
+    (a1.cluster_minzoom, a1.cluster_maxzoom) = args.cluster_zooms
+    a1.cluster_radius = args.cluster_radius
+    return a1
 
-    a1.scan_spreadsheet(default_inputfilename)
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    args = parse_args()
+
+    if args.watch:
+        state_filename = args.state if args.incremental else None
+        watcher = Watcher(lambda: make_acq(args), args.input,
+                          interval=args.interval,
+                          state_filename=state_filename)
+        watcher.run()
+        raise SystemExit(0)
+
+    a1 = make_acq(args)
+    if args.incremental:
+        a1.run_state = RunState(args.state)
+    if args.metrics:
+        a1.metrics = Metrics()
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    a1.scan_spreadsheet(args.input)
 
     a1.write_location_DB()
+    a1.save_run_state()
+
+    if args.profile:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    if args.metrics:
+        a1.metrics.write(args.metrics)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Address normalisation, so spelling variants share one record.
+  fold unicode to NFC, case and whitespace
+  drop the punctuation which does not change the place
+  map country abbreviations to their full names, and province
+    abbreviations just before Canada, where they cannot be taken for
+    a place elsewhere ("Lima PE" is in Peru, "Isle of Man" is not in
+    Manitoba)
+  the result is the canonical key of the address
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+import unicodedata
+
+# province and state names, by their usual abbreviations
+PROVINCE_ALIASES = {
+    "ab": "alberta", "alta": "alberta",
+    "bc": "british columbia",
+    "mb": "manitoba", "man": "manitoba",
+    "nb": "new brunswick",
+    "nl": "newfoundland and labrador", "nfld": "newfoundland and labrador",
+    "ns": "nova scotia",
+    "nt": "northwest territories", "nwt": "northwest territories",
+    "nu": "nunavut",
+    "on": "ontario", "ont": "ontario",
+    "pe": "prince edward island", "pei": "prince edward island",
+    "qc": "quebec", "que": "quebec", "pq": "quebec", "québec": "quebec",
+    "sk": "saskatchewan", "sask": "saskatchewan",
+    "yt": "yukon", "yk": "yukon",
+}
+
+# country names, by their usual abbreviations and other spellings
+COUNTRY_ALIASES = {
+    "usa": "united states",
+    "us": "united states",
+    "united states of america": "united states",
+    "uk": "united kingdom",
+    "great britain": "united kingdom",
+    "russian federation": "russia",
+}
+
+# changed whenever canonical_key is, so that stored keys are remade
+KEY_VERSION = 1
+
+# punctuation which does not change the place
+DROP_CHARS = str.maketrans({".": None, ",": " ", ";": " "})
+
+
+def canonical_key(addr) -> str:
+    ''' the key which all the spellings of an address share '''
+    addr = unicodedata.normalize("NFC", addr).casefold()
+    tokens = addr.translate(DROP_CHARS).split()
+
+    # the country comes last, and may be more than one word
+    for (alias, country) in COUNTRY_ALIASES.items():
+        words = alias.split()
+        if tokens[-len(words):] == words:
+            tokens = tokens[:-len(words)] + [country]
+            break
+
+    # the province comes just before the country
+    if (len(tokens) >= 2 and tokens[-1] == "canada" and
+            tokens[-2] in PROVINCE_ALIASES):
+        tokens[-2] = PROVINCE_ALIASES[tokens[-2]]
+    return " ".join(tokens)
+
+
+class AddressIndex:
+    ''' maps each raw address variant to the first spelling seen
+
+    stored, if given, finds the stored address with a canonical key, so
+    that a variant seen first resolves to the stored spelling.
+    '''
+
+    def __init__(self, stored=None):
+        self.by_key = {}    # canonical key -> first spelling
+        self.variants = {}  # raw address -> first spelling
+        self.stored = stored
+        self.calls_saved = 0
+
+    def add(self, addr) -> None:
+        ''' an address which already has its own record '''
+        self.by_key.setdefault(canonical_key(addr), addr)
+        self.variants[addr] = addr
+
+    def resolve(self, addr) -> str:
+        ''' the spelling under which addr is recorded '''
+        known = self.variants.get(addr)
+        if known is not None:
+            return known
+        key = canonical_key(addr)
+        known = self.by_key.get(key)
+        if known is None and self.stored is not None:
+            known = self.stored(key)
+            if known is not None:
+                self.by_key[key] = known
+                self.variants[known] = known
+        if known is None:
+            self.by_key[key] = addr
+            known = addr
+        elif known != addr:
+            # a variant of an address we already have
+            self.calls_saved += 1
+        self.variants[addr] = known
+        return known
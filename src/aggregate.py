@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Partial counts of the addresses and org names in some spreadsheet rows.
+  count_rows gives the counts for one chunk of rows
+  partials can be added together, and saved as json
+  AcqInfo.merge_partial adds a partial to all_data
+
+A partial maps each raw address to [count, org names, coords], where
+org names is {org name: count} and coords is the last (lat, lon) given
+for the address, or None.  Addresses are kept in the order they were
+first seen.
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List
+
+
+def count_rows(addrs, orgNames, coords) -> Dict:
+    ''' the partial counts for a chunk of rows
+
+    orgNames and coords are None when the sheet has no such columns.
+    '''
+    partial = {}  # type: Dict
+    for (i, addr) in enumerate(addrs):
+        if addr == "":
+            continue
+        entry = partial.get(addr)
+        if entry is None:
+            entry = partial[addr] = [0, None, None]
+        entry[0] += 1
+        if orgNames is not None:
+            if entry[1] is None:
+                entry[1] = {}
+            orgName = orgNames[i]
+            entry[1][orgName] = entry[1].get(orgName, 0) + 1
+        if coords is not None:
+            entry[2] = coords[i]
+    return partial
+
+
+def add_partial(into, partial) -> None:
+    ''' add the counts of partial to the partial into '''
+    for (addr, (count, orgs, coords)) in partial.items():
+        entry = into.get(addr)
+        if entry is None:
+            into[addr] = [count,
+                          None if orgs is None else dict(orgs),
+                          coords]
+            continue
+        entry[0] += count
+        if orgs is not None:
+            if entry[1] is None:
+                entry[1] = {}
+            for (orgName, orgCount) in orgs.items():
+                entry[1][orgName] = entry[1].get(orgName, 0) + orgCount
+        if coords is not None:
+            entry[2] = coords
+
+
+def partial_to_json(partial) -> List:
+    return [[addr, count, orgs, coords]
+            for (addr, (count, orgs, coords)) in partial.items()]
+
+
+def partial_from_json(items) -> Dict:
+    return {addr: [count, orgs, None if coords is None else tuple(coords)]
+            for (addr, count, orgs, coords) in items}
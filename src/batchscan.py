@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Scan many workbooks into one set of outputs.
+  each workbook is counted in a worker process, giving a partial
+    aggregate of its addresses, magnitudes and org names (aggregate.py)
+  the partials are added together into one all_data
+  then one geocoding pass looks up each distinct address once
+  and the four output files are written once
+
+Usage:
+  python3 batchscan.py [--jobs N] workbook-or-directory ...
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import time
+import addLatLong
+from addLatLong import AcqInfo
+from aggregate import add_partial
+from metrics import Metrics
+
+# the input files picked from a directory
+WORKBOOK_SUFFIXES = (".xlsx", ".xlsm", ".xls", ".csv", ".parquet", ".pq")
+
+
+class PartialCounter(AcqInfo):
+    ''' reads a workbook into one partial, instead of into all_data '''
+
+    def __init__(self):
+        AcqInfo.__init__(self, None, None, None, None, None)
+        self.partial = {}  # type: Dict
+
+    def merge_partial(self, partial):
+        add_partial(self.partial, partial)
+
+
+def count_workbook(job) -> Tuple[bool, Dict]:
+    ''' the worker: (coords found, partial counts) for one workbook '''
+    (filename, reader, header_search_rows, chunk_rows) = job
+    counter = PartialCounter()
+    counter.reader = reader
+    counter.header_search_rows = header_search_rows
+    counter.chunk_rows = chunk_rows
+    counter.read_spreadsheet(filename)
+    return (counter.coords_found_in_xlsx is not None, counter.partial)
+
+
+def find_workbooks(paths) -> List[str]:
+    ''' the files named, and the workbooks in the directories named '''
+    filenames = []
+    for path in paths:
+        if not os.path.isdir(path):
+            filenames.append(path)
+            continue
+        for name in sorted(os.listdir(path)):
+            # skip the lock files Excel leaves beside open workbooks
+            if name.startswith("~$") or not name.endswith(WORKBOOK_SUFFIXES):
+                continue
+            filenames.append(os.path.join(path, name))
+    return filenames
+
+
+def scan_workbooks(acq, filenames, jobs=None) -> None:
+    ''' count the workbooks in parallel, then geocode and write once
+
+    jobs is the number of worker processes, os.cpu_count() by default;
+    with jobs=1 the workbooks are counted in this process.
+    '''
+    work = [(filename, acq.reader, acq.header_search_rows, acq.chunk_rows)
+            for filename in filenames]
+    with acq.metrics.phase("read"):
+        if jobs == 1 or len(work) <= 1:
+            results = [count_workbook(job) for job in work]
+        else:
+            with ProcessPoolExecutor(jobs) as pool:
+                results = list(pool.map(count_workbook, work))
+
+        # the partials are added in the order the workbooks were named,
+        #   so the outputs do not depend on which worker finished first
+        total = {}  # type: Dict
+        for (coordsFound, partial) in results:
+            if coordsFound:
+                acq.coords_found_in_xlsx = True
+            add_partial(total, partial)
+        if total:
+            acq.merge_partial(total)
+    acq.metrics.set("workbooks scanned", len(work))
+
+    # get any latlong info
+    if acq.coords_found_in_xlsx is None:
+        with acq.metrics.phase("geocode"):
+            acq.get_info()
+
+    acq.write_outputs()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="scan many workbooks into one set of map outputs")
+    parser.add_argument("inputs", nargs="+",
+                        help="workbooks, or directories of workbooks")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="worker processes, one per core by default")
+    addLatLong.add_run_arguments(parser)
+    # the workbooks are read before any lookups start
+    parser.set_defaults(pipeline=False)
+    args = parser.parse_args(argv)
+    addLatLong.check_run_arguments(parser, args)
+    return args
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    args = parse_args()
+
+    a1 = addLatLong.make_acq(args)
+    if args.metrics:
+        a1.metrics = Metrics()
+
+    workbooks = find_workbooks(args.inputs)
+    start = time.perf_counter()
+    scan_workbooks(a1, workbooks, args.jobs)
+    print("{0} workbooks scanned in {1:.2f}s"
+          .format(len(workbooks), time.perf_counter() - start))
+
+    a1.write_location_DB()
+    if args.metrics:
+        a1.metrics.write(args.metrics)
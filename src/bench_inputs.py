@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the input formats.
+  write the same synthetic rows as xlsx, csv and parquet
+  time AcqInfo reading each one, and report rows per second
+
+Usage:
+  python3 bench_inputs.py [number of rows]
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+import os
+import sys
+import tempfile
+import time
+from addLatLong import AcqInfo
+import synthdata
+
+FORMATS = [("xlsx", "openpyxl", synthdata.write_xlsx),
+           ("xlsx", "xlrd", synthdata.write_xlsx),
+           ("csv", "csv", synthdata.write_csv),
+           ("parquet", "parquet", synthdata.write_parquet)]
+
+
+def time_read(filename, reader) -> float:
+    a1 = AcqInfo(None, None, None, None, None)
+    a1.all_data = {}
+    a1.reader = reader
+    start = time.perf_counter()
+    a1.read_spreadsheet(filename)
+    return time.perf_counter() - start
+
+
+def main(argv):
+    n_rows = int(argv[1]) if len(argv) > 1 else 100000
+    print("{0} rows".format(n_rows))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for (suffix, reader, write) in FORMATS:
+            filename = os.path.join(tmp_dir, "input." + suffix)
+            try:
+                if not os.path.exists(filename):
+                    write(filename, synthdata.synthetic_rows(n_rows))
+                seconds = time_read(filename, reader)
+            except ImportError as err:
+                print("{0:8} {1:9} skipped: {2}".format(suffix, reader, err))
+                continue
+            print("{0:8} {1:9} {2:8.2f}s {3:12,.0f} rows/s {4:10,d} bytes"
+                  .format(suffix, reader, seconds, n_rows / seconds,
+                          os.path.getsize(filename)))
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main(sys.argv)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the whole pipeline on synthetic workbooks.
+  write a synthetic workbook of each size (see synthdata.py)
+  time each phase of AcqInfo: reading the sheet, geocoding against
+    the fake geocoder, writing the outputs and the locations DB
+  record the peak memory after each phase
+  save the results as json, and compare them with an earlier run
+
+Usage:
+  python3 bench_pipeline.py --rows 10000 100000 --latency 0.01
+  python3 bench_pipeline.py --output new.json --compare old.json
+  python3 bench_pipeline.py --latency 0.05 --pipeline
+      geocode while the sheet is read, the geocode phase is then only
+      the wait for the lookups still in flight
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List
+from contextlib import redirect_stdout
+import argparse
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+import tracemalloc
+import addLatLong
+from addLatLong import AcqInfo
+from fakegeocoder import FakeGeocoder
+import synthdata
+
+WRITERS = {"xlsx": synthdata.write_xlsx,
+           "csv": synthdata.write_csv,
+           "parquet": synthdata.write_parquet}
+
+PHASES = ("generate", "read", "geocode", "write outputs", "write locations")
+
+RESULTS_VERSION = 1
+
+
+def peak_rss_kb() -> int:
+    ''' the peak resident memory of this process so far '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class PhaseTimer:
+    ''' times the phases of one run, and notes the memory after each '''
+
+    def __init__(self, trace_memory=False, quiet=True):
+        self.trace_memory = trace_memory
+        self.quiet = quiet
+        self.phases = {}  # type: Dict[str, Dict]
+
+    def run(self, name, func, *args):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        if self.quiet:
+            # the addresses get_info prints would swamp the results
+            with open(os.devnull, 'w') as devnull:
+                with redirect_stdout(devnull):
+                    result = func(*args)
+        else:
+            result = func(*args)
+        phase = {"seconds": time.perf_counter() - start,
+                 "peak_rss_kb": peak_rss_kb()}
+        if self.trace_memory:
+            phase["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.phases[name] = phase
+        return result
+
+
+def bench_one(params, tmp_dir, verbose=False) -> Dict:
+    ''' one run of the pipeline over a new synthetic workbook '''
+    in_fn = os.path.join(tmp_dir, "input." + params["format"])
+    loc_fn = os.path.join(tmp_dir, "locations.json")
+    with open(loc_fn, 'w') as loc_file:
+        loc_file.write("{}")
+
+    timer = PhaseTimer(params["trace_memory"], not verbose)
+    rows = synthdata.synthetic_rows(params["rows"],
+                                    n_addrs=params["addresses"],
+                                    n_orgs=params["orgs"],
+                                    header_offset=params["header_offset"],
+                                    org_skew=params["org_skew"],
+                                    blank_rate=params["blank_rate"])
+    timer.run("generate", WRITERS[params["format"]], in_fn, rows)
+
+    a1 = AcqInfo(loc_fn,
+                 os.path.join(tmp_dir, "counts.json"),
+                 os.path.join(tmp_dir, "counts.geojson"),
+                 os.path.join(tmp_dir, "inst.json"),
+                 os.path.join(tmp_dir, "inst.geojson"))
+    a1.geocoder = FakeGeocoder(latency=params["latency"])
+    a1.geocode_limit = None
+    a1.geocode_workers = params["workers"]
+    a1.geocode_rate = None
+    a1.pipeline_geocodes = params.get("pipeline", False)
+    a1.gazetteerFileName = None
+    a1.header_search_rows = max(addLatLong.default_header_search_rows,
+                                params["header_offset"] + 1)
+
+    timer.run("read", a1.read_spreadsheet, in_fn)
+    timer.run("geocode", a1.get_info)
+    timer.run("write outputs", a1.write_outputs)
+    timer.run("write locations", a1.write_location_DB)
+
+    read_seconds = timer.phases["read"]["seconds"]
+    return {"params": params,
+            "phases": timer.phases,
+            "unique_addresses": len(a1.all_data),
+            "geocoder_calls": len(a1.geocoder.calls),
+            "rows_per_second": params["rows"] / read_seconds,
+            "output_bytes": sum(os.path.getsize(fn) for fn in
+                                (a1.locCountsFileName, a1.locCountsGeoJSON,
+                                 a1.locInstFilename, a1.locInstGeoJSON))}
+
+
+def run_key(run) -> str:
+    ''' runs with the same parameters are compared with each other '''
+    params = dict(run["params"])
+    params.pop("trace_memory", None)
+    if not params.get("pipeline"):
+        # as in the results from before --pipeline
+        params.pop("pipeline", None)
+    return json.dumps(params, sort_keys=True)
+
+
+def compare(runs, old_runs) -> None:
+    old_by_key = {run_key(run): run for run in old_runs}
+    for run in runs:
+        old = old_by_key.get(run_key(run))
+        if old is None:
+            continue
+        print("{0:,d} rows, against the earlier run:"
+              .format(run["params"]["rows"]))
+        for name in PHASES:
+            new_s = run["phases"][name]["seconds"]
+            old_s = old["phases"].get(name, {}).get("seconds")
+            if not old_s:
+                continue
+            print("  {0:16} {1:8.3f}s  was {2:8.3f}s  {3:+6.0f}%"
+                  .format(name, new_s, old_s, 100.0 * (new_s - old_s) / old_s))
+
+
+def print_run(run) -> None:
+    params = run["params"]
+    print("{0:,d} rows, {1:,d} addresses, {2} geocoder calls, {3:,.0f} rows/s"
+          .format(params["rows"], run["unique_addresses"],
+                  run["geocoder_calls"], run["rows_per_second"]))
+    for name in PHASES:
+        phase = run["phases"][name]
+        print("  {0:16} {1:8.3f}s  peak rss {2:10,d} KB"
+              .format(name, phase["seconds"], phase["peak_rss_kb"]))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="time the phases of addLatLong on synthetic workbooks")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000],
+                        help="data rows, one run for each size")
+    parser.add_argument("--addresses", type=int, default=1000,
+                        help="distinct addresses")
+    parser.add_argument("--orgs", type=int, default=200,
+                        help="distinct org names")
+    parser.add_argument("--header-offset", type=int, default=0,
+                        help="title rows above the header row")
+    parser.add_argument("--org-skew", type=float, default=0.0,
+                        help="Zipf exponent of the org names, 0 for uniform")
+    parser.add_argument("--blank-rate", type=float, default=0.0,
+                        help="chance of a blank dept, city or province cell")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="xlsx",
+                        help="the synthetic workbook format")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds for each fake geocoder request")
+    parser.add_argument("--workers", type=int,
+                        default=addLatLong.default_workers,
+                        help="concurrent geocoder requests")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="look up addresses while the sheet is read")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also trace python allocations (slower)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="show what AcqInfo prints during each phase")
+    parser.add_argument("--output", default="bench_results.json",
+                        help="json file for the results")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="results of an earlier run to compare with")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> List[Dict]:
+    args = parse_args(argv)
+    runs = []
+    for n_rows in args.rows:
+        params = {"rows": n_rows,
+                  "addresses": args.addresses,
+                  "orgs": args.orgs,
+                  "header_offset": args.header_offset,
+                  "org_skew": args.org_skew,
+                  "blank_rate": args.blank_rate,
+                  "format": args.format,
+                  "latency": args.latency,
+                  "workers": args.workers,
+                  "pipeline": args.pipeline,
+                  "trace_memory": args.trace_memory}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run = bench_one(params, tmp_dir, args.verbose)
+        print_run(run)
+        runs.append(run)
+
+    results = {"version": RESULTS_VERSION,
+               "addLatLong": addLatLong.__version__,
+               "python": platform.python_version(),
+               "machine": platform.machine(),
+               "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "runs": runs}
+    with open(args.output, 'w', encoding='utf8') as json_file:
+        json.dump(results, json_file, indent=1)
+
+    if args.compare:
+        with open(args.compare) as json_file:
+            compare(runs, json.load(json_file)["runs"])
+    return runs
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main()
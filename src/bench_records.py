@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the all_data records.
+  build the same locations as plain dicts and as LocRecords
+  report the memory held by each, as measured by tracemalloc
+
+Usage:
+  python3 bench_records.py [number of locations] [number of org names]
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+import gc
+import sys
+import tracemalloc
+from records import LocRecord
+
+
+def org_name(i, n_orgs):
+    return "Organisation number {0}".format(i % n_orgs)
+
+
+def build_dicts(n_locs, org_names):
+    all_data = {}
+    for i in range(n_locs):
+        geo_loc = {}
+        geo_loc["latitude"] = (i % 17000) / 100.0 - 85.0
+        geo_loc["longitude"] = (i % 36000) / 100.0 - 180.0
+        geo_loc["address"] = "Place {0}, Country".format(i)
+        geo_loc["magnitude"] = i % 7 + 1
+        geo_loc["org names"] = {org_names[i % len(org_names)]: 1}
+        all_data["Place {0} Country".format(i)] = geo_loc
+    return all_data
+
+
+def build_records(n_locs, org_names):
+    all_data = {}
+    for i in range(n_locs):
+        geo_loc = LocRecord()
+        geo_loc["latitude"] = (i % 17000) / 100.0 - 85.0
+        geo_loc["longitude"] = (i % 36000) / 100.0 - 180.0
+        geo_loc["address"] = "Place {0}, Country".format(i)
+        geo_loc["magnitude"] = i % 7 + 1
+        geo_loc.add_org_name(org_names[i % len(org_names)])
+        all_data["Place {0} Country".format(i)] = geo_loc
+    return all_data
+
+
+def measure(build, n_locs, org_names) -> int:
+    ''' bytes still allocated once the records are built '''
+    gc.collect()
+    tracemalloc.start()
+    all_data = build(n_locs, org_names)
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del all_data
+    return current
+
+
+def main(argv):
+    n_locs = int(argv[1]) if len(argv) > 1 else 200000
+    n_orgs = int(argv[2]) if len(argv) > 2 else 2000
+    org_names = [org_name(i, n_orgs) for i in range(n_orgs)]
+
+    dict_bytes = measure(build_dicts, n_locs, org_names)
+    rec_bytes = measure(build_records, n_locs, org_names)
+    print("{0} locations, {1} org names".format(n_locs, n_orgs))
+    print("dict of dicts   {0:12,d} bytes  {1:6.0f} per location"
+          .format(dict_bytes, dict_bytes / n_locs))
+    print("LocRecord       {0:12,d} bytes  {1:6.0f} per location"
+          .format(rec_bytes, rec_bytes / n_locs))
+    print("reduction       {0:11.0f}%".format(
+        100.0 * (dict_bytes - rec_bytes) / dict_bytes))
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main(sys.argv)
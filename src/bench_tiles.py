@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the GeoJSON tiler.
+  make n synthetic locations spread over the world
+  time building the tile pyramid, and writing the tiles
+
+Usage:
+  python3 bench_tiles.py [number of points] [min zoom] [max zoom]
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+import resource
+import sys
+import tempfile
+import time
+from fakegeocoder import fake_coords
+from geotiles import TilePyramid, default_minzoom, default_maxzoom
+
+
+def synthetic_locations(n_points):
+    all_data = {}
+    for i in range(n_points):
+        addr = "Place {0} Country".format(i)
+        (latitude, longitude) = fake_coords(addr)
+        all_data[addr] = {"latitude": latitude,
+                          "longitude": longitude,
+                          "address": "Place {0}, Country".format(i),
+                          "magnitude": i % 7 + 1,
+                          "org names": {"Institution {0}".format(i % 500): 1}}
+    return all_data
+
+
+def main(argv):
+    n_points = int(argv[1]) if len(argv) > 1 else 1000000
+    minzoom = int(argv[2]) if len(argv) > 2 else default_minzoom
+    maxzoom = int(argv[3]) if len(argv) > 3 else default_maxzoom
+    all_data = synthetic_locations(n_points)
+
+    start = time.perf_counter()
+    pyramid = TilePyramid(minzoom, maxzoom, precision=5)
+    pyramid.add_all(all_data)
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        n_bytes = pyramid.write(tmp_dir)
+        write_seconds = time.perf_counter() - start
+
+    n_tiles = sum(len(level) for level in pyramid.levels)
+    print("{0:,d} points, zooms {1}-{2}, {3:,d} tiles, {4:,d} bytes"
+          .format(n_points, minzoom, maxzoom, n_tiles, n_bytes))
+    print("build  {0:8.2f}s  {1:12,.0f} points/s"
+          .format(build_seconds, n_points / build_seconds))
+    print("write  {0:8.2f}s".format(write_seconds))
+    print("peak rss {0:,d} KB".format(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main(sys.argv)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+A compact binary file of the locations, for the spotter globe.
+  the same places as the GeoJSON files, which a browser can load
+    straight into typed arrays instead of parsing json
+
+Layout, all little-endian:
+  header    4 bytes "ACQB", then uint32 version, count n, and the
+            byte length of the string data
+  float32   n longitudes, then n latitudes, then n magnitudes
+            (the "mag" of the GeoJSON, magnitude / 10)
+  uint32    n + 1 offsets of the place names in the string data
+  bytes     the place names, utf8, one after another
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List
+from array import array
+import struct
+import sys
+from geojsonfile import make_feature, point_of
+
+MAGIC = b"ACQB"
+BINARY_VERSION = 1
+HEADER = struct.Struct("<4sIII")
+
+
+def _little_endian(values) -> array:
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def write_binary_file(all_data, filename) -> int:
+    ''' write the places which have a GeoJSON feature, returns the count '''
+    lons = array("f")
+    lats = array("f")
+    mags = array("f")
+    offsets = array("I", [0])
+    names = bytearray()
+    for addr in all_data:
+        geo_loc = all_data[addr]
+        point = point_of(geo_loc)
+        if point is None:
+            continue    # a blank lat or lon in the input
+        feature = make_feature(geo_loc, False)
+        if feature is None:
+            continue
+        (lon, lat) = point
+        lons.append(lon)
+        lats.append(lat)
+        mags.append(feature["properties"]["mag"])
+        names += feature["properties"]["place"].encode("utf8")
+        offsets.append(len(names))
+
+    with open(filename, 'wb') as bin_file:
+        bin_file.write(HEADER.pack(MAGIC, BINARY_VERSION, len(lons),
+                                   len(names)))
+        # the arrays are written from their own buffers, without copies
+        for column in (lons, lats, mags, offsets):
+            _little_endian(column).tofile(bin_file)
+        bin_file.write(names)
+    return len(lons)
+
+
+def read_binary_file(filename) -> Dict[str, List]:
+    ''' the columns of a binary file, as lists '''
+    with open(filename, 'rb') as bin_file:
+        data = bin_file.read()
+    (magic, version, count, names_len) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != BINARY_VERSION:
+        raise ValueError("not a version {0} {1} file"
+                         .format(BINARY_VERSION, MAGIC.decode()))
+    pos = HEADER.size
+    columns = {}  # type: Dict[str, List]
+    for (name, typecode, n) in (("longitude", "f", count),
+                                ("latitude", "f", count),
+                                ("mag", "f", count),
+                                ("offsets", "I", count + 1)):
+        values = array(typecode)
+        values.frombytes(data[pos:pos + values.itemsize * n])
+        pos += values.itemsize * n
+        columns[name] = list(_little_endian(values))
+    names = data[pos:pos + names_len]
+    offsets = columns.pop("offsets")
+    columns["place"] = [names[offsets[i]:offsets[i + 1]].decode("utf8")
+                        for i in range(count)]
+    return columns
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Clusters of the locations for each zoom level, so that the maps draw
+a bounded number of marks where the locations are dense.
+  at each zoom, going from the deepest zoom up, the marks of the zoom
+    below are grouped with their neighbours within a radius in pixels
+  the marks are found through a grid index whose cells are one radius
+    wide, so only the 3 x 3 cells around a mark are searched
+  a cluster has the summed magnitude, the number of places, the
+    magnitude weighted centroid and the top org names of its members
+  each zoom level is written as a GeoJSON file
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List, Tuple
+import math
+import os
+from geojsonfile import collection_head, COLLECTION_TAIL, StreamWriter
+from geojsonfile import make_feature, feature_json, point_of
+from geotiles import MAX_LATITUDE
+
+default_minzoom = 1
+default_maxzoom = 10
+# marks closer than this, in pixels, are clustered
+default_radius = 40
+# org names kept in each cluster
+default_top_orgs = 10
+
+TILE_SIZE = 256
+
+
+def project(lon, lat) -> Tuple[float, float]:
+    ''' web mercator x, y, both from 0 to 1 '''
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = lon / 360.0 + 0.5
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return (x, y)
+
+
+def unproject(x, y) -> Tuple[float, float]:
+    lon = (x - 0.5) * 360.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return (lon, lat)
+
+
+class Cluster:
+    ''' one mark: a place, or a cluster of places '''
+
+    __slots__ = ("x", "y", "magnitude", "count", "orgs", "place")
+
+    def __init__(self, x, y, magnitude, count, orgs, place):
+        self.x = x
+        self.y = y
+        self.magnitude = magnitude
+        self.count = count
+        self.orgs = orgs
+        self.place = place
+
+
+def merge(members, top_orgs) -> Cluster:
+    ''' one cluster of the members, the first is the largest '''
+    if len(members) == 1:
+        return members[0]
+    magnitude = sum(member.magnitude for member in members)
+    x = sum(member.x * member.magnitude for member in members) / magnitude
+    y = sum(member.y * member.magnitude for member in members) / magnitude
+    orgs = {}  # type: Dict[str, int]
+    for member in members:
+        for (orgName, count) in member.orgs.items():
+            orgs[orgName] = orgs.get(orgName, 0) + count
+    if len(orgs) > top_orgs:
+        top = sorted(orgs.items(), key=lambda item: -item[1])[:top_orgs]
+        orgs = dict(top)
+    return Cluster(x, y, magnitude, sum(member.count for member in members),
+                   orgs, members[0].place)
+
+
+def cluster_level(marks, radius, top_orgs=default_top_orgs) -> List[Cluster]:
+    ''' group the marks within radius (in projected units) of each other
+
+    The largest marks are taken first, each claiming its unclaimed
+    neighbours.
+    '''
+    grid = {}  # type: Dict[Tuple[int, int], List[int]]
+    for (i, mark) in enumerate(marks):
+        cell = (int(mark.x / radius), int(mark.y / radius))
+        grid.setdefault(cell, []).append(i)
+
+    r2 = radius * radius
+    claimed = [False] * len(marks)
+    order = sorted(range(len(marks)), key=lambda i: -marks[i].magnitude)
+    clusters = []
+    for i in order:
+        if claimed[i]:
+            continue
+        claimed[i] = True
+        mark = marks[i]
+        members = [mark]
+        cx = int(mark.x / radius)
+        cy = int(mark.y / radius)
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for j in grid.get((gx, gy), ()):
+                    if claimed[j]:
+                        continue
+                    other = marks[j]
+                    dx = other.x - mark.x
+                    dy = other.y - mark.y
+                    if dx * dx + dy * dy <= r2:
+                        claimed[j] = True
+                        members.append(other)
+        clusters.append(merge(members, top_orgs))
+    return clusters
+
+
+def place_marks(all_data) -> List[Cluster]:
+    ''' a mark for each location that make_feature would write '''
+    marks = []
+    for addr in all_data:
+        geo_loc = all_data[addr]
+        point = point_of(geo_loc)
+        # a blank lat or lon in the input has no place on the map
+        if point is None or make_feature(geo_loc, False) is None:
+            continue
+        (x, y) = project(*point)
+        orgs = geo_loc.get("org names") or {}
+        marks.append(Cluster(x, y, geo_loc["magnitude"], 1, dict(orgs),
+                             geo_loc["address"]))
+    return marks
+
+
+def build_clusters(all_data, minzoom=default_minzoom,
+                   maxzoom=default_maxzoom, radius=default_radius,
+                   top_orgs=default_top_orgs) -> Dict[int, List[Cluster]]:
+    ''' the marks at each zoom level, from minzoom to maxzoom '''
+    levels = {}
+    marks = place_marks(all_data)
+    for zoom in range(maxzoom, minzoom - 1, -1):
+        marks = cluster_level(marks, radius / (TILE_SIZE * 2 ** zoom),
+                              top_orgs)
+        levels[zoom] = marks
+    return levels
+
+
+def cluster_feature(cluster, precision=None) -> Dict:
+    (lon, lat) = unproject(cluster.x, cluster.y)
+    if precision is not None:
+        (lon, lat) = (round(lon, precision), round(lat, precision))
+    properties = {"place": cluster.place,
+                  "mag": float(cluster.magnitude) / 10,
+                  "count": cluster.count}
+    if cluster.orgs:
+        properties["popupContent"] = cluster.orgs
+    return {"type": "Feature",
+            "properties": properties,
+            "geometry": {"type": "Point", "coordinates": [lon, lat]}}
+
+
+def cluster_filename(out_dir, zoom) -> str:
+    return os.path.join(out_dir, "clusters-{0}.geojson".format(zoom))
+
+
+def write_clusters(levels, out_dir, precision=None) -> None:
+    ''' one GeoJSON file of the marks at each zoom level '''
+    os.makedirs(out_dir, exist_ok=True)
+    separator = ", " if precision is None else ","
+    for (zoom, marks) in sorted(levels.items()):
+        with open(cluster_filename(out_dir, zoom), 'w',
+                  encoding='utf8') as json_file:
+            features = StreamWriter(json_file,
+                                    collection_head(len(marks), precision),
+                                    COLLECTION_TAIL, separator)
+            for cluster in marks:
+                features.item(feature_json(cluster_feature(cluster,
+                                                           precision),
+                                           precision))
+            features.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Merge the addresses which were geocoded to the same, or nearly the
+same, point, such as "Ottawa Ontario Canada" and "Ottawa Canada".
+  the points are put in a grid index of cells one merge distance wide,
+    on the unit sphere so the poles and the date line need no care
+  the largest records are taken first, each taking in the records
+    within the distance of it, found in the 3 x 3 x 3 cells around it
+  the merged record keeps the point and address of the largest record,
+    with the summed magnitude and org name counts
+  only a copy for the outputs is merged, the locations DB keeps every
+    address as it was geocoded
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List, Tuple
+import math
+from geojsonfile import point_of
+from records import LocRecord
+
+EARTH_RADIUS = 6371008.8  # metres
+
+
+def unit_vector(lon, lat) -> Tuple[float, float, float]:
+    lon = math.radians(lon)
+    lat = math.radians(lat)
+    cos_lat = math.cos(lat)
+    return (cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat))
+
+
+def chord(distance) -> float:
+    ''' the straight line length between two points distance metres apart '''
+    return 2.0 * math.sin(min(distance / EARTH_RADIUS, math.pi) / 2.0)
+
+
+def mergeable(geo_loc) -> bool:
+    ''' a located record which is counted, a blank lat or lon is not '''
+    return point_of(geo_loc) is not None and geo_loc.get("magnitude", 0) > 0
+
+
+def merge_groups(all_data, distance) -> Dict[str, List[str]]:
+    ''' {kept address: [the addresses merged into it]} '''
+    addrs = [addr for addr in all_data if mergeable(all_data[addr])]
+    points = [unit_vector(*point_of(all_data[addr])) for addr in addrs]
+    cell_size = chord(distance)
+    if cell_size <= 0:
+        return {}
+
+    grid = {}  # type: Dict[Tuple[int, int, int], List[int]]
+    cells = []
+    for (i, point) in enumerate(points):
+        cell = tuple(int(math.floor(c / cell_size)) for c in point)
+        cells.append(cell)
+        grid.setdefault(cell, []).append(i)
+
+    limit = cell_size * cell_size
+    claimed = [False] * len(addrs)
+    # the largest first, and in all_data order among equals
+    order = sorted(range(len(addrs)),
+                   key=lambda i: -all_data[addrs[i]]["magnitude"])
+    groups = {}
+    for i in order:
+        if claimed[i]:
+            continue
+        claimed[i] = True
+        (px, py, pz) = points[i]
+        (cx, cy, cz) = cells[i]
+        merged = []
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for gz in (cz - 1, cz, cz + 1):
+                    for j in grid.get((gx, gy, gz), ()):
+                        if claimed[j]:
+                            continue
+                        (qx, qy, qz) = points[j]
+                        d2 = ((qx - px) ** 2 + (qy - py) ** 2 +
+                              (qz - pz) ** 2)
+                        if d2 <= limit:
+                            claimed[j] = True
+                            merged.append(j)
+        if merged:
+            merged.sort()
+            groups[addrs[i]] = [addrs[j] for j in merged]
+    return groups
+
+
+def consolidate(all_data, distance) -> Tuple[Dict, int]:
+    ''' a copy of all_data with the co-located records merged
+
+    Returns (the copy, the number of records merged away).  Records
+    which are not merged are shared with all_data, not copied.
+    '''
+    groups = merge_groups(all_data, distance)
+    dropped = set()
+    for merged in groups.values():
+        dropped.update(merged)
+
+    out = {}
+    for addr in all_data:
+        if addr in dropped:
+            continue
+        merged = groups.get(addr)
+        if merged is None:
+            out[addr] = all_data[addr]
+            continue
+        geo_loc = LocRecord.from_dict(all_data[addr].items())
+        for other_addr in merged:
+            other = all_data[other_addr]
+            geo_loc["magnitude"] += other["magnitude"]
+            for (orgName, count) in (other.get("org names") or {}).items():
+                geo_loc.add_org_name(orgName, count)
+        out[addr] = geo_loc
+    return (out, len(dropped))
@@ -0,0 +1,34 @@
+''' pytest fixtures shared by the test files '''
+import os
+from shutil import copyfile
+import pytest
+from addLatLong import AcqInfo
+from fakegeocoder import FakeGeocoder
+
+# init contents of the locations DB
+test_initlocFileName = "testData/testInitLoc.json"
+
+
+@pytest.fixture
+def make_acq(tmp_path):
+    ''' a factory of AcqInfo with a fake geocoder, writing into tmp_path
+
+    The locations DB, loc.json, starts as a copy of testInitLoc.json
+    unless the test wrote one first, and is kept between the AcqInfo
+    made in one test.  Keyword arguments set attributes of the AcqInfo.
+    '''
+    loc_fn = str(tmp_path / "loc.json")
+
+    def make(**settings):
+        if not os.path.exists(loc_fn):
+            copyfile(test_initlocFileName, loc_fn)
+        a1 = AcqInfo(loc_fn,
+                     str(tmp_path / "counts.json"),
+                     str(tmp_path / "counts.geojson"),
+                     str(tmp_path / "inst.json"),
+                     str(tmp_path / "inst.geojson"))
+        a1.geocoder = FakeGeocoder()
+        for (name, value) in settings.items():
+            setattr(a1, name, value)
+        return a1
+    return make
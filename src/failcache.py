@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Remember the addresses which failed to geocode, so that each run spends
+its Google lookups on the addresses which may still succeed.
+  a failed lookup is kept with its error, the attempts so far and the
+    time it may be tried again, which doubles with each failure
+  an address Google has no result for (ZERO_RESULTS), or refuses as a
+    bad query, is quarantined: it is not tried again, and is listed in
+    a report so it can be fixed in the spreadsheet
+  an error which is not the address's fault, such as a bad API key or
+    the daily quota running out, is not held against it
+  a quarantined address is tried again once it is removed from the
+    file, or the whole file is removed
+  runs at the same time share the file: each saves the addresses it
+    tried, under a lock, into what the others saved
+
+Usage:
+  python3 failcache.py [addLatLong.failures.json]
+      prints the report of the quarantined addresses
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List, Optional, Set, Tuple
+import csv
+import json
+import os
+import sys
+import time
+import geopy.exc
+from locationstore import locked
+
+default_failuresFileName = 'addLatLong.failures.json'
+default_reportFileName = 'quarantine.csv'
+
+default_backoff = 86400.0          # seconds, a day after the first failure
+default_max_backoff = 30 * 86400.0  # and never more than a month
+
+# the error recorded when the geocoder found nothing
+ZERO_RESULTS = "ZERO_RESULTS"
+
+# errors which will come back for this address however often it is tried
+PERMANENT_ERRORS = (geopy.exc.GeocoderQueryError,)
+
+# errors which say nothing about the address
+NOT_THE_ADDRESS = (geopy.exc.ConfigurationError,
+                   geopy.exc.GeocoderAuthenticationFailure,
+                   geopy.exc.GeocoderInsufficientPrivileges,
+                   geopy.exc.GeocoderQuotaExceeded)
+
+REPORT_FIELDS = ("address", "error", "attempts", "first failed",
+                 "last failed", "rows")
+
+
+def _when(seconds) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(seconds))
+
+
+class FailureCache:
+    ''' {addr: entry} of the addresses which failed, kept in a json file
+
+    An entry has the error name, the number of failed attempts, the
+    times of the first and the last failure, and either "retry", the
+    time it may be tried again, or "quarantined".
+    '''
+
+    def __init__(self, filename, backoff=default_backoff,
+                 max_backoff=default_max_backoff, clock=time.time):
+        self.filename = filename
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.entries = self._read()  # type: Dict[str, Dict]
+        # the addresses recorded or forgotten since the file was read
+        self.changed = set()  # type: Set[str]
+        self.skipped = 0
+
+    def _read(self) -> Dict[str, Dict]:
+        if self.filename is None or not os.path.exists(self.filename):
+            return {}
+        with open(self.filename) as json_file:
+            return json.load(json_file)
+
+    def is_quarantined(self, addr) -> bool:
+        entry = self.entries.get(addr)
+        return entry is not None and entry.get("quarantined", False)
+
+    def due(self, addr, now=None) -> bool:
+        ''' addr is not quarantined or backing off '''
+        entry = self.entries.get(addr)
+        if entry is None:
+            return True
+        if entry.get("quarantined", False):
+            return False
+        if now is None:
+            now = self.clock()
+        return entry["retry"] <= now
+
+    def eligible(self, addrs) -> List[str]:
+        ''' the addresses which are not quarantined or backing off '''
+        now = self.clock()
+        found = []
+        for addr in addrs:
+            if not self.due(addr, now):
+                self.skipped += 1
+                continue
+            found.append(addr)
+        return found
+
+    def record(self, addr, error) -> Optional[Dict]:
+        ''' a failed lookup, error is None when nothing was found '''
+        if isinstance(error, NOT_THE_ADDRESS):
+            return None
+        now = self.clock()
+        self.changed.add(addr)
+        entry = self.entries.get(addr)
+        if entry is None:
+            entry = self.entries[addr] = {"attempts": 0, "first": now}
+        entry["attempts"] += 1
+        entry["last"] = now
+        if error is None:
+            entry["error"] = ZERO_RESULTS
+        else:
+            entry["error"] = type(error).__name__
+        if error is None or isinstance(error, PERMANENT_ERRORS):
+            entry["quarantined"] = True
+            entry.pop("retry", None)
+        else:
+            delay = self.backoff * 2 ** (entry["attempts"] - 1)
+            entry["retry"] = now + min(delay, self.max_backoff)
+        return entry
+
+    def forget(self, addr) -> None:
+        ''' the address was found after all '''
+        if self.entries.pop(addr, None) is not None:
+            self.changed.add(addr)
+
+    def quarantined(self) -> List[Tuple[str, Dict]]:
+        return [(addr, entry) for (addr, entry) in self.entries.items()
+                if entry.get("quarantined", False)]
+
+    def save(self) -> None:
+        ''' add the addresses this run tried to those saved by others '''
+        if self.filename is None:
+            return
+        with locked(self.filename):
+            entries = self._read()
+            for addr in self.changed - set(self.entries):
+                entries.pop(addr, None)
+            # in the order they first failed
+            for (addr, entry) in self.entries.items():
+                if addr in self.changed:
+                    entries[addr] = entry
+            tmp_filename = self.filename + ".tmp"
+            with open(tmp_filename, 'w', encoding='utf8') as json_file:
+                json.dump(entries, json_file, indent=1)
+            os.replace(tmp_filename, self.filename)
+        self.entries = entries
+        self.changed = set()
+
+    def report_rows(self, all_data=None) -> List[List]:
+        ''' a row for each quarantined address, the most used first
+
+        rows is the number of spreadsheet rows with the address, when
+        all_data has its magnitude.
+        '''
+        rows = []
+        for (addr, entry) in self.quarantined():
+            count = ""
+            if all_data is not None and addr in all_data:
+                count = all_data[addr].get("magnitude", "")
+            rows.append([addr, entry["error"], entry["attempts"],
+                         _when(entry["first"]), _when(entry["last"]),
+                         count])
+        rows.sort(key=lambda row: -(row[5] or 0))
+        return rows
+
+    def write_report(self, filename, all_data=None) -> int:
+        ''' the quarantined addresses as csv, returns how many '''
+        rows = self.report_rows(all_data)
+        with open(filename, 'w', newline='', encoding='utf8') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(REPORT_FIELDS)
+            writer.writerows(rows)
+        return len(rows)
+
+
+def main(argv: List[str]) -> int:
+    filename = argv[1] if len(argv) > 1 else default_failuresFileName
+    if not os.path.exists(filename):
+        print("no failures file {0}".format(filename))
+        return 1
+    cache = FailureCache(filename)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(REPORT_FIELDS)
+    writer.writerows(cache.report_rows())
+    return 0
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    sys.exit(main(sys.argv))
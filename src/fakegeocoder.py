@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+A local stand-in for the GoogleV3 geocoder, for tests and benchmarks.
+  answers every address with a made up but repeatable lat lon
+  can add latency to each request
+  can fail some addresses a number of times before answering
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from collections import namedtuple
+import threading
+import time
+import zlib
+import geopy.exc
+
+FakeLocation = namedtuple("FakeLocation", "latitude longitude address")
+
+
+def fake_coords(addr):
+    ''' a repeatable lat lon for an address '''
+    crc = zlib.crc32(addr.encode("utf8"))
+    latitude = (crc % 17000) / 100.0 - 85.0
+    longitude = (crc // 17000 % 36000) / 100.0 - 180.0
+    return (latitude, longitude)
+
+
+class FakeGeocoder:
+    ''' answers geocode() like geopy does, without the network
+
+    failures maps an address to how many times it should fail first;
+    a negative count fails it every time.  Addresses in no_match
+    get None, as geopy gives for ZERO_RESULTS.
+    '''
+
+    def __init__(self, latency=0.0, failures=None, error=None,
+                 no_match=()):
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.error = error or geopy.exc.GeocoderTimedOut
+        self.no_match = set(no_match)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def geocode(self, query, timeout=None):
+        with self.lock:
+            self.calls.append(query)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failures = self.failures.get(query, 0)
+            if failures > 0:
+                self.failures[query] = failures - 1
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if failures != 0:
+                raise self.error("fake failure for " + query)
+            if query in self.no_match:
+                return None
+            (latitude, longitude) = fake_coords(query)
+            return FakeLocation(latitude, longitude, query)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
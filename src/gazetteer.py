@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Offline resolver for addresses which name only a well known place.
+  read a local gazetteer file of countries, provinces/states and cities
+  index the places by the canonical key of their address
+  answer those addresses without asking Google
+  keep the keys sorted too, so the places whose key starts with some
+    text are found by bisection (resolve only takes whole keys, so a
+    site is never put at the centroid of a place it merely starts with)
+  keep a binary snapshot of the index so later runs start quickly
+
+The gazetteer is a csv file with a header row and the columns
+  city, subdivision, country, latitude, longitude
+A country row leaves city and subdivision blank, a province row leaves
+city blank.  A city row is also found without its subdivision.
+
+Usage:
+  python3 gazetteer.py gazetteer.csv text
+      prints the places whose normalised address starts with text
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List, Optional
+from bisect import bisect_left
+import csv
+import os
+import pickle
+import sys
+import time
+from addressnorm import canonical_key
+
+SNAPSHOT_SUFFIX = ".pickle"
+# bump when the index layout or canonical_key changes
+SNAPSHOT_VERSION = 2
+
+
+def build_index(filename) -> Dict:
+    ''' canonical key -> (latitude, longitude, address) '''
+    index = {}
+    with open(filename, newline='', encoding='utf8') as csv_file:
+        for row in csv.DictReader(csv_file):
+            parts = [row["city"].strip(),
+                     row["subdivision"].strip(),
+                     row["country"].strip()]
+            names = [part for part in parts if part != ""]
+            if not names:
+                continue
+            place = (float(row["latitude"]), float(row["longitude"]),
+                     ", ".join(names))
+            index.setdefault(canonical_key(" ".join(names)), place)
+            if parts[0] != "" and parts[1] != "":
+                # a city is often given without its province
+                city_country = " ".join([parts[0], parts[2]])
+                index.setdefault(canonical_key(city_country), place)
+    return index
+
+
+class Gazetteer:
+    ''' in-memory index of the gazetteer places '''
+
+    def __init__(self, filename):
+        start = time.perf_counter()
+        snapshot = load_snapshot(filename)
+        self.from_snapshot = snapshot is not None
+        if snapshot is None:
+            index = build_index(filename)
+            snapshot = (index, sorted(index))
+            save_snapshot(filename, *snapshot)
+        (self.index, self.keys) = snapshot
+        self.load_seconds = time.perf_counter() - start
+
+    def resolve(self, addr) -> Optional[Dict]:
+        ''' a locations DB record for addr, or None if not a known place '''
+        place = self.index.get(canonical_key(addr))
+        if place is None:
+            return None
+        (latitude, longitude, address) = place
+        return {"latitude": latitude,
+                "longitude": longitude,
+                "address": address}
+
+    def starting_with(self, text, limit=None) -> List[Dict]:
+        ''' the places whose canonical key starts with that of text,
+        in key order, at most limit of them '''
+        prefix = canonical_key(text) if text.strip() else ""
+        found = []
+        for i in range(bisect_left(self.keys, prefix), len(self.keys)):
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            if limit is not None and len(found) >= limit:
+                break
+            (latitude, longitude, address) = self.index[key]
+            found.append({"key": key,
+                          "latitude": latitude,
+                          "longitude": longitude,
+                          "address": address})
+        return found
+
+
+def load_snapshot(filename):
+    ''' the prebuilt (index, sorted keys), if newer than the gazetteer '''
+    snapshot = filename + SNAPSHOT_SUFFIX
+    try:
+        if os.path.getmtime(snapshot) < os.path.getmtime(filename):
+            return None
+        with open(snapshot, 'rb') as snap_file:
+            (version, index, keys) = pickle.load(snap_file)
+    except Exception:
+        # missing, stale or damaged: it is rebuilt from the csv
+        return None
+    if version != SNAPSHOT_VERSION:
+        return None
+    return (index, keys)
+
+
+def save_snapshot(filename, index, keys) -> None:
+    snapshot = filename + SNAPSHOT_SUFFIX
+    try:
+        with open(snapshot, 'wb') as snap_file:
+            pickle.dump((SNAPSHOT_VERSION, index, keys), snap_file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as err:
+        print("could not save the gazetteer snapshot: {0}".format(err))
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 3:
+        print(__doc__)
+        return 1
+    for place in Gazetteer(argv[1]).starting_with(argv[2]):
+        print("{0}\t{1}, {2}".format(place["address"], place["latitude"],
+                                     place["longitude"]))
+    return 0
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    sys.exit(main(sys.argv))
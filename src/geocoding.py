@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Concurrent geocoding of many addresses.
+  a small pool of threads shares one geocoder
+  a rate limiter spaces the requests out
+  the number of requests in flight is bounded
+  timed out or unavailable requests are retried with backoff
+  results come back in the order the addresses were given
+  a GeocodeQueue takes the addresses one at a time while they are still
+    being found, so the lookups overlap the reading of the spreadsheet
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Set
+import queue
+import threading
+import time
+import geopy.exc
+
+default_workers = 4
+default_rate = 10.0      # requests per second
+default_timeout = 10     # seconds, for each request
+default_retries = 2
+default_backoff = 0.5    # seconds, doubled on each retry
+
+# errors worth trying again, the others will fail the same way next time
+RETRY_ERRORS = (geopy.exc.GeocoderTimedOut,
+                geopy.exc.GeocoderUnavailable,
+                geopy.exc.GeocoderRateLimited)
+
+
+class RateLimiter:
+    ''' let at most rate calls per second through, across all threads '''
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 0.0
+        if rate:
+            self.interval = 1.0 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if self.interval <= 0:
+            return
+        with self.lock:
+            now = self.clock()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            self.sleep(slot - now)
+
+
+class GeocodeResult:
+    ''' outcome of geocoding one address '''
+
+    def __init__(self, addr):
+        self.addr = addr
+        self.location = None
+        self.error = None
+        self.attempts = 0
+        # time spent waiting on the geocoder, over all the attempts
+        self.seconds = 0.0
+
+
+def geocode_one(geocoder, addr, limiter, timeout, retries, backoff):
+    ''' geocode one address, retrying the errors that may go away '''
+    result = GeocodeResult(addr)
+    while True:
+        limiter.wait()
+        result.attempts += 1
+        start = time.perf_counter()
+        try:
+            result.location = geocoder.geocode(addr, timeout=timeout)
+            result.error = None
+            result.seconds += time.perf_counter() - start
+            return result
+        except RETRY_ERRORS as err:
+            result.seconds += time.perf_counter() - start
+            result.error = err
+            if result.attempts > retries:
+                return result
+            time.sleep(backoff * 2 ** (result.attempts - 1))
+        except Exception as err:
+            result.seconds += time.perf_counter() - start
+            result.error = err
+            return result
+
+
+def geocode_all(geocoder,
+                addrs,
+                workers=default_workers,
+                rate=default_rate,
+                timeout=default_timeout,
+                retries=default_retries,
+                backoff=default_backoff,
+                on_results=None) -> List[GeocodeResult]:
+    ''' geocode the addresses concurrently, results are in addrs order
+
+    on_results is called in this thread with each batch of results as
+    they complete, so they can be saved before the whole list is done.
+    '''
+    limiter = RateLimiter(rate)
+    if workers <= 1:
+        results = []
+        for addr in addrs:
+            result = geocode_one(geocoder, addr, limiter,
+                                 timeout, retries, backoff)
+            if on_results is not None:
+                on_results([result])
+            results.append(result)
+        return results
+
+    # bound the requests in flight, so a long list is not all queued at once
+    max_in_flight = workers * 2
+    futures = []
+    order = {}  # type: Dict
+    pending = set()  # type: Set
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for addr in addrs:
+            if len(pending) >= max_in_flight:
+                (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+                _report(done, order, on_results)
+            future = pool.submit(geocode_one, geocoder, addr, limiter,
+                                 timeout, retries, backoff)
+            order[future] = len(futures)
+            pending.add(future)
+            futures.append(future)
+        (done, pending) = wait(pending)
+        _report(done, order, on_results)
+    return [future.result() for future in futures]
+
+
+def _report(done, order, on_results):
+    ''' hand a batch of completed results over, in addrs order '''
+    if on_results is None or not done:
+        return
+    batch = sorted(done, key=lambda future: order[future])
+    on_results([future.result() for future in batch])
+
+
+class GeocodeQueue:
+    ''' worker threads geocode the addresses as they are put on the queue
+
+    The results of finish() are in the order the addresses were put.
+    '''
+
+    def __init__(self, geocoder,
+                 workers=default_workers,
+                 rate=default_rate,
+                 timeout=default_timeout,
+                 retries=default_retries,
+                 backoff=default_backoff):
+        self.geocoder = geocoder
+        self.limiter = RateLimiter(rate)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue()  # type: queue.Queue
+        self.addrs = []  # type: List[str]
+        self.taken = set()  # type: Set[str]
+        self.results = {}  # type: Dict[str, GeocodeResult]
+        self.lock = threading.Lock()
+        # daemon threads, so a failed scan cannot leave the process hanging
+        self.threads = [threading.Thread(target=self._work, daemon=True)
+                        for i in range(max(1, workers))]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, addr) -> bool:
+        ''' queue addr for a lookup, returns whether it was taken '''
+        if addr in self.taken:
+            return False
+        self.taken.add(addr)
+        self.addrs.append(addr)
+        self.queue.put(addr)
+        return True
+
+    def _work(self):
+        while True:
+            addr = self.queue.get()
+            if addr is None:
+                return
+            try:
+                result = geocode_one(self.geocoder, addr, self.limiter,
+                                     self.timeout, self.retries, self.backoff)
+            except Exception as err:
+                result = GeocodeResult(addr)
+                result.error = err
+            with self.lock:
+                self.results[addr] = result
+
+    def finish(self) -> List[GeocodeResult]:
+        ''' wait for the lookups queued so far, and stop the workers '''
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        return [self.results[addr] for addr in self.addrs]
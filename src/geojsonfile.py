@@ -5,6 +5,10 @@ Handy utility to reformat the locations file for use in a d3js map.
   for each location, generate a feature record
   write the features data file
     (two versions of this file, with and without the Institution Names)
+  the features are written one at a time, and all the output files
+    can be written together in one pass over the locations
+  in compact mode the coordinates are rounded, the dummy altitude, id
+    and metadata are left out, and no spaces are written
 """
 
 __author__ = "Richard Leir"
@@ -16,58 +20,183 @@ __maintainer__ = "Richard Leir"
 __email__ = "rleir at leirtech ddot com"
 __status__ = "Production"
 
-from typing import Dict, List
+from typing import Dict, Optional, Tuple
 import json
+import math
 
 
-def write_geojson_file(all_data, filename, and_properties) -> None:
-    ''' generate feature rec with lat lon position for each address '''
+# separators of the compact GeoJSON
+COMPACT_SEPARATORS = (",", ":")
+
 
-    fea_data = {}  # type: Dict
-    fea_data["type"] = "FeatureCollection"
+def collection_head(count, precision=None) -> str:
+    ''' the start of the FeatureCollection, up to the first feature '''
+    if precision is not None:
+        return ('{"type":"FeatureCollection","metadata":{"count":' +
+                str(count) + '},"features":[')
     metadata = {}  # some dummy metadata
     metadata["generated"] = 1559586926000   # dummy
     metadata["url"] = "https://zzzz/"       # dummy
     metadata["title"] = "zzz"               # dummy
     metadata["status"] = 200                # dummy
     metadata["api"] = "1.8.1"               # dummy
-    metadata["count"] = len(all_data)
-    fea_data["metadata"] = metadata
+    metadata["count"] = count
+    return ('{"type": "FeatureCollection", "metadata": ' +
+            json.dumps(metadata) + ', "features": [')
 
-    features = []
-    fea_data["features"] = features
 
-    for addr in all_data:
-        feature = {}
-        properties = {}
-        geometry = {}
+COLLECTION_TAIL = ']}'
 
-        if "address" not in all_data[addr]:  # check for key existence
-            continue    # skip this record
-        if "magnitude" not in all_data[addr]:  # check for key existence
-            continue    # skip this record
-        if all_data[addr]["magnitude"] <= 0:  # check for unused location
-            continue    # skip this record
 
-        properties["place"] = all_data[addr]["address"]
-        properties["mag"] = float(all_data[addr]["magnitude"])/10
+def point_of(geo_loc) -> Optional[Tuple[float, float]]:
+    ''' the (longitude, latitude) of a record, None unless both are numbers
 
-        if (and_properties and "org names" in all_data[addr]):
-            properties["popupContent"] = all_data[addr]["org names"]
+    A blank Latitude or Longitude cell in the input leaves "" or None.
+    '''
+    point = (geo_loc.get("longitude"), geo_loc.get("latitude"))
+    for value in point:
+        if (not isinstance(value, (int, float)) or isinstance(value, bool) or
+                not math.isfinite(value)):
+            return None
+    return point
 
-        coordinates = []
-        coordinates.append(all_data[addr]["longitude"])
 
-        coordinates.append(all_data[addr]["latitude"])
-        coordinates.append(9)
-        geometry["type"] = "Point"
-        geometry["coordinates"] = coordinates
+def make_feature(geo_loc, and_properties, precision=None) -> Optional[Dict]:
+    ''' generate feature rec with lat lon position for one address
+
+    With a precision, the lat lon are rounded to that many decimals, and
+    the dummy altitude and id are left out.
+    '''
+    feature = {}  # type: Dict
+    properties = {}  # type: Dict
+    geometry = {}  # type: Dict
 
+    if "address" not in geo_loc:  # check for key existence
+        return None    # skip this record
+    if "magnitude" not in geo_loc:  # check for key existence
+        return None    # skip this record
+    if geo_loc["magnitude"] <= 0:  # check for unused location
+        return None    # skip this record
+
+    properties["place"] = geo_loc["address"]
+    properties["mag"] = float(geo_loc["magnitude"])/10
+
+    if (and_properties and "org names" in geo_loc):
+        properties["popupContent"] = geo_loc["org names"]
+
+    if precision is not None:
+        point = point_of(geo_loc)
+        if point is None:
+            return None    # skip a record with a blank lat or lon
+        geometry["type"] = "Point"
+        geometry["coordinates"] = [round(point[0], precision),
+                                   round(point[1], precision)]
         feature["type"] = "Feature"
         feature["properties"] = properties
         feature["geometry"] = geometry
-        feature["id"] = "zzz"
-        features.append(feature)
+        return feature
+
+    coordinates = []
+    coordinates.append(geo_loc["longitude"])
+
+    coordinates.append(geo_loc["latitude"])
+    coordinates.append(9)
+    geometry["type"] = "Point"
+    geometry["coordinates"] = coordinates
+
+    feature["type"] = "Feature"
+    feature["properties"] = properties
+    feature["geometry"] = geometry
+    feature["id"] = "zzz"
+    return feature
+
+
+def feature_json(feature, precision=None) -> str:
+    if precision is not None:
+        return json.dumps(feature, separators=COMPACT_SEPARATORS)
+    return json.dumps(feature)
+
+
+class StreamWriter:
+    ''' writes a json object or list one item at a time '''
 
+    def __init__(self, out_file, head, tail, separator=", "):
+        self.out_file = out_file
+        self.tail = tail
+        self.separator = separator
+        self.first = True
+        out_file.write(head)
+
+    def item(self, text) -> None:
+        if not self.first:
+            self.out_file.write(self.separator)
+        self.first = False
+        self.out_file.write(text)
+
+    def close(self) -> None:
+        self.out_file.write(self.tail)
+
+
+def write_geojson_file(all_data, filename, and_properties,
+                       precision=None) -> None:
+    ''' generate feature rec with lat lon position for each address '''
     with open(filename, 'w', encoding='utf8') as json_file:
-        json.dump(fea_data, json_file)
+        features = StreamWriter(json_file,
+                                collection_head(len(all_data), precision),
+                                COLLECTION_TAIL,
+                                _item_separator(precision))
+        for addr in all_data:
+            feature = make_feature(all_data[addr], and_properties, precision)
+            if feature is not None:
+                features.item(feature_json(feature, precision))
+        features.close()
+
+
+def _item_separator(precision) -> str:
+    return ", " if precision is None else ","
+
+
+def write_all_outputs(all_data,
+                      locInstFilename,
+                      locCountsFilename,
+                      locInstGeoJSON,
+                      locCountsGeoJSON,
+                      precision=None) -> None:
+    ''' write the json and GeoJSON files, with and without org names
+
+    The locations are walked once, and each record is written to all
+    four files before going on to the next one.  A precision gives
+    compact GeoJSON files, see make_feature.
+    '''
+    with open(locInstFilename, 'w', encoding='utf8') as inst_file, \
+            open(locCountsFilename, 'w', encoding='utf8') as counts_file, \
+            open(locInstGeoJSON, 'w', encoding='utf8') as inst_geo_file, \
+            open(locCountsGeoJSON, 'w', encoding='utf8') as counts_geo_file:
+
+        head = collection_head(len(all_data), precision)
+        separator = _item_separator(precision)
+        inst_json = StreamWriter(inst_file, '{', '}')
+        counts_json = StreamWriter(counts_file, '{', '}')
+        inst_geo = StreamWriter(inst_geo_file, head, COLLECTION_TAIL,
+                                separator)
+        counts_geo = StreamWriter(counts_geo_file, head, COLLECTION_TAIL,
+                                  separator)
+
+        for addr in all_data:
+            geo_loc = all_data[addr]
+            key = json.dumps(addr) + ": "
+            inst_json.item(key + json.dumps(dict(geo_loc.items())))
+            counts_loc = {k: v for (k, v) in geo_loc.items()
+                          if k != "org names"}
+            counts_json.item(key + json.dumps(counts_loc))
+
+            feature = make_feature(geo_loc, False, precision)
+            if feature is None:
+                continue
+            counts_geo.item(feature_json(feature, precision))
+            if "org names" in geo_loc:
+                feature["properties"]["popupContent"] = geo_loc["org names"]
+            inst_geo.item(feature_json(feature, precision))
+
+        for writer in (inst_json, counts_json, inst_geo, counts_geo):
+            writer.close()
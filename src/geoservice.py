@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+A local HTTP service for geocoding and counting address rows, so that
+this tool and connection-map can share one locations DB and one
+geocoder instead of each reading locations.json and calling Google.
+  POST /geocode    {"addresses": [addr, ...]}
+                   gives {"results": {addr: record or null}}
+  POST /aggregate  {"rows": [[header cells], [cells], ...]}
+                   rows laid out like a sheet of input.xlsx, gives the
+                   GeoJSON of the counted and located addresses
+  GET  /stats      cache hits, misses and geocoder calls
+  hot addresses are answered from a bounded LRU cache
+  concurrent lookups of one address make one call to the geocoder
+  an address which failed is not looked up again until it is due, and
+    one with no result not at all; the failures file (see failcache.py)
+    and the daily limit (see quota.py) are shared with addLatLong.py
+  one request makes at most --max-lookups geocoder calls, the addresses
+    left over are listed as "deferred" in its reply
+  one geocoder is kept for the life of the service, so its HTTP
+    connections are pooled and reused
+  the new geocodes, failures and lookups used are saved after each
+    request which made geocoder calls, and when the service is stopped
+    by ^C or SIGTERM
+
+Usage:
+  python3 geoservice.py [--port 8765] [--locations locations.sqlite]
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import signal
+import threading
+from geopy.geocoders import GoogleV3    # pip install geopy
+from addLatLong import AcqInfo
+import addLatLong
+from failcache import FailureCache, default_failuresFileName
+from fakegeocoder import FakeGeocoder
+from geocoding import RateLimiter, geocode_one, default_workers
+from geocoding import default_rate, default_timeout, default_retries
+from geocoding import default_backoff
+from geojsonfile import make_feature
+from locationstore import open_location_store
+from quota import GeocodeQuota, order_pending, default_quotaFileName
+from records import OrgNameTable, record_class
+from sheetcolumns import find_header, row_chunks
+
+default_port = 8765
+default_cache_size = 10000
+# geocoder calls one request may make
+default_max_lookups = 100
+
+# a request body larger than this is refused
+MAX_BODY = 16 << 20
+
+# the json values which may be cells of /aggregate rows
+CELL_TYPES = (str, int, float, type(None))
+
+
+class LRUCache:
+    ''' the most recently used records, at most maxsize of them '''
+
+    def __init__(self, maxsize=default_cache_size):
+        self.maxsize = maxsize
+        self.items = OrderedDict()  # type: OrderedDict
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Dict]:
+        with self.lock:
+            value = self.items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None  # type: Optional[BaseException]
+
+
+class SingleFlight:
+    ''' concurrent calls for one key share the first caller's result '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}  # type: Dict[str, _Call]
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+
+# what _fetch gives for an address it had no lookups left for
+DEFERRED = object()
+
+
+class _Budget:
+    ''' the geocoder calls one request may still make, None for no limit '''
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            if self.calls is None:
+                return True
+            if self.calls <= 0:
+                return False
+            self.calls -= 1
+            return True
+
+
+class GeocodeService:
+    ''' looks up addresses: cache, then locations DB, then the geocoder '''
+
+    def __init__(self, store, geocoder, cache_size=default_cache_size,
+                 workers=default_workers, rate=default_rate,
+                 timeout=default_timeout, retries=default_retries,
+                 backoff=default_backoff, failures=None, quota=None,
+                 max_lookups=default_max_lookups):
+        self.store = store
+        self.geocoder = geocoder
+        self.cache = LRUCache(cache_size)
+        self.flight = SingleFlight()
+        self.limiter = RateLimiter(rate)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        # the store is not shared between threads without this
+        self.store_lock = threading.Lock()
+        # the addresses which failed, and the lookups made today
+        self.failure_cache = failures or FailureCache(None)
+        self.quota = quota or GeocodeQuota(None)
+        self.max_lookups = max_lookups
+        self.geocoder_calls = 0
+        self.failures = 0
+        self.failures_skipped = 0
+        self.deferred = 0
+        # the new geocodes, saved by flush to a locations.json store
+        self.found = {}  # type: Dict[str, Dict]
+        # geocoder calls made since the last flush
+        self.unsaved = 0
+
+    def lookup(self, addr) -> Optional[Dict]:
+        ''' the location record of addr, or None if it was not found '''
+        rec = self.cache.get(addr)
+        if rec is not None:
+            return rec
+        rec = self._lookup_miss(addr)
+        self.flush()
+        return None if rec is DEFERRED else rec
+
+    def _lookup_miss(self, addr, budget=None):
+        return self.flight.do(addr, lambda: self._fetch(addr, budget))
+
+    def _fetch(self, addr, budget=None):
+        ''' the record of addr, None if not found, or DEFERRED '''
+        with self.store_lock:
+            rec = self.store.get(addr)
+            if rec is not None and "latitude" in rec:
+                self.cache.put(addr, rec)
+                return rec
+            if not self.failure_cache.due(addr):
+                self.failures_skipped += 1
+                return None
+            if (self.quota.remaining_today() == 0 or
+                    (budget is not None and not budget.take())):
+                self.deferred += 1
+                return DEFERRED
+            # held now, so that other threads see it
+            self.quota.use(1)
+
+        result = geocode_one(self.geocoder, addr, self.limiter,
+                             self.timeout, self.retries, self.backoff)
+        location = result.location
+        with self.store_lock:
+            self.geocoder_calls += result.attempts
+            self.unsaved += 1
+            self.quota.use(result.attempts - 1)
+            if location is None:
+                self.failures += 1
+                self.failure_cache.record(addr, result.error)
+                return None
+            self.failure_cache.forget(addr)
+            self.quota.located(addr)
+            rec = {"latitude": location.latitude,
+                   "longitude": location.longitude,
+                   "address": location.address}
+            self.store.put_many([(addr, rec)])
+            self.found[addr] = rec
+        self.cache.put(addr, rec)
+        return rec
+
+    def lookup_many(self, addrs, deferred=None) -> Dict[str, Optional[Dict]]:
+        ''' look up the addresses, the misses concurrently
+
+        At most max_lookups of them go to the geocoder, the first ones in
+        addrs; the others are None, and are added to deferred.
+        '''
+        found = {}
+        misses = []
+        for addr in dict.fromkeys(addrs):
+            rec = self.cache.get(addr)
+            if rec is None:
+                misses.append(addr)
+            else:
+                found[addr] = rec
+        budget = _Budget(self.max_lookups)
+        for (addr, rec) in zip(misses, self.pool.map(
+                lambda addr: self._lookup_miss(addr, budget), misses)):
+            if rec is DEFERRED:
+                rec = None
+                if deferred is not None:
+                    deferred.append(addr)
+            found[addr] = rec
+        self.flush()
+        return found
+
+    def aggregate(self, rows, deferred=None) -> Optional[Dict]:
+        ''' the GeoJSON of the counted rows, None if there is no header
+
+        The addresses of the most rows are looked up first.
+        '''
+        acq = AcqInfo(None, None, None, None, None)
+        acq.all_data = {}
+        # the org names of this request are dropped with its records,
+        #   and are not shared with other requests' threads
+        acq.record_class = record_class(OrgNameTable())
+        rows = iter(rows)
+        header = find_header(rows, acq.header_search_rows)
+        if header is None:
+            return None
+        (row, addrCols, orgCols, coordsCols) = header
+        for chunk in row_chunks(rows, acq.chunk_rows):
+            acq.scan_rows(chunk, addrCols, orgCols, coordsCols)
+        if coordsCols is None:
+            pending = order_pending(acq.pending_addresses(), acq.all_data)
+            found = self.lookup_many(pending, deferred)
+            for (addr, rec) in found.items():
+                if rec is not None:
+                    acq.all_data[addr].update(rec)
+        features = []
+        for geo_loc in acq.all_data.values():
+            feature = make_feature(geo_loc, and_properties=True)
+            if feature is not None:
+                features.append(feature)
+        return {"type": "FeatureCollection",
+                "metadata": {"count": len(features)},
+                "features": features}
+
+    def stats(self) -> Dict:
+        return {"cache_size": len(self.cache.items),
+                "cache_hits": self.cache.hits,
+                "cache_misses": self.cache.misses,
+                "geocoder_calls": self.geocoder_calls,
+                "failures": self.failures,
+                "failures_skipped": self.failures_skipped,
+                "deferred": self.deferred,
+                "quota_remaining": self.quota.remaining_today()}
+
+    def flush(self) -> None:
+        ''' save what the geocoder calls since the last flush found '''
+        with self.store_lock:
+            if not self.unsaved:
+                return
+            self.unsaved = 0
+            self.failure_cache.save()
+            self.quota.save()
+            if self.store.preload and self.found:
+                all_data = dict(self.store.load_all())
+                all_data.update(self.found)
+                self.store.save_all(all_data)
+                self.found = {}
+
+    def close(self) -> None:
+        self.pool.shutdown()
+        self.flush()
+        self.store.close()
+
+
+def valid_rows(rows) -> bool:
+    ''' rows is a list of rows of cells, as a sheet reader gives them '''
+    return (isinstance(rows, list) and
+            all(isinstance(row, list) and
+                all(isinstance(cell, CELL_TYPES) for cell in row)
+                for row in rows))
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    ''' the json requests of GeocodeService '''
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.server.service.stats())
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            self.send_json(400, {"error": "bad Content-Length"})
+            return
+        if length > MAX_BODY:
+            self.send_json(413, {"error": "request too large"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length).decode("utf8"))
+        except ValueError as err:
+            self.send_json(400, {"error": "bad json: {0}".format(err)})
+            return
+        if not isinstance(body, dict):
+            self.send_json(400, {"error": "need a json object"})
+            return
+        service = self.server.service
+        if self.path == "/geocode":
+            addrs = body.get("addresses")
+            if (not isinstance(addrs, list) or
+                    not all(isinstance(addr, str) for addr in addrs)):
+                self.send_json(400, {"error": "need a list of addresses"})
+                return
+            deferred = []  # type: List[str]
+            reply = {"results": service.lookup_many(addrs, deferred)}
+            if deferred:
+                reply["deferred"] = deferred
+            self.send_json(200, reply)
+        elif self.path == "/aggregate":
+            rows = body.get("rows")
+            if not valid_rows(rows):
+                self.send_json(400, {"error": "need a list of rows of"
+                                              " strings and numbers"})
+                return
+            deferred = []
+            collection = service.aggregate(rows, deferred)
+            if collection is None:
+                self.send_json(400, {"error": "no header row found"})
+                return
+            if deferred:
+                collection["deferred"] = deferred
+            self.send_json(200, collection)
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def send_json(self, status, value) -> None:
+        data = json.dumps(value).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host="127.0.0.1", port=default_port):
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def stop_on_signal(signum, frame):
+    ''' leave serve_forever, so that the service is closed and saved '''
+    raise SystemExit(0)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="local geocoding service over the locations DB")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--locations", default=addLatLong.default_locFileName,
+                        help="locations DB, a .json file or a .sqlite file")
+    parser.add_argument("--cache-size", type=int, default=default_cache_size,
+                        help="addresses kept in memory")
+    parser.add_argument("--workers", type=int, default=default_workers,
+                        help="concurrent google lookups")
+    parser.add_argument("--rate", type=float, default=default_rate,
+                        help="max google lookups per second")
+    parser.add_argument("--max-lookups", type=int,
+                        default=default_max_lookups,
+                        help="max google lookups for one request")
+    parser.add_argument("--daily-limit", type=int,
+                        help="max google lookups per day, over all runs")
+    parser.add_argument("--quota", default=default_quotaFileName,
+                        help="lookups made today, shared with addLatLong")
+    parser.add_argument("--failures", default=default_failuresFileName,
+                        help="addresses which failed to geocode, shared"
+                             " with addLatLong")
+    parser.add_argument("--fake-geocoder", action="store_true",
+                        help="answer with made up locations, for testing")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    args = parse_args()
+    if args.fake_geocoder:
+        geocoder = FakeGeocoder()
+    else:
+        geocoder = GoogleV3(api_key=os.getenv("GOOGLEAPI"))
+    service = GeocodeService(open_location_store(args.locations), geocoder,
+                             args.cache_size, args.workers, args.rate,
+                             failures=FailureCache(args.failures),
+                             quota=GeocodeQuota(args.quota, args.daily_limit),
+                             max_lookups=args.max_lookups)
+    server = make_server(service, args.host, args.port)
+    print("serving on http://{0}:{1}/".format(args.host, args.port))
+    signal.signal(signal.SIGTERM, stop_on_signal)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tiled GeoJSON of the locations, so a map can load just what it shows.
+  each feature goes in one web mercator z/x/y tile at each zoom level
+  the tiles are written as z/x/y.geojson files under one directory
+  tiles.json is the manifest: the zoom levels, and the number of
+    features in each tile, by quadkey
+  the tiles are built in one pass over all_data; a feature's tile is
+    found once at the deepest zoom, and its parents by halving x and y
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List, Tuple
+import json
+import math
+import os
+from geojsonfile import collection_head, COLLECTION_TAIL, StreamWriter
+from geojsonfile import make_feature, feature_json, point_of
+
+default_minzoom = 1
+default_maxzoom = 8
+
+# web mercator stops short of the poles
+MAX_LATITUDE = 85.05112878
+
+MANIFEST_NAME = "tiles.json"
+MANIFEST_VERSION = 1
+
+
+def tile_of(lon, lat, zoom) -> Tuple[int, int]:
+    ''' the x, y of the web mercator tile holding lon, lat at zoom '''
+    n = 1 << zoom
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) /
+             (4 * math.pi)) * n)
+    return (min(max(x, 0), n - 1), min(max(y, 0), n - 1))
+
+
+def quadkey(x, y, zoom) -> str:
+    ''' the Bing maps quadkey of a tile '''
+    digits = []
+    for z in range(zoom, 0, -1):
+        mask = 1 << (z - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
+
+
+class TilePyramid:
+    ''' the features in each tile, from minzoom to maxzoom
+
+    Each feature's json is kept once, the tiles hold indexes into it.
+    '''
+
+    def __init__(self, minzoom=default_minzoom, maxzoom=default_maxzoom,
+                 precision=None):
+        if not 1 <= minzoom <= maxzoom:
+            raise ValueError("need 1 <= minzoom <= maxzoom")
+        self.minzoom = minzoom
+        self.maxzoom = maxzoom
+        self.precision = precision
+        self.features = []  # type: List[str]
+        # one {(x, y): [feature index]} dict per zoom level
+        self.levels = [{} for z in range(minzoom, maxzoom + 1)]  # type: List
+
+    def add(self, lon, lat, text) -> None:
+        index = len(self.features)
+        self.features.append(text)
+        (x, y) = tile_of(lon, lat, self.maxzoom)
+        for level in reversed(self.levels):
+            tile = level.get((x, y))
+            if tile is None:
+                level[(x, y)] = [index]
+            else:
+                tile.append(index)
+            x >>= 1
+            y >>= 1
+
+    def add_all(self, all_data, and_properties=True) -> None:
+        for addr in all_data:
+            geo_loc = all_data[addr]
+            if point_of(geo_loc) is None:
+                continue    # a blank lat or lon in the input
+            feature = make_feature(geo_loc, and_properties, self.precision)
+            if feature is None:
+                continue
+            (lon, lat) = feature["geometry"]["coordinates"][:2]
+            self.add(lon, lat, feature_json(feature, self.precision))
+
+    def tiles(self):
+        ''' (zoom, x, y, feature indexes) for every tile '''
+        for (i, level) in enumerate(self.levels):
+            zoom = self.minzoom + i
+            for ((x, y), indexes) in level.items():
+                yield (zoom, x, y, indexes)
+
+    def manifest(self) -> Dict:
+        return {"version": MANIFEST_VERSION,
+                "minzoom": self.minzoom,
+                "maxzoom": self.maxzoom,
+                "count": len(self.features),
+                "path": "{z}/{x}/{y}.geojson",
+                "tiles": {quadkey(x, y, zoom): len(indexes)
+                          for (zoom, x, y, indexes) in self.tiles()}}
+
+    def write(self, out_dir) -> int:
+        ''' write the tile files and the manifest, returns the bytes '''
+        separator = ", " if self.precision is None else ","
+        total = 0
+        made_dirs = set()
+        for (zoom, x, y, indexes) in self.tiles():
+            tile_dir = os.path.join(out_dir, str(zoom), str(x))
+            if tile_dir not in made_dirs:
+                os.makedirs(tile_dir, exist_ok=True)
+                made_dirs.add(tile_dir)
+            filename = os.path.join(tile_dir, str(y) + ".geojson")
+            with open(filename, 'w', encoding='utf8') as tile_file:
+                features = StreamWriter(tile_file,
+                                        collection_head(len(indexes),
+                                                        self.precision),
+                                        COLLECTION_TAIL, separator)
+                for index in indexes:
+                    features.item(self.features[index])
+                features.close()
+                total += tile_file.tell()
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, MANIFEST_NAME), 'w',
+                  encoding='utf8') as manifest_file:
+            json.dump(self.manifest(), manifest_file)
+            total += manifest_file.tell()
+        return total
+
+
+def write_tiles(all_data, out_dir, minzoom=default_minzoom,
+                maxzoom=default_maxzoom, precision=None) -> TilePyramid:
+    ''' the tiled GeoJSON of the locations, with their org names '''
+    pyramid = TilePyramid(minzoom, maxzoom, precision)
+    pyramid.add_all(all_data)
+    pyramid.write(out_dir)
+    return pyramid
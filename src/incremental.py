@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Saved state for incremental runs.
+  a fingerprint of the input file and of the locations DB
+  for each sheet, a fingerprint when the reader has one (see
+    sheetreader.py), and a hash and the partial counts of each block
+    of rows
+  the number of addresses still waiting for a location
+
+On the next run, when the input file is unchanged, or a sheet's
+fingerprint is, the saved counts are used without reading the rows at
+all.  In a changed sheet, a block whose hash is unchanged reuses its
+saved counts instead of being extracted again; the blocks end where
+the rows themselves pick, so a row inserted or deleted changes only its
+own block and not every one after it.  When neither the input nor the
+locations DB changed and nothing is waiting for a location, the run can
+be skipped altogether.
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import os
+import zlib
+from aggregate import partial_to_json, partial_from_json
+
+STATE_VERSION = 2
+
+
+def file_digest(filename) -> Optional[str]:
+    ''' sha1 of the file contents, or None if there is no file '''
+    sha = hashlib.sha1()
+    try:
+        with open(filename, 'rb') as in_file:
+            for block in iter(lambda: in_file.read(1 << 20), b''):
+                sha.update(block)
+    except OSError:
+        return None
+    return sha.hexdigest()
+
+
+def file_stamp(filename) -> Optional[List]:
+    ''' size and mtime of the file and of its SQLite WAL, if any '''
+    stamp = []
+    for name in (filename, filename + "-wal"):
+        try:
+            stat = os.stat(name)
+        except OSError:
+            continue
+        stamp.extend([stat.st_size, stat.st_mtime_ns])
+    return stamp or None
+
+
+def row_blocks(sheet_key, rows, block_rows) -> Iterator[Tuple[str, List]]:
+    ''' (hash, rows) of blocks of about block_rows rows
+
+    A block ends after a row whose own crc picks it, once the block has
+    a quarter of block_rows, or at four times block_rows.  The hash is
+    of the rows and of the sheet and header they are under.
+    '''
+    min_rows = max(1, block_rows // 4)
+    max_rows = 4 * block_rows
+    key = repr(sheet_key).encode('utf8')
+    sha = hashlib.sha1(key)
+    chunk = []  # type: List
+    for row in rows:
+        text = repr(row).encode('utf8')
+        sha.update(text)
+        chunk.append(row)
+        if (len(chunk) >= max_rows or
+                (len(chunk) >= min_rows and
+                 zlib.crc32(text) % block_rows == 0)):
+            yield (sha.hexdigest(), chunk)
+            sha = hashlib.sha1(key)
+            chunk = []
+    if chunk:
+        yield (sha.hexdigest(), chunk)
+
+
+class RunState:
+    ''' what the last run saw, and what this run is seeing '''
+
+    def __init__(self, filename, last=None):
+        ''' with no filename, the state is only kept in memory '''
+        self.filename = filename
+        self.last = self.load() if last is None else last
+        # the state as saved at the end of this run
+        self.saved = None  # type: Optional[Dict]
+        self.input_digest = None
+        self.locations_stamp = None
+        self.outputs = None  # type: Optional[Dict]
+        self.pending = None
+        self.sheets = []  # type: List[Dict]
+        # the saved counts of the last run's blocks, by their hash
+        self.last_blocks = None  # type: Optional[Dict[str, List]]
+        self.blocks_reused = 0
+        self.blocks_scanned = 0
+
+    def load(self) -> Dict:
+        if self.filename is None:
+            return {}
+        try:
+            with open(self.filename) as state_file:
+                last = json.load(state_file)
+        except (OSError, ValueError):
+            return {}
+        if last.get("version") != STATE_VERSION:
+            return {}
+        return last
+
+    def unchanged(self, input_filename, loc_filename, outputs=None) -> bool:
+        ''' nothing to do since the last run
+
+        outputs are the settings of the outputs, which must also be
+        those of the last run.
+        '''
+        self.input_digest = file_digest(input_filename)
+        self.locations_stamp = file_stamp(loc_filename)
+        # as it will read back from the json state file
+        self.outputs = json.loads(json.dumps(outputs))
+        return (self.last.get("input") == self.input_digest and
+                self.last.get("locations") == self.locations_stamp and
+                self.last.get("outputs") == self.outputs and
+                self.last.get("pending") == 0)
+
+    def input_unchanged(self) -> bool:
+        ''' the input file is the one the last run read '''
+        return (self.input_digest is not None and
+                self.last.get("input") == self.input_digest)
+
+    def last_sheets(self) -> List[Dict]:
+        return self.last.get("sheets", [])
+
+    def last_sheet(self, name, fingerprint) -> Optional[Dict]:
+        ''' the last run's sheet with this name and fingerprint, if any '''
+        if fingerprint is None:
+            return None
+        # as it reads back from the json state file
+        fingerprint = json.loads(json.dumps(fingerprint))
+        for sheet in self.last_sheets():
+            if sheet["key"][0] == name and sheet["fingerprint"] == fingerprint:
+                return sheet
+        return None
+
+    def reuse_sheet(self, last_sheet) -> Tuple[Optional[List], List[Dict]]:
+        ''' the header and the block counts of an unchanged sheet '''
+        self.sheets.append(last_sheet)
+        self.blocks_reused += len(last_sheet["blocks"])
+        return (last_sheet["key"][1],
+                [partial_from_json(items)
+                 for (digest, items) in last_sheet["blocks"]])
+
+    def start_sheet(self, name, header, fingerprint=None) -> List:
+        ''' header is None for a sheet with no header row '''
+        # as it will read back from the json state file
+        sheet_key = json.loads(json.dumps([name, header]))
+        self.sheets.append({"key": sheet_key,
+                            "fingerprint": json.loads(json.dumps(fingerprint)),
+                            "blocks": []})
+        return sheet_key
+
+    def cached_block(self, digest) -> Optional[Dict]:
+        ''' the saved counts for this block, if the last run had it '''
+        if self.last_blocks is None:
+            self.last_blocks = {block[0]: block[1]
+                                for sheet in self.last_sheets()
+                                for block in sheet["blocks"]}
+        items = self.last_blocks.get(digest)
+        if items is None:
+            return None
+        return partial_from_json(items)
+
+    def add_block(self, digest, partial, reused) -> None:
+        self.sheets[-1]["blocks"].append([digest, partial_to_json(partial)])
+        if reused:
+            self.blocks_reused += 1
+        else:
+            self.blocks_scanned += 1
+
+    def changed(self) -> bool:
+        ''' did the blocks, the locations DB or the outputs differ from
+        the last run '''
+        if self.last.get("locations") != self.locations_stamp:
+            return True
+        if self.last.get("outputs") != self.outputs:
+            return True
+        last_blocks = [[block[0] for block in sheet["blocks"]]
+                       for sheet in self.last.get("sheets", [])]
+        blocks = [[block[0] for block in sheet["blocks"]]
+                  for sheet in self.sheets]
+        return last_blocks != blocks
+
+    def save(self, loc_filename, pending) -> None:
+        # the locations DB may have been written since the start
+        self.locations_stamp = file_stamp(loc_filename)
+        state = {"version": STATE_VERSION,
+                 "input": self.input_digest,
+                 "locations": self.locations_stamp,
+                 "outputs": self.outputs,
+                 "pending": pending,
+                 "sheets": self.sheets}
+        self.saved = state
+        if self.filename is None:
+            return
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, 'w', encoding='utf8') as state_file:
+            json.dump(state, state_file)
+        os.replace(tmp_filename, self.filename)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Stores for the locations DB, the lat lon found so far for each address.
+  locations.json is read and written as a whole file, under a lock and
+    merged with what other writers saved since it was read, so several
+    runs, or this tool and connection-map, can share it
+  an SQLite file gives indexed lookups and commits as geocodes succeed;
+    it also indexes the canonical key of each address (see
+    addressnorm.py), so a spelling variant finds the stored record
+  the SQLite file can be imported from and exported to locations.json
+
+Usage:
+  python3 locationstore.py import locations.json locations.sqlite
+  python3 locationstore.py export locations.sqlite locations.json
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import sys
+import threading
+from addressnorm import canonical_key, KEY_VERSION
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+# the fields kept for each address in the locations DB
+LOCATION_FIELDS = ("latitude", "longitude", "address")
+
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+# addresses per query when looking up many at once
+LOOKUP_BATCH = 500
+
+
+def open_location_store(filename):
+    ''' pick the store by the file name suffix '''
+    if filename.endswith(SQLITE_SUFFIXES):
+        return SQLiteLocationStore(filename)
+    return JSONLocationStore(filename)
+
+
+class JSONLocationStore:
+    ''' the locations.json file, which is loaded and saved whole '''
+
+    # all the addresses are loaded before the spreadsheet is read
+    preload = True
+
+    def __init__(self, filename):
+        self.filename = filename
+        # the parsed file, kept while its size and mtime are unchanged
+        self.cached = None  # type: Optional[Tuple[Tuple, Dict]]
+
+    def load_all(self) -> Dict:
+        ''' the whole file; callers should copy the records they change '''
+        stamp = _file_stamp(self.filename)
+        if self.cached is not None and self.cached[0] == stamp:
+            return self.cached[1]
+        with open(self.filename) as json_file:
+            all_data = json.load(json_file)
+        self.cached = (stamp, all_data)
+        return all_data
+
+    def get(self, addr) -> Optional[Dict]:
+        rec = self.load_all().get(addr)
+        return None if rec is None else dict(rec)
+
+    def put_many(self, records) -> None:
+        ''' nothing to do until the whole file is saved '''
+        pass
+
+    def save_all(self, all_data) -> None:
+        ''' save all_data, keeping what other writers saved since load_all '''
+        # what this process read, to tell its changes from theirs
+        loaded = {} if self.cached is None else self.cached[1]
+        with locked(self.filename):
+            if os.path.exists(self.filename):
+                on_disk = self.load_all()
+            else:
+                on_disk = {}
+            merged = merge_records(all_data, loaded, on_disk)
+            write_json_records(self.filename, merged.items())
+            # what was written is what the next load_all would read
+            self.cached = (_file_stamp(self.filename),
+                           {addr: dict(rec.items())
+                            for (addr, rec) in merged.items()})
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteLocationStore:
+    ''' an SQLite file with one indexed row per address '''
+
+    # addresses are looked up as they are found in the spreadsheet
+    preload = False
+
+    def __init__(self, filename):
+        self.filename = filename
+        # callers which share the store between threads must lock it
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        # WAL lets readers carry on while a geocode is being committed
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS locations ("
+                          " addr TEXT PRIMARY KEY,"
+                          " latitude REAL,"
+                          " longitude REAL,"
+                          " address TEXT,"
+                          " canon TEXT)")
+        self.conn.commit()
+        self._index_keys()
+
+    def _index_keys(self) -> None:
+        ''' fill in the canonical keys of a file made before they were
+        kept, or with an older canonical_key '''
+        (version,) = self.conn.execute("PRAGMA user_version").fetchone()
+        if version == KEY_VERSION:
+            return
+        columns = [row[1] for row in
+                   self.conn.execute("PRAGMA table_info(locations)")]
+        with self.conn:
+            if "canon" not in columns:
+                self.conn.execute("ALTER TABLE locations"
+                                  " ADD COLUMN canon TEXT")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS locations_canon"
+                              " ON locations (canon)")
+            addrs = self.conn.execute("SELECT addr FROM locations").fetchall()
+            self.conn.executemany("UPDATE locations SET canon = ?"
+                                  " WHERE addr = ?",
+                                  [(canonical_key(addr), addr)
+                                   for (addr,) in addrs])
+            self.conn.execute("PRAGMA user_version = {0}"
+                              .format(KEY_VERSION))
+
+    def get(self, addr) -> Optional[Dict]:
+        row = self.conn.execute("SELECT latitude, longitude, address"
+                                " FROM locations WHERE addr = ?",
+                                (addr,)).fetchone()
+        if row is None:
+            return None
+        return _to_record(row)
+
+    def get_many(self, addrs) -> Dict:
+        ''' look up many addresses, a batch per query '''
+        found = {}
+        addrs = list(addrs)
+        for start in range(0, len(addrs), LOOKUP_BATCH):
+            batch = addrs[start:start + LOOKUP_BATCH]
+            marks = ",".join("?" * len(batch))
+            rows = self.conn.execute("SELECT addr, latitude, longitude,"
+                                     " address FROM locations"
+                                     " WHERE addr IN (" + marks + ")",
+                                     batch)
+            for row in rows:
+                found[row[0]] = _to_record(row[1:])
+        return found
+
+    def find_variant(self, key) -> Optional[str]:
+        ''' the first stored address with canonical key key, if any '''
+        row = self.conn.execute("SELECT addr FROM locations"
+                                " WHERE canon = ? ORDER BY rowid LIMIT 1",
+                                (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def put_many(self, records) -> None:
+        ''' upsert (addr, record) pairs and commit them together '''
+        rows = [(addr, rec.get("latitude"), rec.get("longitude"),
+                 rec.get("address"), canonical_key(addr))
+                for (addr, rec) in records]
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany("INSERT INTO locations"
+                                  " (addr, latitude, longitude, address,"
+                                  " canon)"
+                                  " VALUES (?, ?, ?, ?, ?)"
+                                  " ON CONFLICT(addr) DO UPDATE SET"
+                                  " latitude = excluded.latitude,"
+                                  " longitude = excluded.longitude,"
+                                  " address = excluded.address",
+                                  rows)
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        ''' all the addresses, in the order they were first added '''
+        rows = self.conn.execute("SELECT addr, latitude, longitude, address"
+                                 " FROM locations ORDER BY rowid")
+        for row in rows:
+            yield (row[0], _to_record(row[1:]))
+
+    def import_json(self, filename) -> int:
+        with open(filename) as json_file:
+            all_data = json.load(json_file)
+        records = [(addr, rec) for (addr, rec) in all_data.items()
+                   if "latitude" in rec]
+        self.put_many(records)
+        return len(records)
+
+    def export_json(self, filename) -> int:
+        return write_json_records(filename, self.items())
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def merge_records(ours, loaded, on_disk) -> Dict:
+    ''' ours, with the records another writer added or changed on disk
+
+    loaded is the file as this process read it.  A record which this
+    process did not change, or could not locate, gives way to a changed
+    one on disk; the addresses only on disk are added at the end.
+    '''
+    if on_disk is loaded:
+        return ours
+    merged = {}
+    for (addr, rec) in ours.items():
+        theirs = on_disk.get(addr)
+        if theirs is not None and theirs != loaded.get(addr):
+            if "latitude" not in rec or dict(rec.items()) == loaded.get(addr):
+                rec = theirs
+        merged[addr] = rec
+    for (addr, theirs) in on_disk.items():
+        if addr not in merged:
+            merged[addr] = theirs
+    return merged
+
+
+@contextmanager
+def locked(filename):
+    ''' hold the advisory lock of filename, in filename.lock
+
+    Only writers take the lock; readers need not, as the file is
+    replaced whole by a rename.
+    '''
+    with open(filename + ".lock", 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:  # pragma: no cover
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_json_records(filename, records) -> int:
+    ''' write (addr, record) pairs in the locations.json format
+
+    The records go to a temporary file which then replaces filename, so
+    a reader sees the old file or the new one, never part of one.
+    '''
+    count = 0
+    tmp_filename = "{0}.{1}.{2}.tmp".format(filename, os.getpid(),
+                                            threading.get_ident())
+    try:
+        with open(tmp_filename, 'w', encoding='utf8') as json_file:
+            json_file.write("{")
+            for (addr, rec) in records:
+                if count:
+                    json_file.write(", ")
+                json_file.write(json.dumps(addr))
+                json_file.write(": ")
+                json_file.write(json.dumps(dict(rec.items())))
+                count += 1
+            json_file.write("}")
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+    return count
+
+
+def _file_stamp(filename) -> Tuple:
+    stat = os.stat(filename)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _to_record(row) -> Dict:
+    rec = {}
+    for (field, value) in zip(LOCATION_FIELDS, row):
+        if value is not None:
+            rec[field] = value
+    return rec
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 4 or argv[1] not in ("import", "export"):
+        print(__doc__)
+        return 1
+    if argv[1] == "import":
+        store = SQLiteLocationStore(argv[3])
+        count = store.import_json(argv[2])
+    else:
+        store = SQLiteLocationStore(argv[2])
+        count = store.export_json(argv[3])
+    store.close()
+    print("{0} locations {1}ed".format(count, argv[1]))
+    return 0
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    sys.exit(main(sys.argv))
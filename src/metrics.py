@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Run metrics for AcqInfo.
+  a timer for each phase of the run: reading, geocoding, writing
+  counters: rows scanned, unique addresses, locations DB hits and
+    misses, geocoder calls, failures and retries, output bytes
+  a histogram of the geocoder latency
+  written as a json file
+
+When metrics are off AcqInfo uses NULL_METRICS, whose methods do
+nothing, so the instrumentation costs next to nothing.
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict
+from bisect import bisect_left
+import json
+import time
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS_VERSION = 1
+
+
+class Histogram:
+    ''' counts of the values falling in each bucket '''
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        # the last bucket is for values above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+
+    def observe(self, value) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def report(self) -> Dict:
+        buckets = [["<= {0}".format(bound), count]
+                   for (bound, count) in zip(self.bounds, self.counts)]
+        buckets.append(["> {0}".format(self.bounds[-1]), self.counts[-1]])
+        return {"count": self.count,
+                "mean": self.total / self.count if self.count else None,
+                "max": self.max,
+                "buckets": buckets}
+
+
+class PhaseTimer:
+    ''' adds the time spent in a with block to a phase '''
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        phases = self.metrics.phases
+        phases[self.name] = phases.get(self.name, 0.0) + seconds
+        return False
+
+
+class Metrics:
+    ''' collects the timers, counters and histograms of one run '''
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}  # type: Dict[str, float]
+        self.counters = {}  # type: Dict[str, int]
+        self.histograms = {}  # type: Dict[str, Histogram]
+
+    def phase(self, name) -> PhaseTimer:
+        return PhaseTimer(self, name)
+
+    def count(self, name, n=1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value) -> None:
+        self.counters[name] = value
+
+    def observe(self, name, value) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def report(self) -> Dict:
+        return {"version": METRICS_VERSION,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S",
+                                         time.localtime(self.started)),
+                "seconds": time.time() - self.started,
+                "phases": dict(self.phases),
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.report() for (name, histogram)
+                               in self.histograms.items()}}
+
+    def write(self, filename) -> None:
+        with open(filename, 'w', encoding='utf8') as json_file:
+            json.dump(self.report(), json_file, indent=1)
+
+
+class NullPhase:
+    ''' a with block which times nothing '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullMetrics:
+    ''' the metrics used when they are off, every method does nothing '''
+
+    enabled = False
+
+    def phase(self, name) -> NullPhase:
+        return NULL_PHASE
+
+    def count(self, name, n=1) -> None:
+        pass
+
+    def set(self, name, value) -> None:
+        pass
+
+    def observe(self, name, value) -> None:
+        pass
+
+
+NULL_PHASE = NullPhase()
+NULL_METRICS = NullMetrics()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Precompressed copies of the output files, for the map sites.
+  a .gz copy, which any web server can send as Content-Encoding gzip
+  a .br copy, when brotli is installed (pip3 install brotli)
+  a report of the bytes saved by each copy
+  a copy which is not written again is removed, so a server which sends
+    the precompressed copy first never sends an old one
+
+Usage:
+  python3 precompress.py acquisitions.geojson acquisitionsInst.geojson
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List
+import gzip
+import os
+import sys
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+# the suffixes of all the copies which may be written
+SUFFIXES = (".gz", ".br")
+
+
+def brotli_available() -> bool:
+    return brotli is not None
+
+
+def write_gzip(filename, data) -> str:
+    gz_filename = filename + ".gz"
+    # mtime=0 keeps the copy the same from run to run
+    with open(gz_filename, 'wb') as gz_file:
+        gz_file.write(gzip.compress(data, compresslevel=9, mtime=0))
+    return gz_filename
+
+
+def write_brotli(filename, data) -> str:
+    br_filename = filename + ".br"
+    with open(br_filename, 'wb') as br_file:
+        br_file.write(brotli.compress(data, quality=11))
+    return br_filename
+
+
+def precompress(filename) -> Dict[str, int]:
+    ''' write the compressed copies of one file
+
+    Returns the size of the file and of each copy, by suffix.
+    '''
+    with open(filename, 'rb') as in_file:
+        data = in_file.read()
+    sizes = {"": len(data)}
+    writers = [(".gz", write_gzip)]
+    if brotli is not None:
+        writers.append((".br", write_brotli))
+    for (suffix, write) in writers:
+        sizes[suffix] = os.path.getsize(write(filename, data))
+    remove_stale(filename, sizes)
+    return sizes
+
+
+def remove_stale(filename, keep=()) -> List[str]:
+    ''' remove the copies of filename which are not in keep, by suffix
+
+    Returns the removed file names.
+    '''
+    removed = []
+    for suffix in SUFFIXES:
+        if suffix in keep:
+            continue
+        copy_filename = filename + suffix
+        if os.path.exists(copy_filename):
+            os.remove(copy_filename)
+            removed.append(copy_filename)
+    return removed
+
+
+def report(filename, sizes) -> List[str]:
+    ''' one line per copy, with the bytes it saves '''
+    size = sizes[""]
+    lines = ["{0}  {1:,d} bytes".format(filename, size)]
+    for (suffix, copy_size) in sizes.items():
+        if not suffix:
+            continue
+        saved = size - copy_size
+        lines.append("  {0:4} {1:12,d} bytes  {2:12,d} saved  {3:5.1f}%"
+                     .format(suffix, copy_size, saved,
+                             100.0 * saved / size if size else 0.0))
+    return lines
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 2:
+        print(__doc__)
+        return 1
+    if not brotli_available():
+        print("brotli is not installed, only .gz copies are written")
+    for filename in argv[1:]:
+        for line in report(filename, precompress(filename)):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    sys.exit(main(sys.argv))
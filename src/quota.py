@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Spend the Google lookups of each run on the addresses seen most.
+  the pending addresses are looked up in order of magnitude, the number
+    of rows using them, and among equals the longest waiting first
+  each run takes at most the per run limit, and no more than is left of
+    the daily limit
+  the lookups made today and the time each address has been waiting are
+    kept in a json file between runs; runs at the same time add their
+    lookups and waiting addresses to it under a lock, and drop the
+    addresses they located
+  each run reports how many runs, and days, the rest should take
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List, Optional, Set
+import json
+import math
+import os
+import time
+from locationstore import locked
+
+default_quotaFileName = 'addLatLong.quota.json'
+
+
+def order_pending(pending, all_data, waiting=None) -> List[str]:
+    ''' the largest magnitude first, then the longest waiting, then
+    the order they were found '''
+    waiting = waiting or {}
+    return sorted(pending,
+                  key=lambda addr: (-all_data[addr].get("magnitude", 0),
+                                    waiting.get(addr, math.inf)))
+
+
+class GeocodeQuota:
+    ''' the lookups left today, and when each address started waiting '''
+
+    def __init__(self, filename, daily_limit=None, clock=time.time):
+        self.filename = filename
+        self.daily_limit = daily_limit
+        self.clock = clock
+        self.day = self.today()
+        self.used = 0
+        # lookups made by this run, not yet saved
+        self.new_used = 0
+        self.waiting = {}  # type: Dict[str, float]
+        # the addresses which started and stopped waiting in this run,
+        #   not yet saved
+        self.started = {}  # type: Dict[str, float]
+        self.done = set()  # type: Set[str]
+        state = self._read()
+        if state.get("day") == self.day:
+            self.used = state.get("used", 0)
+        self.waiting = state.get("waiting", {})
+
+    def today(self) -> str:
+        return time.strftime("%Y-%m-%d", time.localtime(self.clock()))
+
+    def _read(self) -> Dict:
+        if self.filename is None or not os.path.exists(self.filename):
+            return {}
+        with open(self.filename) as json_file:
+            return json.load(json_file)
+
+    def note_waiting(self, pending, seen=()) -> None:
+        ''' start the clock of the new pending addresses
+
+        The addresses seen which are not pending need no lookup, and
+        stop waiting.
+        '''
+        now = self.clock()
+        pending = set(pending)
+        for addr in seen:
+            if addr not in pending:
+                self.located(addr)
+        for addr in pending:
+            if addr not in self.waiting:
+                self.waiting[addr] = self.started[addr] = now
+
+    def located(self, addr) -> None:
+        ''' addr needs no more lookups '''
+        self.waiting.pop(addr, None)
+        self.started.pop(addr, None)
+        self.done.add(addr)
+
+    def _next_day(self) -> None:
+        ''' a service which runs past midnight starts the day afresh '''
+        day = self.today()
+        if day != self.day:
+            self.day = day
+            self.used = 0
+            self.new_used = 0
+
+    def remaining_today(self) -> Optional[int]:
+        if self.daily_limit is None:
+            return None
+        self._next_day()
+        return max(0, self.daily_limit - self.used - self.new_used)
+
+    def budget(self, run_limit=None) -> Optional[int]:
+        ''' the lookups this run may make, None for no limit '''
+        limits = [limit for limit in (run_limit, self.remaining_today())
+                  if limit is not None]
+        return min(limits) if limits else None
+
+    def use(self, calls) -> None:
+        self._next_day()
+        self.new_used += calls
+
+    def projection(self, remaining, run_limit=None) -> Dict:
+        ''' the runs and days the remaining addresses should need '''
+        per_run = run_limit or self.daily_limit
+        runs = 0
+        days = 0
+        if remaining and per_run:
+            runs = math.ceil(remaining / per_run)
+        if remaining and self.daily_limit:
+            days = math.ceil(remaining / self.daily_limit)
+        return {"remaining": remaining, "runs": runs, "days": days}
+
+    def save(self) -> None:
+        ''' add this run's lookups and waiting addresses to those saved by
+        any other run '''
+        if self.filename is None:
+            return
+        with locked(self.filename):
+            state = self._read()
+            used = state.get("used", 0) if state.get("day") == self.day else 0
+            self.used = used + self.new_used
+            self.new_used = 0
+            # each address waits from the first time any run saw it
+            waiting = state.get("waiting", {})
+            for addr in self.done:
+                waiting.pop(addr, None)
+            for (addr, since) in self.started.items():
+                waiting[addr] = min(since, waiting.get(addr, since))
+            self.waiting = waiting
+            self.started = {}
+            self.done = set()
+            tmp_filename = self.filename + ".tmp"
+            with open(tmp_filename, 'w', encoding='utf8') as json_file:
+                json.dump({"day": self.day, "used": self.used,
+                           "waiting": self.waiting}, json_file, indent=1)
+            os.replace(tmp_filename, self.filename)
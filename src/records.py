@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Compact records for the locations in AcqInfo.all_data.
+  one slotted object per location instead of a dict of string keys
+  org names are interned once and counted by a small integer id, in
+    one table for the process, or one for each batch of records made by
+    record_class, so a long running service can drop them together
+  each record still reads like the dict it replaces:
+    "latitude", "longitude", "address", "magnitude" and "org names"
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, List
+import threading
+
+
+class OrgNameTable:
+    ''' gives each distinct org name a small integer id '''
+
+    def __init__(self):
+        self.names = []  # type: List[str]
+        self.ids = {}  # type: Dict[str, int]
+        # threads may add names at once, as the service's requests do
+        self.lock = threading.Lock()
+
+    def id_of(self, name) -> int:
+        org_id = self.ids.get(name)
+        if org_id is None:
+            with self.lock:
+                org_id = self.ids.get(name)
+                if org_id is None:
+                    org_id = len(self.names)
+                    self.names.append(name)
+                    self.ids[name] = org_id
+        return org_id
+
+
+# one table for all the records in this process
+org_name_table = OrgNameTable()
+
+# the record keys, in the order they are written out
+FIELDS = ("latitude", "longitude", "address", "magnitude", "org names")
+SLOTS = ("latitude", "longitude", "address", "magnitude", "org_counts")
+SLOT_OF = dict(zip(FIELDS, SLOTS))
+
+
+# up to this many org names are kept in a flat list of id, count pairs,
+#   which is much smaller than a dict
+SMALL_ORG_COUNTS = 8
+
+
+def _pairs_to_dict(org_counts) -> Dict[int, int]:
+    return dict(zip(org_counts[0::2], org_counts[1::2]))
+
+
+class LocRecord:
+    ''' one location, readable and writable like the old dict
+
+    An unset slot is a missing key.  Reading "org names" gives a new
+    {name: count} dict; use add_org_name to count one more.
+    Keys other than FIELDS are kept in a small dict of their own.
+    '''
+
+    __slots__ = SLOTS + ("extra",)
+
+    # where the org name ids of these records are kept
+    org_names = org_name_table
+
+    @classmethod
+    def from_dict(cls, geo_loc):
+        rec = cls()
+        rec.update(geo_loc)
+        return rec
+
+    def add_org_name(self, name, count=1) -> None:
+        org_id = self.org_names.id_of(name)
+        try:
+            org_counts = self.org_counts
+        except AttributeError:
+            self.org_counts = [org_id, count]
+            return
+        if isinstance(org_counts, dict):
+            org_counts[org_id] = org_counts.get(org_id, 0) + count
+            return
+        for i in range(0, len(org_counts), 2):
+            if org_counts[i] == org_id:
+                org_counts[i + 1] += count
+                return
+        if len(org_counts) < 2 * SMALL_ORG_COUNTS:
+            org_counts.extend((org_id, count))
+        else:
+            self.org_counts = _pairs_to_dict(org_counts)
+            self.org_counts[org_id] = count
+
+    def org_count_items(self):
+        ''' (org id, count) pairs, in the order the org names were added '''
+        org_counts = self.org_counts
+        if isinstance(org_counts, dict):
+            return org_counts.items()
+        return zip(org_counts[0::2], org_counts[1::2])
+
+    def __getitem__(self, key):
+        slot = SLOT_OF.get(key)
+        try:
+            if slot is None:
+                return self.extra[key]
+            if slot == "org_counts":
+                names = self.org_names.names
+                return {names[org_id]: count
+                        for (org_id, count) in self.org_count_items()}
+            return getattr(self, slot)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        slot = SLOT_OF.get(key)
+        if slot is None:
+            if self._extra() is None:
+                self.extra = {}
+            self.extra[key] = value
+        elif slot == "org_counts":
+            org_counts = []
+            for (name, count) in dict(value).items():
+                org_counts.extend((self.org_names.id_of(name), count))
+            if len(org_counts) > 2 * SMALL_ORG_COUNTS:
+                org_counts = _pairs_to_dict(org_counts)
+            self.org_counts = org_counts
+        else:
+            setattr(self, slot, value)
+
+    def __delitem__(self, key):
+        slot = SLOT_OF.get(key)
+        try:
+            if slot is None:
+                del self.extra[key]
+            else:
+                delattr(self, slot)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        slot = SLOT_OF.get(key)
+        if slot is None:
+            extra = self._extra()
+            return extra is not None and key in extra
+        return hasattr(self, slot)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items())
+
+    def __repr__(self):
+        return "LocRecord(" + repr(dict(self.items())) + ")"
+
+    def _extra(self):
+        try:
+            return self.extra
+        except AttributeError:
+            return None
+
+    def keys(self) -> List[str]:
+        keys = [key for key in FIELDS if hasattr(self, SLOT_OF[key])]
+        extra = self._extra()
+        if extra is not None:
+            keys.extend(extra)
+        return keys
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+
+    def update(self, other) -> None:
+        for (key, value) in dict(other).items():
+            self[key] = value
+
+
+def record_class(org_names) -> type:
+    ''' a LocRecord class whose records keep their org names in org_names '''
+    return type("LocRecord", (LocRecord,),
+                {"__slots__": (), "org_names": org_names})
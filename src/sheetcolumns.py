@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Columnar helpers for pulling data rows out of a spreadsheet.
+  find the header row, reading each candidate row only once
+  once the header row is known, take the data rows in chunks
+  pull each wanted column out of a chunk in one go
+  build the address, org name and coords values for all rows in a batch
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from itertools import islice
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+INST_DEPT_LABEL = "Inst Dept"
+INST_NAME_LABEL = "Inst Name"
+
+# how many rows to look through for the header before giving up on a sheet
+default_header_search_rows = 50
+
+# how many data rows are handled together
+default_chunk_rows = 10000
+
+
+def classify_header(values):
+    ''' map the recognised header labels in one row to their columns
+
+    Returns (addrCols, orgCols, coordsCols), each None when that group
+    of columns is not found in the row.
+    '''
+    locaCol    = None
+    cityCol    = None
+    provCol    = None
+    countryCol = None
+    deptCol    = None
+    nameCol    = None
+    latCol     = None
+    lonCol     = None
+
+    for col, hdr in enumerate(values):
+        if not isinstance(hdr, str):
+            continue
+        if "Location" == hdr:
+            locaCol = col
+        elif hdr.startswith("City"):
+            cityCol = col
+        elif "Prov./state" == hdr or "Province" == hdr:
+            provCol = col
+        elif "Country" == hdr:
+            countryCol = col
+        elif INST_DEPT_LABEL == hdr:
+            deptCol = col
+        elif INST_NAME_LABEL == hdr:
+            nameCol = col
+        elif "Latitude" == hdr:
+            latCol = col
+        elif "Longitude" == hdr:
+            lonCol = col
+
+    addrCols = None
+    if cityCol is not None or provCol is not None or countryCol is not None:
+        addrCols = (locaCol, cityCol, provCol, countryCol)
+    orgCols = None
+    if deptCol is not None or nameCol is not None:
+        orgCols = (deptCol, nameCol)
+    coordsCols = None
+    if latCol is not None and lonCol is not None:
+        coordsCols = (latCol, lonCol)
+    return (addrCols, orgCols, coordsCols)
+
+
+def find_header(rows, max_rows=default_header_search_rows):
+    ''' look for the header row near the top of the sheet
+
+    rows is an iterator, which is left at the first data row.
+    Returns (row, addrCols, orgCols, coordsCols), or None when none of the
+    first max_rows rows has address columns.
+    '''
+    for (row, values) in enumerate(islice(rows, max_rows)):
+        hdrCols = classify_header(values)
+        (addrCols, orgCols, coordsCols) = hdrCols
+        if addrCols is not None:
+            return (row, addrCols, orgCols, coordsCols)
+    return None
+
+
+def row_chunks(rows, chunk_rows=default_chunk_rows) -> Iterator[List]:
+    ''' the remaining rows, as lists of at most chunk_rows rows '''
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield chunk
+
+
+def column_values(chunk, col) -> Optional[List]:
+    ''' one column of a chunk of rows, or None if there is no col '''
+    if col is None:
+        return None
+    return [row[col] if col < len(row) else "" for row in chunk]
+
+
+def join_addresses(columns, nrows) -> List[str]:
+    ''' build the address string for each row from the address columns
+
+    The columns must be given in spreadsheet column order.
+    '''
+    addrs = []
+    if not columns:
+        return [""] * nrows
+
+    for values in zip(*columns):
+        try:
+            addr = " ".join(values)
+        except TypeError:
+            addr = _join_until_bad(values)
+        addrs.append(addr.strip())
+    return addrs
+
+
+def _join_until_bad(values: Sequence) -> str:
+    ''' keep the address parts found before the first non-string cell '''
+    addr = ""
+    for cellval in values:
+        if not isinstance(cellval, str):
+            print("looking for an address string, but cell value is ",
+                  cellval)
+            break
+        addr += cellval
+        addr += ' '
+    return addr
+
+
+def join_org_names(deptValues, nameValues, deptFirst, nrows) -> List[str]:
+    ''' build the org name for each row from the dept and inst name columns
+
+    deptFirst tells whether the dept column precedes the inst name column.
+    '''
+    orgNames = []
+    for row in range(nrows):
+        orgDept = "" if deptValues is None else deptValues[row]
+        orgInst = "" if nameValues is None else nameValues[row]
+
+        deptPart = ""
+        if orgDept != "":
+            deptPart = _org_part(orgDept)
+            if deptPart != "":
+                deptPart += ', '
+        instPart = ""
+        if orgInst != "":
+            instPart = _org_part(orgInst)
+
+        if deptFirst:
+            orgNames.append(deptPart + instPart)
+        else:
+            orgNames.append(instPart + deptPart)
+    return orgNames
+
+
+def _org_part(cellval) -> str:
+    if isinstance(cellval, str):
+        return cellval
+    print("looking for an org name string, but cell value is ", cellval)
+    return ""
+
+
+def zip_coords(latValues, lonValues, nrows) -> List[Tuple]:
+    ''' pair up the lat and lon values for each row '''
+    if latValues is None:
+        latValues = [None] * nrows
+    if lonValues is None:
+        lonValues = [None] * nrows
+    return [(_as_coord(latVal), _as_coord(lonVal))
+            for (latVal, lonVal) in zip(latValues, lonValues)]
+
+
+def _as_coord(cellval):
+    ''' numbers in text cells (as from a csv file) become floats '''
+    if isinstance(cellval, str):
+        try:
+            return float(cellval)
+        except ValueError:
+            pass
+    return cellval
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Readers which give the rows of a workbook, one sheet at a time.
+  xlrd loads the whole workbook, and reads .xls as well as older .xlsx
+  openpyxl in read-only mode streams the rows of an .xlsx, so memory
+    stays flat however large the workbook is
+  a .csv file is read as one sheet, a line at a time
+  a .parquet file is read as one sheet, a batch of rows at a time,
+    with the column names as its header row
+  each row is a list of cell values, as xlrd has them:
+    blank cells are "" and numbers are floats (csv cells stay strings)
+  an .xlsx sheet read by openpyxl has a fingerprint, the crcs of its
+    part of the zip file and of the parts its cells refer to, which
+    changes when the sheet does and is found without reading its rows
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Iterator, List, Optional
+import csv
+import os
+import zipfile
+
+try:
+    import openpyxl  # type: ignore
+except ImportError:  # pragma: no cover
+    openpyxl = None
+
+try:
+    import pyarrow.parquet  # type: ignore
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+READERS = ("auto", "xlrd", "openpyxl", "csv", "parquet")
+
+# rows per batch read from a parquet file
+default_batch_rows = 10000
+
+# the parts of an .xlsx which the cells of every sheet refer to
+XLSX_SHARED_PARTS = ("xl/sharedStrings.xml", "xl/styles.xml")
+
+
+def open_reader(filename, reader="auto"):
+    ''' pick a reader for the workbook
+
+    auto picks csv and parquet by the file suffix, streams .xlsx
+    files with openpyxl when it is installed, and uses xlrd otherwise.
+    '''
+    if reader == "auto":
+        if filename.endswith(".csv"):
+            reader = "csv"
+        elif filename.endswith((".parquet", ".pq")):
+            reader = "parquet"
+        elif filename.endswith((".xlsx", ".xlsm")) and openpyxl is not None:
+            reader = "openpyxl"
+        else:
+            reader = "xlrd"
+    if reader == "csv":
+        return CsvReader(filename)
+    if reader == "parquet":
+        if pyarrow is None:
+            raise ImportError("the parquet reader needs pyarrow,"
+                              " pip install pyarrow")
+        return ParquetReader(filename)
+    if reader == "openpyxl":
+        if openpyxl is None:
+            raise ImportError("the openpyxl reader needs openpyxl,"
+                              " pip install openpyxl")
+        return OpenpyxlReader(filename)
+    if reader == "xlrd":
+        return XlrdReader(filename)
+    raise ValueError("unknown reader " + reader)
+
+
+class Sheet:
+    ''' a sheet name and an iterator over its rows
+
+    fingerprint, if not None, changes whenever the rows do.
+    '''
+
+    def __init__(self, name, rows, fingerprint=None):
+        self.name = name
+        self.rows = rows
+        self.fingerprint = fingerprint
+
+    def iter_rows(self) -> Iterator[List]:
+        return self.rows
+
+
+class XlrdReader:
+    ''' the whole workbook, loaded by xlrd '''
+
+    def __init__(self, filename):
+        from xlrd import open_workbook  # type: ignore
+        self.wb = open_workbook(filename)
+
+    def sheets(self) -> Iterator[Sheet]:
+        for sheet in self.wb.sheets():
+            yield Sheet(sheet.name, _xlrd_rows(sheet))
+
+    def close(self) -> None:
+        self.wb.release_resources()
+
+
+def _xlrd_rows(sheet) -> Iterator[List]:
+    for row in range(sheet.nrows):
+        yield sheet.row_values(row)
+
+
+class OpenpyxlReader:
+    ''' an .xlsx workbook, streamed by openpyxl in read-only mode '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.wb = openpyxl.load_workbook(filename, read_only=True,
+                                         data_only=True)
+
+    def sheets(self) -> Iterator[Sheet]:
+        with zipfile.ZipFile(self.filename) as archive:
+            parts = {info.filename: [info.CRC, info.file_size]
+                     for info in archive.infolist()}
+        shared = [parts.get(name) for name in XLSX_SHARED_PARTS]
+        for sheet in self.wb.worksheets:
+            yield Sheet(sheet.title, _openpyxl_rows(sheet),
+                        _sheet_fingerprint(sheet, parts, shared))
+
+    def close(self) -> None:
+        self.wb.close()
+
+
+def _sheet_fingerprint(sheet, parts, shared) -> Optional[List]:
+    path = getattr(sheet, "_worksheet_path", None)
+    if path is None or path.lstrip("/") not in parts:
+        return None
+    return [parts[path.lstrip("/")]] + shared
+
+
+def _openpyxl_rows(sheet) -> Iterator[List]:
+    for values in sheet.iter_rows(values_only=True):
+        yield [_as_xlrd_value(value) for value in values]
+
+
+def _as_xlrd_value(value):
+    ''' blank cells and numbers the way xlrd gives them '''
+    if value is None:
+        return ""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+class CsvReader:
+    ''' a csv file, read as one sheet a line at a time '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.csv_file = open(filename, newline='', encoding='utf8')
+
+    def sheets(self) -> Iterator[Sheet]:
+        name = os.path.basename(self.filename)
+        yield Sheet(name, csv.reader(self.csv_file))
+
+    def close(self) -> None:
+        self.csv_file.close()
+
+
+class ParquetReader:
+    ''' a parquet file, read as one sheet a batch of rows at a time '''
+
+    def __init__(self, filename, batch_rows=default_batch_rows):
+        self.filename = filename
+        self.batch_rows = batch_rows
+        self.pq_file = pyarrow.parquet.ParquetFile(filename)
+
+    def sheets(self) -> Iterator[Sheet]:
+        name = os.path.basename(self.filename)
+        yield Sheet(name, self._rows())
+
+    def _rows(self) -> Iterator[List]:
+        yield list(self.pq_file.schema_arrow.names)
+        for batch in self.pq_file.iter_batches(batch_size=self.batch_rows):
+            columns = [[_as_xlrd_value(value) for value in column]
+                       for column in batch.to_pydict().values()]
+            for row in zip(*columns):
+                yield list(row)
+
+    def close(self) -> None:
+        self.pq_file.close()
@@ -0,0 +1,73 @@
+// Load the tiled acquisitions GeoJSON (written by geotiles.py) for just
+// the part of the map in view, instead of the whole file.
+//   loadAcqTiles(map, "tiles/", onEachFeature)
+// tiles.json lists the tiles which have features, by quadkey, so no
+// request is made for an empty tile.
+
+function loadAcqTiles(map, baseUrl, onEachFeature) {
+    var layer = L.geoJSON(null, {onEachFeature: onEachFeature}).addTo(map);
+    var manifest = null;
+    var loaded = {};
+    var loadedZoom = null;
+    // counts the clearLayers, so a tile fetched before one is dropped
+    var generation = 0;
+
+    function quadkey(x, y, z) {
+        var key = "";
+        for (var i = z; i > 0; i--) {
+            var mask = 1 << (i - 1);
+            key += ((x & mask) ? 1 : 0) + ((y & mask) ? 2 : 0);
+        }
+        return key;
+    }
+
+    function refresh() {
+        var z = Math.max(manifest.minzoom,
+                         Math.min(manifest.maxzoom, map.getZoom()));
+        if (z !== loadedZoom) {
+            // the tiles of another zoom hold the same features
+            layer.clearLayers();
+            generation++;
+            loaded = {};
+            loadedZoom = z;
+        }
+        var n = 1 << z;
+        var bounds = map.getBounds();
+        var nw = map.project(bounds.getNorthWest(), z).divideBy(256).floor();
+        var se = map.project(bounds.getSouthEast(), z).divideBy(256).floor();
+        for (var tx = nw.x; tx <= se.x; tx++) {
+            var x = ((tx % n) + n) % n;
+            for (var y = Math.max(nw.y, 0); y <= Math.min(se.y, n - 1); y++) {
+                var key = quadkey(x, y, z);
+                if (loaded[key] || !(key in manifest.tiles)) {
+                    continue;
+                }
+                loaded[key] = true;
+                loadTile(z, x, y);
+            }
+        }
+    }
+
+    function loadTile(z, x, y) {
+        var tileGeneration = generation;
+        var url = baseUrl + manifest.path.replace("{z}", z)
+            .replace("{x}", x).replace("{y}", y);
+        fetch(url).then(function (response) {
+            return response.json();
+        }).then(function (tile) {
+            // the map may have zoomed while the tile was on its way
+            if (tileGeneration === generation) {
+                layer.addData(tile);
+            }
+        });
+    }
+
+    fetch(baseUrl + "tiles.json").then(function (response) {
+        return response.json();
+    }).then(function (tiles) {
+        manifest = tiles;
+        map.on("moveend", refresh);
+        refresh();
+    });
+    return layer;
+}
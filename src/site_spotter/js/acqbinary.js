@@ -0,0 +1,55 @@
+// Load the binary acquisitions file (written by binexport.py) into typed
+// arrays, instead of parsing acquisitions.geojson.
+//   loadAcqBinary("data/acquisitions.bin").then(function (acq) { ... })
+// acq.lon, acq.lat and acq.mag are Float32Arrays of acq.count places,
+// acq.place(i) is the name of place i, and acq.features() gives GeoJSON
+// like features for code which expects them.
+
+function loadAcqBinary(url) {
+    return fetch(url).then(function (response) {
+        return response.arrayBuffer();
+    }).then(parseAcqBinary);
+}
+
+function parseAcqBinary(buffer) {
+    var header = new DataView(buffer, 0, 16);
+    var magic = String.fromCharCode(header.getUint8(0), header.getUint8(1),
+                                    header.getUint8(2), header.getUint8(3));
+    if (magic !== "ACQB" || header.getUint32(4, true) !== 1) {
+        throw new Error("not a version 1 ACQB file");
+    }
+    var count = header.getUint32(8, true);
+    var namesLength = header.getUint32(12, true);
+    // the columns are views on the buffer, nothing is copied
+    //   (typed arrays are little-endian on all the usual browsers)
+    var pos = 16;
+    var lon = new Float32Array(buffer, pos, count);
+    pos += 4 * count;
+    var lat = new Float32Array(buffer, pos, count);
+    pos += 4 * count;
+    var mag = new Float32Array(buffer, pos, count);
+    pos += 4 * count;
+    var offsets = new Uint32Array(buffer, pos, count + 1);
+    pos += 4 * (count + 1);
+    var names = new Uint8Array(buffer, pos, namesLength);
+    var decoder = new TextDecoder("utf-8");
+
+    function place(i) {
+        return decoder.decode(names.subarray(offsets[i], offsets[i + 1]));
+    }
+
+    function features() {
+        var list = new Array(count);
+        for (var i = 0; i < count; i++) {
+            list[i] = {
+                type: "Feature",
+                properties: {place: place(i), mag: mag[i]},
+                geometry: {type: "Point", coordinates: [lon[i], lat[i]]}
+            };
+        }
+        return list;
+    }
+
+    return {count: count, lon: lon, lat: lat, mag: mag,
+            place: place, features: features};
+}
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Synthetic acquisitions data, for benchmarks.
+  rows shaped like the acquisitions export, with a header row
+  a chosen number of rows and of distinct addresses and org names
+  optionally, title rows above the header, a skew towards a few
+    busy org names, and blank cells
+  written out as xlsx, csv or parquet
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Iterator, List
+from itertools import accumulate
+import csv
+import random
+
+HEADER = ["Acquisition #", "Inst Dept", "Inst Name", "City", "Prov./state",
+          "Country", "Collection"]
+
+PROVINCES = ["Ontario", "Québec", "Nova Scotia", "Alberta",
+             "British Columbia", "Manitoba", "Yukon", ""]
+COUNTRIES = ["Canada", "Canada", "Canada", "United States", "Russia",
+             "France", "Brazil", "Japan"]
+COLLECTIONS = ["Bird", "Fish", "Mammal", "Mineral", "Plant", "Insect"]
+
+# the Inst Dept, City and Prov./state columns, which may be left blank
+BLANKABLE_COLS = (1, 3, 4)
+
+
+def synthetic_rows(n_rows, n_addrs=1000, n_orgs=200, seed=1,
+                   header_offset=0, org_skew=0.0,
+                   blank_rate=0.0) -> Iterator[List]:
+    ''' the header row, then n_rows data rows
+
+    header_offset title rows come before the header.  With org_skew > 0
+    org n is picked with weight 1 / (n + 1) ** org_skew, a Zipf-like
+    skew, instead of uniformly.  blank_rate is the chance that each
+    dept, city and province cell is left blank.
+    '''
+    rnd = random.Random(seed)
+    for i in range(header_offset):
+        yield ["Acquisitions export" if i == 0 else ""]
+    yield list(HEADER)
+    pick_org = _org_picker(rnd, n_orgs, org_skew)
+    for i in range(n_rows):
+        addr = rnd.randrange(n_addrs)
+        org = pick_org()
+        row = [float(i + 1),
+               "Dept {0}".format(org % 7) if org % 3 else "",
+               "Institution {0}".format(org),
+               "City {0}".format(addr),
+               PROVINCES[addr % len(PROVINCES)],
+               COUNTRIES[addr % len(COUNTRIES)],
+               COLLECTIONS[i % len(COLLECTIONS)]]
+        if blank_rate > 0:
+            for col in BLANKABLE_COLS:
+                if rnd.random() < blank_rate:
+                    row[col] = ""
+        yield row
+
+
+def _org_picker(rnd, n_orgs, org_skew):
+    if org_skew <= 0:
+        return lambda: rnd.randrange(n_orgs)
+    orgs = range(n_orgs)
+    cum_weights = list(accumulate(1.0 / (n + 1) ** org_skew for n in orgs))
+    return lambda: rnd.choices(orgs, cum_weights=cum_weights)[0]
+
+
+def write_xlsx(filename, rows) -> None:
+    import openpyxl  # type: ignore
+    wb = openpyxl.Workbook(write_only=True)
+    sheet = wb.create_sheet("Acquisitions")
+    for row in rows:
+        sheet.append(row)
+    wb.save(filename)
+
+
+def write_csv(filename, rows) -> None:
+    with open(filename, 'w', newline='', encoding='utf8') as csv_file:
+        csv.writer(csv_file).writerows(rows)
+
+
+def write_parquet(filename, rows) -> None:
+    import pyarrow  # type: ignore
+    import pyarrow.parquet  # type: ignore
+    rows = iter(rows)
+    header = next(rows)
+    columns = list(zip(*rows))
+    table = pyarrow.table({name: list(column)
+                           for (name, column) in zip(header, columns)})
+    pyarrow.parquet.write_table(table, filename)
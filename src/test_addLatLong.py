@@ -1,4 +1,5 @@
 
+import os
 import pytest
 import addLatLong
 import filecmp
@@ -16,6 +17,16 @@ test_locInstFilename   = "testData/testLocInst.json"
 test_locInstGeoJSON    = "testData/testLocInst.geojson"
 
 
+@pytest.fixture(autouse=True)
+def outputs_in_tmp_path(tmp_path, monkeypatch):
+    '''the loc DB and the outputs of each test go in its own directory'''
+    for name in ("test_locFileName", "test_locCountsFilename",
+                 "test_locCountsGeoJSON", "test_locInstFilename",
+                 "test_locInstGeoJSON"):
+        monkeypatch.setitem(globals(), name,
+                            str(tmp_path / os.path.basename(globals()[name])))
+
+
 def init_test_loc_file():
     '''the loc file should not change in many tests below'''
     copyfile(test_initlocFileName, test_locFileName)
@@ -199,3 +210,18 @@ def test_a_one_row():
     assert filecmp.cmp(test_locInstGeoJSON,
                        "testData/test_A_oneLocInstRef.geojson", shallow=False)
     return True
+
+
+def test_coords_rows_counted(tmp_path):
+    in_fn = str(tmp_path / "input.csv")
+    with open(in_fn, 'w', encoding='utf8') as csv_file:
+        csv_file.write("Inst Name,City,Country,Latitude,Longitude\n"
+                       "Parks,Ottawa,Canada,45.42,-75.69\n"
+                       "Carleton,Ottawa,Canada,45.42,-75.69\n")
+    a1 = addLatLong.AcqInfo(None, None, None, None, None)
+    a1.read_spreadsheet(in_fn)
+    # both rows, and both org names, of the place with coordinates
+    geo_loc = a1.all_data["Ottawa Canada"]
+    assert geo_loc["magnitude"] == 2
+    assert sorted(geo_loc["org names"]) == ["Carleton", "Parks"]
+    assert geo_loc["latitude"] == 45.42
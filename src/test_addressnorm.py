@@ -0,0 +1,90 @@
+import sqlite3
+import addLatLong
+import locationstore
+from addressnorm import canonical_key, AddressIndex
+
+
+def test_canonical_key():
+    key = canonical_key("Ottawa Ontario Canada")
+    assert key == "ottawa ontario canada"
+    assert canonical_key("Ottawa  Ontario Canada") == key
+    assert canonical_key("ottawa Ontario Canada") == key
+    assert canonical_key("Ottawa, ON, Canada") == key
+    assert canonical_key("Ste-Foy Québec Canada") == \
+        canonical_key("Ste-Foy Québec Canada") == "ste-foy quebec canada"
+    assert canonical_key("Boston MA USA") == "boston ma united states"
+    # only the province position is mapped
+    assert canonical_key("On Canada") == "ontario canada"
+    assert canonical_key("Stratford on Avon UK") == \
+        "stratford on avon united kingdom"
+    # the province abbreviations are only mapped before Canada
+    assert canonical_key("Lima PE") == "lima pe"
+    assert canonical_key("Charlottetown PE Canada") == \
+        "charlottetown prince edward island canada"
+    assert canonical_key("Isle of Man") == "isle of man"
+    assert canonical_key("Ottawa ON") == "ottawa on"
+
+
+def test_index_counts_saved_calls():
+    index = AddressIndex()
+    index.add("Ottawa Ontario Canada")
+    assert index.resolve("Ottawa  Ontario Canada") == "Ottawa Ontario Canada"
+    assert index.resolve("Ottawa ON Canada") == "Ottawa Ontario Canada"
+    assert index.resolve("Ottawa ON Canada") == "Ottawa Ontario Canada"
+    assert index.resolve("Hull QC Canada") == "Hull QC Canada"
+    assert index.resolve("Hull Québec Canada") == "Hull QC Canada"
+    assert index.calls_saved == 3
+
+
+def test_variants_share_magnitude():
+    a1 = addLatLong.AcqInfo(None, None, None, None, None)
+    a1.coords_found_in_xlsx = None
+    a1.all_data = {"Ontario Canada": {"magnitude": 0}}
+    a1.address_index = AddressIndex()
+    a1.address_index.add("Ontario Canada")
+    for addr in ["ontario canada", "ON Canada", "Ontario  Canada"]:
+        a1.save_row_address(a1.address_index.resolve(addr))
+    assert list(a1.all_data) == ["Ontario Canada"]
+    assert a1.all_data["Ontario Canada"]["magnitude"] == 3
+
+
+def test_index_seeded_from_sqlite_store(tmp_path):
+    store = locationstore.SQLiteLocationStore(str(tmp_path / "loc.sqlite"))
+    store.put_many([("Ottawa Ontario Canada",
+                     {"latitude": 45.4, "longitude": -75.7})])
+    a1 = addLatLong.AcqInfo(store.filename, None, None, None, None)
+    a1.location_store = store
+    a1.merge_partial({"Ottawa ON Canada": [2, None, None]})
+    # the variant found the stored record, and needs no lookup
+    assert list(a1.all_data) == ["Ottawa Ontario Canada"]
+    assert a1.all_data["Ottawa Ontario Canada"]["latitude"] == 45.4
+    assert a1.pending_addresses() == []
+    store.close()
+
+
+def test_stored_keys_indexed(tmp_path):
+    filename = str(tmp_path / "old.sqlite")
+    # a file made before the canonical keys were kept
+    conn = sqlite3.connect(filename)
+    conn.execute("CREATE TABLE locations (addr TEXT PRIMARY KEY,"
+                 " latitude REAL, longitude REAL, address TEXT)")
+    conn.executemany("INSERT INTO locations VALUES (?, ?, ?, ?)",
+                     [("Ottawa Ontario Canada", 45.4, -75.7, None),
+                      ("Oslo Norway", 59.9, 10.7, None)])
+    conn.commit()
+    conn.close()
+    store = locationstore.SQLiteLocationStore(filename)
+    assert store.find_variant("ottawa ontario canada") == \
+        "Ottawa Ontario Canada"
+    store.put_many([("Lima PE", {"latitude": -12.0})])
+    assert store.find_variant("lima pe") == "Lima PE"
+
+    index = AddressIndex(store.find_variant)
+    assert index.resolve("ottawa ON Canada") == "Ottawa Ontario Canada"
+    assert index.resolve("Ottawa Ontario Canada") == "Ottawa Ontario Canada"
+    assert index.resolve("Gatineau QC Canada") == "Gatineau QC Canada"
+    assert index.calls_saved == 1
+    # only the addresses asked for are held in memory
+    assert sorted(index.by_key) == ["gatineau quebec canada",
+                                    "ottawa ontario canada"]
+    store.close()
@@ -0,0 +1,58 @@
+
+import filecmp
+import addLatLong
+import batchscan
+from batchscan import count_workbook, find_workbooks, scan_workbooks
+
+
+def test_find_workbooks():
+    workbooks = find_workbooks(["testData"])
+    assert "testData/test_B_one.xlsx" in workbooks
+    assert not any(fn.endswith(".json") for fn in workbooks)
+    assert find_workbooks(["a.xlsx"]) == ["a.xlsx"]
+
+
+def test_count_workbook():
+    (coordsFound, partial) = count_workbook(("testData/test_B_two.xlsx",
+                                             "auto", 50, 10000))
+    assert not coordsFound
+    assert partial["Ontario Canada"][0] == 2
+
+
+def test_one_workbook_matches_scan_spreadsheet(make_acq, tmp_path):
+    a1 = make_acq()
+    scan_workbooks(a1, ["testData/test_B_two.xlsx"])
+    assert a1.all_data["Ontario Canada"]["magnitude"] == 2
+    assert filecmp.cmp(str(tmp_path / "counts.json"),
+                       "testData/test_B_twoLocCountsRef.json", shallow=False)
+    assert filecmp.cmp(str(tmp_path / "inst.json"),
+                       "testData/test_B_twoLocInstRef.json", shallow=False)
+
+
+def test_workers_merge_partials(make_acq):
+    workbooks = ["testData/test_B_one.xlsx",
+                 "testData/test_B_two.xlsx",
+                 "testData/test_C_two.xlsx"]
+    pooled = make_acq()
+    scan_workbooks(pooled, workbooks, jobs=2)
+    serial = make_acq()
+    scan_workbooks(serial, workbooks, jobs=1)
+
+    assert pooled.all_data["Ontario Canada"]["magnitude"] == 3
+    assert pooled.all_data["Cornwall Ontario Canada"]["magnitude"] == 2
+    assert (dict(pooled.all_data["Ontario Canada"].items()) ==
+            dict(serial.all_data["Ontario Canada"].items()))
+    assert list(pooled.all_data) == list(serial.all_data)
+
+
+def test_options_shared_with_addLatLong():
+    args = batchscan.parse_args(["--daily-limit", "50", "--workers", "2",
+                                 "--compact", "in.xlsx"])
+    a1 = addLatLong.make_acq(args)
+    # the failures and the day's lookups are shared with addLatLong runs
+    assert a1.failuresFileName == addLatLong.default_failuresFileName
+    assert a1.quotaFileName == addLatLong.default_quotaFileName
+    assert a1.geocode_daily_limit == 50
+    assert a1.geocode_workers == 2
+    assert a1.coord_precision == addLatLong.default_coord_precision
+    assert not a1.pipeline_geocodes
@@ -0,0 +1,85 @@
+
+import json
+import pytest
+import addLatLong
+import binexport
+import geojsonfile
+
+all_data = {
+    "Russia": {"latitude": 61.52401, "longitude": 105.318756,
+               "address": "Russia", "magnitude": 2,
+               "org names": {"Parks Russia": 2}},
+    "Québec Canada": {"latitude": 52.9399, "longitude": -73.5491,
+                      "address": "Québec, Canada", "magnitude": 5},
+    "Ontario Canada": {"latitude": 51.253775, "longitude": -85.323214,
+                       "address": "Ontario, Canada", "magnitude": 0},
+}
+
+
+def test_matches_geojson(tmp_path):
+    bin_fn = str(tmp_path / "acq.bin")
+    geo_fn = str(tmp_path / "acq.geojson")
+    assert binexport.write_binary_file(all_data, bin_fn) == 2
+    geojsonfile.write_geojson_file(all_data, geo_fn, and_properties=False)
+    with open(geo_fn, encoding='utf8') as geo_file:
+        features = json.load(geo_file)["features"]
+
+    columns = binexport.read_binary_file(bin_fn)
+    assert columns["place"] == [feature["properties"]["place"]
+                                for feature in features]
+    for (i, feature) in enumerate(features):
+        (lon, lat) = feature["geometry"]["coordinates"][:2]
+        assert columns["longitude"][i] == pytest.approx(lon, abs=1e-4)
+        assert columns["latitude"][i] == pytest.approx(lat, abs=1e-4)
+        assert columns["mag"][i] == pytest.approx(
+            feature["properties"]["mag"])
+
+
+def test_layout(tmp_path):
+    bin_fn = str(tmp_path / "acq.bin")
+    binexport.write_binary_file(all_data, bin_fn)
+    with open(bin_fn, 'rb') as bin_file:
+        data = bin_file.read()
+    names = "RussiaQuébec, Canada".encode("utf8")
+    assert data[:4] == b"ACQB"
+    assert len(data) == 16 + 3 * 4 * 2 + 4 * 3 + len(names)
+    assert data.endswith(names)
+
+
+def test_not_binary(tmp_path):
+    bad_fn = str(tmp_path / "bad.bin")
+    with open(bad_fn, 'wb') as bad_file:
+        bad_file.write(b"{}" * 16)
+    with pytest.raises(ValueError):
+        binexport.read_binary_file(bad_fn)
+
+
+def test_blank_coords_left_out(tmp_path):
+    data = dict(all_data)
+    data["Blank"] = {"latitude": "", "longitude": "",
+                     "address": "Blank", "magnitude": 5}
+    bin_fn = str(tmp_path / "acq.bin")
+    assert binexport.write_binary_file(data, bin_fn) == 2
+    assert "Blank" not in binexport.read_binary_file(bin_fn)["place"]
+
+
+def test_blank_coord_cell_in_all_outputs(tmp_path):
+    in_fn = str(tmp_path / "input.csv")
+    with open(in_fn, 'w', encoding='utf8') as csv_file:
+        csv_file.write("City,Country,Latitude,Longitude\n"
+                       "Ottawa,Canada,45.42,-75.69\n"
+                       "Oslo,Norway,,10.75\n")
+    a1 = addLatLong.AcqInfo(None, *[str(tmp_path / fn) for fn in
+                                    ("c.json", "c.geojson",
+                                     "i.json", "i.geojson")])
+    a1.coord_precision = 5
+    a1.merge_distance = 100.0
+    a1.binFileName = str(tmp_path / "acq.bin")
+    a1.tilesDir = str(tmp_path / "tiles")
+    a1.clustersDir = str(tmp_path / "clusters")
+    a1.scan_spreadsheet(in_fn)
+    assert a1.all_data["Oslo Norway"]["latitude"] == ""
+    assert binexport.read_binary_file(a1.binFileName)["place"] == [
+        "Ottawa Canada"]
+    with open(str(tmp_path / "c.geojson"), encoding='utf8') as geo_file:
+        assert len(json.load(geo_file)["features"]) == 1
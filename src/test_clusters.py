@@ -0,0 +1,90 @@
+
+import json
+import pytest
+import addLatLong
+import clusters
+
+all_data = {
+    "Ottawa Ontario Canada": {"latitude": 45.42, "longitude": -75.69,
+                              "address": "Ottawa, ON, Canada",
+                              "magnitude": 3,
+                              "org names": {"Carleton": 2, "Parks": 1}},
+    "Gatineau Québec Canada": {"latitude": 45.48, "longitude": -75.70,
+                               "address": "Gatineau, QC, Canada",
+                               "magnitude": 1,
+                               "org names": {"Parks": 1}},
+    "Russia": {"latitude": 61.52, "longitude": 105.32,
+               "address": "Russia", "magnitude": 2},
+    "Unused": {"latitude": 1.0, "longitude": 1.0,
+               "address": "Unused", "magnitude": 0},
+}
+
+
+def test_project_round_trip():
+    (x, y) = clusters.project(-75.69, 45.42)
+    (lon, lat) = clusters.unproject(x, y)
+    assert abs(lon + 75.69) < 1e-9
+    assert abs(lat - 45.42) < 1e-9
+
+
+def test_levels():
+    levels = clusters.build_clusters(all_data, 1, 12)
+    # far apart at zoom 12, Ottawa and Gatineau merge at zoom 1
+    assert len(levels[12]) == 3
+    (ottawa, russia) = levels[1]
+    assert ottawa.place == "Ottawa, ON, Canada"
+    assert ottawa.magnitude == 4
+    assert ottawa.count == 2
+    assert ottawa.orgs == {"Carleton": 2, "Parks": 2}
+    assert russia.count == 1
+    # every level keeps all of the magnitude
+    for marks in levels.values():
+        assert sum(mark.magnitude for mark in marks) == 6
+
+
+def test_matches_pairwise():
+    ''' the grid finds the same neighbours as comparing every pair '''
+    marks = [clusters.Cluster(i * 0.013 % 1, i * 0.007 % 1, 1, 1, {}, str(i))
+             for i in range(300)]
+    radius = 0.02
+    grouped = clusters.cluster_level(marks, radius)
+    assert sum(mark.count for mark in grouped) == 300
+    for (i, a) in enumerate(grouped):
+        for b in grouped[i + 1:]:
+            if a.count == 1 and b.count == 1:
+                assert (a.x - b.x) ** 2 + (a.y - b.y) ** 2 > radius ** 2
+
+
+def test_top_orgs():
+    marks = [clusters.Cluster(0.5, 0.5, 1, 1, {"org {0}".format(i): i + 1},
+                              str(i)) for i in range(5)]
+    (cluster,) = clusters.cluster_level(marks, 0.1, top_orgs=2)
+    assert cluster.orgs == {"org 4": 5, "org 3": 4}
+
+
+def test_write(tmp_path):
+    levels = clusters.build_clusters(all_data, 1, 3)
+    clusters.write_clusters(levels, str(tmp_path), precision=3)
+    with open(clusters.cluster_filename(str(tmp_path), 1)) as json_file:
+        collection = json.load(json_file)
+    assert collection["metadata"]["count"] == 2
+    (feature, other) = collection["features"]
+    assert feature["properties"]["count"] == 2
+    assert feature["properties"]["mag"] == 0.4
+
+
+def test_blank_coords_left_out():
+    data = dict(all_data)
+    data["Blank"] = {"latitude": 45.0, "longitude": "",
+                     "address": "Blank", "magnitude": 5}
+    marks = clusters.place_marks(data)
+    assert sorted(mark.place for mark in marks) == [
+        "Gatineau, QC, Canada", "Ottawa, ON, Canada", "Russia"]
+
+
+def test_cluster_zooms_checked(capsys):
+    args = addLatLong.parse_args(["--cluster-zooms", "3", "8"])
+    assert args.cluster_zooms == [3, 8]
+    with pytest.raises(SystemExit):
+        addLatLong.parse_args(["--cluster-zooms", "8", "3"])
+    assert "--cluster-zooms" in capsys.readouterr().err
@@ -0,0 +1,82 @@
+
+import colocate
+from records import LocRecord
+
+
+def make_data():
+    rows = [("Ottawa Ontario Canada", 45.4215, -75.6972, 3, {"Carleton": 3}),
+            ("Ottawa Canada", 45.4216, -75.6970, 1, {"Parks": 1}),
+            ("Gatineau Québec Canada", 45.4765, -75.7013, 2, {}),
+            ("Unused", 45.4215, -75.6972, 0, None),
+            ("Nowhere", None, None, 1, None)]
+    all_data = {}
+    for (addr, lat, lon, magnitude, orgs) in rows:
+        geo_loc = LocRecord()
+        if lat is not None:
+            geo_loc["latitude"] = lat
+            geo_loc["longitude"] = lon
+            geo_loc["address"] = addr
+        geo_loc["magnitude"] = magnitude
+        if orgs is not None:
+            geo_loc["org names"] = orgs
+        all_data[addr] = geo_loc
+    return all_data
+
+
+def test_chord():
+    # a quarter of the way round is a right angle
+    quarter = colocate.EARTH_RADIUS * 3.14159265358979 / 2
+    assert abs(colocate.chord(quarter) - 2 ** 0.5) < 1e-9
+
+
+def test_merge_within_distance():
+    all_data = make_data()
+    (out, merged) = colocate.consolidate(all_data, 100.0)
+    assert merged == 1
+    assert list(out) == ["Ottawa Ontario Canada", "Gatineau Québec Canada",
+                         "Unused", "Nowhere"]
+    ottawa = out["Ottawa Ontario Canada"]
+    assert ottawa["magnitude"] == 4
+    assert ottawa["org names"] == {"Carleton": 3, "Parks": 1}
+    assert ottawa["latitude"] == 45.4215
+    # all_data itself is not changed
+    assert all_data["Ottawa Ontario Canada"]["magnitude"] == 3
+    assert "Ottawa Canada" in all_data
+
+
+def test_larger_distance():
+    (out, merged) = colocate.consolidate(make_data(), 10000.0)
+    assert merged == 2
+    assert out["Ottawa Ontario Canada"]["magnitude"] == 6
+
+
+def test_matches_pairwise():
+    ''' no two records left are within the distance of each other '''
+    all_data = {}
+    for i in range(400):
+        geo_loc = LocRecord()
+        geo_loc["latitude"] = 45.0 + (i * 37 % 100) / 1000.0
+        geo_loc["longitude"] = -75.0 + (i * 53 % 100) / 1000.0
+        geo_loc["magnitude"] = 1
+        all_data[str(i)] = geo_loc
+    (out, merged) = colocate.consolidate(all_data, 500.0)
+    assert sum(geo_loc["magnitude"] for geo_loc in out.values()) == 400
+    limit = colocate.chord(500.0) ** 2
+    points = [colocate.unit_vector(geo_loc["longitude"], geo_loc["latitude"])
+              for geo_loc in out.values() if geo_loc["magnitude"] == 1]
+    for (i, p) in enumerate(points):
+        for q in points[i + 1:]:
+            assert sum((a - b) ** 2 for (a, b) in zip(p, q)) > limit
+
+
+def test_blank_coords_not_merged():
+    all_data = make_data()
+    blank = LocRecord()
+    blank["latitude"] = ""
+    blank["longitude"] = -75.6972
+    blank["address"] = "Blank"
+    blank["magnitude"] = 5
+    all_data["Blank"] = blank
+    (out, merged) = colocate.consolidate(all_data, 100.0)
+    assert merged == 1
+    assert out["Blank"] is blank
@@ -0,0 +1,100 @@
+import csv
+import geopy.exc
+import addLatLong
+import failcache
+from fakegeocoder import FakeGeocoder
+
+DAY = 86400.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_backoff_and_quarantine(tmp_path):
+    clock = Clock()
+    cache = failcache.FailureCache(str(tmp_path / "failures.json"),
+                                   clock=clock)
+    cache.record("flaky", geopy.exc.GeocoderTimedOut("slow"))
+    cache.record("nowhere", None)
+    cache.record("bad", geopy.exc.GeocoderQueryError("invalid"))
+    assert cache.record("any", geopy.exc.GeocoderQuotaExceeded("q")) is None
+    addrs = ["flaky", "nowhere", "bad", "any", "new"]
+    assert cache.eligible(addrs) == ["any", "new"]
+
+    clock.now += DAY
+    assert cache.eligible(addrs) == ["flaky", "any", "new"]
+    # each failure doubles the wait
+    entry = cache.record("flaky", geopy.exc.GeocoderUnavailable("down"))
+    assert entry["attempts"] == 2
+    assert entry["retry"] == clock.now + 2 * DAY
+    assert entry["error"] == "GeocoderUnavailable"
+    for i in range(10):
+        entry = cache.record("flaky", geopy.exc.GeocoderTimedOut("slow"))
+    assert entry["retry"] == clock.now + failcache.default_max_backoff
+
+    cache.save()
+    again = failcache.FailureCache(cache.filename, clock=clock)
+    assert again.entries == cache.entries
+    quarantined = [addr for (addr, entry) in again.quarantined()]
+    assert quarantined == ["nowhere", "bad"]
+    assert again.entries["nowhere"]["error"] == failcache.ZERO_RESULTS
+    again.forget("flaky")
+    assert "flaky" not in again.entries
+
+
+def new_acq(tmp_path, geocoder):
+    a1 = addLatLong.AcqInfo(None, None, None, None, None)
+    a1.all_data = {"Ottawa Canada": {"magnitude": 2},
+                   "Nowhere": {"magnitude": 3},
+                   "Flaky": {"magnitude": 1}}
+    a1.failuresFileName = str(tmp_path / "failures.json")
+    a1.quarantineFileName = str(tmp_path / "quarantine.csv")
+    a1.geocoder = geocoder
+    a1.geocode_retries = 0
+    return a1
+
+
+def test_failed_addresses_not_retried(tmp_path):
+    a1 = new_acq(tmp_path, FakeGeocoder(no_match=["Nowhere"],
+                                        failures={"Flaky": 1}))
+    a1.get_info()
+    assert sorted(a1.geocoder.calls) == ["Flaky", "Nowhere", "Ottawa Canada"]
+    with open(a1.quarantineFileName) as csv_file:
+        rows = list(csv.reader(csv_file))
+    assert rows[1][:3] == ["Nowhere", "ZERO_RESULTS", "1"]
+    assert rows[1][5] == "3"
+
+    # the next run spends no lookups on them
+    a2 = new_acq(tmp_path, FakeGeocoder())
+    a2.get_info()
+    assert sorted(a2.geocoder.calls) == ["Ottawa Canada"]
+    assert a2.failures.skipped == 2
+
+    # unless asked to, and a success is forgotten
+    a3 = new_acq(tmp_path, FakeGeocoder(no_match=["Nowhere"]))
+    a3.retry_failures = True
+    a3.get_info()
+    assert "Flaky" in a3.geocoder.calls
+    assert list(a3.failures.entries) == ["Nowhere"]
+
+
+def test_runs_at_once_keep_each_others_failures(tmp_path):
+    filename = str(tmp_path / "failures.json")
+    start = failcache.FailureCache(filename)
+    start.record("fixed", geopy.exc.GeocoderTimedOut("slow"))
+    start.save()
+
+    first = failcache.FailureCache(filename)
+    second = failcache.FailureCache(filename)
+    first.record("one", None)
+    first.forget("fixed")
+    second.record("two", geopy.exc.GeocoderTimedOut("slow"))
+    first.save()
+    second.save()
+    assert sorted(second.entries) == ["one", "two"]
+    assert sorted(failcache.FailureCache(filename).entries) == ["one", "two"]
@@ -0,0 +1,78 @@
+import os
+import pickle
+from shutil import copyfile
+import addLatLong
+import gazetteer
+from fakegeocoder import FakeGeocoder
+
+
+def gazetteer_copy(tmp_path):
+    filename = str(tmp_path / "gazetteer.csv")
+    copyfile("testData/testGazetteer.csv", filename)
+    return filename
+
+
+def test_resolve(tmp_path):
+    g = gazetteer.Gazetteer(gazetteer_copy(tmp_path))
+    assert not g.from_snapshot
+    assert g.resolve("Russia") == {"latitude": 61.52401,
+                                   "longitude": 105.318756,
+                                   "address": "Russia"}
+    assert g.resolve("ON Canada")["address"] == "Ontario, Canada"
+    assert g.resolve("Ottawa  Canada")["address"] == "Ottawa, Ontario, Canada"
+    assert g.resolve("Quebec Canada")["address"] == "Québec, Canada"
+    assert g.resolve("Cornwall Ontario Canada") is None
+
+
+def test_snapshot(tmp_path):
+    filename = gazetteer_copy(tmp_path)
+    gazetteer.Gazetteer(filename)
+    assert os.path.exists(filename + gazetteer.SNAPSHOT_SUFFIX)
+    g = gazetteer.Gazetteer(filename)
+    assert g.from_snapshot
+    assert g.resolve("Canada") is not None
+
+    # a newer gazetteer file makes the snapshot stale
+    stat = os.stat(filename + gazetteer.SNAPSHOT_SUFFIX)
+    os.utime(filename, (stat.st_atime, stat.st_mtime + 10))
+    assert not gazetteer.Gazetteer(filename).from_snapshot
+
+
+def test_only_unresolved_go_to_google(tmp_path):
+    a1 = addLatLong.AcqInfo(None, None, None, None, None)
+    a1.gazetteerFileName = gazetteer_copy(tmp_path)
+    a1.all_data = {"Ontario Canada": {"magnitude": 1},
+                   "Cornwall Ontario Canada": {"magnitude": 1}}
+    a1.geocoder = FakeGeocoder()
+    a1.get_info()
+    assert a1.geocoder.calls == ["Cornwall Ontario Canada"]
+    assert a1.all_data["Ontario Canada"]["latitude"] == 51.253775
+
+
+def test_starting_with(tmp_path):
+    g = gazetteer.Gazetteer(gazetteer_copy(tmp_path))
+    places = g.starting_with("ott")
+    assert [p["key"] for p in places] == ["ottawa canada",
+                                          "ottawa ontario canada"]
+    assert {p["address"] for p in places} == {"Ottawa, Ontario, Canada"}
+    assert len(g.starting_with("ON", limit=1)) == 1
+    assert g.starting_with("Cornwall") == []
+    assert len(g.starting_with("")) == len(g.index)
+
+
+def test_damaged_snapshot_rebuilt(tmp_path):
+    filename = gazetteer_copy(tmp_path)
+    gazetteer.Gazetteer(filename)
+    # an old layout, as left by an earlier version
+    with open(filename + gazetteer.SNAPSHOT_SUFFIX, 'wb') as snap_file:
+        snap_file.write(b"\x80\x04\x95\x05\x00")
+    g = gazetteer.Gazetteer(filename)
+    assert not g.from_snapshot
+    assert g.resolve("Canada") is not None
+    with open(filename + gazetteer.SNAPSHOT_SUFFIX, 'wb') as snap_file:
+        pickle.dump((1, {"canada": (1, 2, "Canada")}), snap_file)
+    assert not gazetteer.Gazetteer(filename).from_snapshot
+    # a class that is gone since the snapshot was written
+    with open(filename + gazetteer.SNAPSHOT_SUFFIX, 'wb') as snap_file:
+        snap_file.write(b"\x80\x04cgazetteer\nGone\n.")
+    assert not gazetteer.Gazetteer(filename).from_snapshot
@@ -0,0 +1,175 @@
+import filecmp
+import time
+import geopy.exc
+import pytest
+import addLatLong
+import failcache
+import geocoding
+import synthdata
+from fakegeocoder import FakeGeocoder, fake_coords
+
+
+def test_results_in_order():
+    addrs = ["addr %d" % i for i in range(20)]
+    fake = FakeGeocoder(latency=0.01)
+    results = geocoding.geocode_all(fake, addrs, workers=4, rate=None)
+    assert [r.addr for r in results] == addrs
+    assert results[3].location.latitude == fake_coords("addr 3")[0]
+    # the pool bounds the requests in flight
+    assert 1 < fake.max_in_flight <= 4
+
+
+def test_retry_with_backoff():
+    fake = FakeGeocoder(failures={"flaky": 2, "broken": -1})
+    results = geocoding.geocode_all(fake, ["flaky", "broken", "fine"],
+                                    workers=2, rate=None, retries=2,
+                                    backoff=0.001)
+    (flaky, broken, fine) = results
+    assert flaky.location is not None and flaky.attempts == 3
+    assert broken.location is None and broken.attempts == 3
+    assert isinstance(broken.error, geopy.exc.GeocoderTimedOut)
+    assert fine.attempts == 1
+
+
+def test_query_error_not_retried():
+    fake = FakeGeocoder(failures={"bad": -1},
+                        error=geopy.exc.GeocoderQueryError)
+    (bad,) = geocoding.geocode_all(fake, ["bad"], workers=1, rate=None)
+    assert bad.location is None and bad.attempts == 1
+
+
+def test_rate_limiter():
+    limiter = geocoding.RateLimiter(200)
+    start = time.monotonic()
+    for i in range(11):
+        limiter.wait()
+    assert time.monotonic() - start >= 0.05 - 0.005
+
+
+def test_get_info_with_fake_geocoder():
+    a1 = addLatLong.AcqInfo(None, None, None, None, None)
+    a1.all_data = {"Ottawa Canada": {"magnitude": 2},
+                   "Russia": {"magnitude": 1, "latitude": 61.5,
+                              "longitude": 105.3, "address": "Russia"},
+                   "Nowhere": {"magnitude": 1},
+                   "various": {"magnitude": 1}}
+    a1.geocoder = FakeGeocoder(latency=0.001, no_match=["Nowhere"])
+    a1.get_info()
+    assert a1.geocoder.calls.count("Ottawa Canada") == 1
+    assert "Russia" not in a1.geocoder.calls
+    assert "various" not in a1.geocoder.calls
+    rec = a1.all_data["Ottawa Canada"]
+    assert (rec["latitude"], rec["longitude"]) == fake_coords("Ottawa Canada")
+    assert "latitude" not in a1.all_data["Nowhere"]
+
+
+def test_geocode_queue():
+    fake = FakeGeocoder(latency=0.001, no_match=["nowhere"])
+    lookups = geocoding.GeocodeQueue(fake, workers=3, rate=None)
+    taken = [lookups.put(addr) for addr in
+             ["a", "b", "a", "nowhere", "c"]]
+    assert taken == [True, True, False, True, True]
+    results = lookups.finish()
+    assert [r.addr for r in results] == ["a", "b", "nowhere", "c"]
+    assert results[2].location is None
+    assert sorted(fake.calls) == ["a", "b", "c", "nowhere"]
+
+
+def run_pipeline(tmp_path, name, pipeline):
+    in_fn = str(tmp_path / "input.csv")
+    if not (tmp_path / "input.csv").exists():
+        synthdata.write_csv(in_fn,
+                            synthdata.synthetic_rows(2000, n_addrs=50))
+    loc_fn = str(tmp_path / (name + "loc.json"))
+    with open(loc_fn, 'w') as loc_file:
+        loc_file.write("{}")
+    a1 = addLatLong.AcqInfo(loc_fn, *[str(tmp_path / (name + fn)) for fn in
+                                      ("c.json", "c.geojson",
+                                       "i.json", "i.geojson")])
+    a1.geocoder = FakeGeocoder(latency=0.001)
+    a1.geocode_limit = None
+    a1.geocode_rate = None
+    a1.gazetteerFileName = None
+    a1.pipeline_geocodes = pipeline
+    a1.pipeline_chunk_rows = 200
+    queued = []
+    count_chunk = a1.count_chunk
+
+    def counting(*args):
+        queue = a1.geocode_queue
+        queued.append(0 if queue is None else len(queue.addrs))
+        return count_chunk(*args)
+    a1.count_chunk = counting
+    a1.read_spreadsheet(in_fn)
+    if pipeline:
+        # the lookups started while the rows were being read
+        assert len(queued) == 10
+        assert queued[1] > 0
+    else:
+        assert len(queued) == 1
+    a1.get_info()
+    a1.write_outputs()
+    return a1
+
+
+def test_pipeline_same_outputs(tmp_path):
+    plain = run_pipeline(tmp_path, "plain", False)
+    piped = run_pipeline(tmp_path, "piped", True)
+    assert sorted(piped.geocoder.calls) == sorted(plain.geocoder.calls)
+    for fn in ("c.json", "c.geojson", "i.json", "i.geojson"):
+        assert filecmp.cmp(str(tmp_path / ("plain" + fn)),
+                           str(tmp_path / ("piped" + fn)), shallow=False)
+
+
+def test_pipeline_saved_on_coords_sheet(tmp_path):
+    in_fn = str(tmp_path / "input.csv")
+    with open(in_fn, 'w', encoding='utf8') as csv_file:
+        csv_file.write("City,Country,Latitude,Longitude\n"
+                       "Ottawa,Canada,45.42,-75.69\n")
+    a1 = addLatLong.AcqInfo(None, *[str(tmp_path / fn) for fn in
+                                    ("c.json", "c.geojson",
+                                     "i.json", "i.geojson")])
+    a1.geocoder = FakeGeocoder(no_match=["Nowhere"])
+    a1.geocode_limit = None
+    a1.geocode_rate = None
+    a1.gazetteerFileName = None
+    a1.failuresFileName = str(tmp_path / "failures.json")
+    a1.quarantineFileName = str(tmp_path / "quarantine.csv")
+    a1.quotaFileName = str(tmp_path / "quota.json")
+    a1.pipeline_geocodes = True
+    a1.all_data = {}
+    # queued from an earlier sheet of addresses
+    a1.save_row_address("Nowhere")
+    a1.scan_spreadsheet(in_fn)
+    assert a1.geocoder.calls == ["Nowhere"]
+    assert a1.quota.used == 1
+    assert a1.failures.is_quarantined("Nowhere")
+    assert "Nowhere" in failcache.FailureCache(a1.failuresFileName).entries
+
+
+def test_pipeline_off_when_limited(tmp_path):
+    in_fn = str(tmp_path / "input.csv")
+    with open(in_fn, 'w', encoding='utf8') as csv_file:
+        csv_file.write("City,Country\nOslo,Norway\nOttawa,Canada\n"
+                       "Ottawa,Canada\n")
+    a1 = addLatLong.AcqInfo(None, None, None, None, None)
+    a1.all_data = {}
+    a1.geocoder = FakeGeocoder()
+    a1.geocode_limit = 1
+    a1.geocode_rate = None
+    a1.gazetteerFileName = None
+    a1.pipeline_geocodes = True
+    a1.read_spreadsheet(in_fn)
+    assert a1.geocode_queue is None
+    a1.get_info()
+    # the most used, not the first found
+    assert a1.geocoder.calls == ["Ottawa Canada"]
+
+
+def test_pipeline_needs_no_limit():
+    for argv in (["--pipeline"],
+                 ["--pipeline", "--limit", "5"],
+                 ["--pipeline", "--limit", "0", "--daily-limit", "100"]):
+        with pytest.raises(SystemExit):
+            addLatLong.parse_args(argv)
+    assert addLatLong.parse_args(["--pipeline", "--limit", "0"]).pipeline
@@ -0,0 +1,69 @@
+import json
+import geojsonfile
+
+all_data = {
+    "Russia": {"latitude": 61.52401, "longitude": 105.318756,
+               "address": "Russia", "magnitude": 2,
+               "org names": {"Parks Russia": 2}},
+    "Ontario Canada": {"latitude": 51.253775, "longitude": -85.323214,
+                       "address": "Ontario, Canada", "magnitude": 0},
+    "Nowhere": {"magnitude": 1, "org names": []},
+}
+
+
+def write_all(tmp_path, data):
+    names = [str(tmp_path / name) for name in
+             ("inst.json", "counts.json", "inst.geojson", "counts.geojson")]
+    geojsonfile.write_all_outputs(data, *names)
+    return [open(name, encoding='utf8').read() for name in names]
+
+
+def test_streamed_json_matches_dump(tmp_path):
+    (inst, counts, inst_geo, counts_geo) = write_all(tmp_path, all_data)
+    assert inst == json.dumps(all_data)
+    assert counts == json.dumps({addr: {k: v for (k, v) in rec.items()
+                                        if k != "org names"}
+                                 for (addr, rec) in all_data.items()})
+    assert json.loads(inst_geo)["metadata"]["count"] == 3
+    (feature,) = json.loads(inst_geo)["features"]
+    assert feature["properties"]["popupContent"] == {"Parks Russia": 2}
+    (feature,) = json.loads(counts_geo)["features"]
+    assert "popupContent" not in feature["properties"]
+
+
+def test_single_file_matches_pass(tmp_path):
+    (inst, counts, inst_geo, counts_geo) = write_all(tmp_path, all_data)
+    filename = str(tmp_path / "one.geojson")
+    geojsonfile.write_geojson_file(all_data, filename, and_properties=True)
+    assert open(filename, encoding='utf8').read() == inst_geo
+
+
+def test_empty(tmp_path):
+    for text in write_all(tmp_path, {}):
+        json.loads(text)
+
+
+def test_compact(tmp_path):
+    names = [str(tmp_path / name) for name in
+             ("inst.json", "counts.json", "inst.geojson", "counts.geojson")]
+    geojsonfile.write_all_outputs(all_data, *names, precision=2)
+    text = open(names[2], encoding='utf8').read()
+    assert " " not in text.replace("Parks Russia", "")
+    collection = json.loads(text)
+    assert collection["metadata"] == {"count": 3}
+    (feature,) = collection["features"]
+    assert feature["geometry"]["coordinates"] == [105.32, 61.52]
+    assert "id" not in feature
+    assert feature["properties"]["popupContent"] == {"Parks Russia": 2}
+    # the json files are not changed by the precision
+    assert open(names[0], encoding='utf8').read() == json.dumps(all_data)
+
+
+def test_blank_coords():
+    blank = {"latitude": "", "longitude": -75.7, "address": "Ottawa",
+             "magnitude": 1}
+    assert geojsonfile.point_of(blank) is None
+    assert geojsonfile.point_of({"latitude": None, "longitude": 1.0}) is None
+    assert geojsonfile.point_of({"latitude": 2, "longitude": 1.5}) == (1.5, 2)
+    # compact GeoJSON leaves the record out
+    assert geojsonfile.make_feature(blank, False, precision=5) is None
@@ -0,0 +1,222 @@
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from failcache import FailureCache
+from fakegeocoder import FakeGeocoder, fake_coords
+from geoservice import GeocodeService, LRUCache, SingleFlight, make_server
+from locationstore import JSONLocationStore, SQLiteLocationStore
+from quota import GeocodeQuota
+
+
+@pytest.fixture
+def service(tmp_path):
+    store = SQLiteLocationStore(str(tmp_path / "loc.sqlite"))
+    store.put_many([("Russia", {"latitude": 61.5, "longitude": 105.3,
+                                "address": "Russia"})])
+    service = GeocodeService(store, FakeGeocoder(latency=0.05),
+                             cache_size=100, workers=8, rate=None)
+    yield service
+    service.close()
+
+
+def test_lru_evicts_oldest():
+    cache = LRUCache(2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("no")
+    with pytest.raises(ValueError):
+        flight.do("a", fail)
+    assert flight.do("a", lambda: 1) == 1
+
+
+def test_store_then_cache(service):
+    assert service.lookup("Russia")["latitude"] == 61.5
+    assert service.lookup("Russia")["latitude"] == 61.5
+    assert service.geocoder_calls == 0
+    assert service.cache.hits == 1
+
+
+def test_concurrent_lookups_collapse(service):
+    results = []
+
+    def look():
+        results.append(service.lookup("Ottawa Ontario Canada"))
+    threads = [threading.Thread(target=look) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(service.geocoder.calls) == 1
+    assert all(rec == results[0] for rec in results)
+    # and it was saved in the locations DB
+    assert service.store.get("Ottawa Ontario Canada") == results[0]
+
+
+def post(port, path, body):
+    url = "http://127.0.0.1:{0}{1}".format(port, path)
+    request = urllib.request.Request(url, json.dumps(body).encode("utf8"),
+                                     {"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read().decode("utf8"))
+
+
+def test_http(service):
+    server = make_server(service, port=0)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        reply = post(port, "/geocode",
+                     {"addresses": ["Russia", "Cornwall Ontario Canada"]})
+        (latitude, longitude) = fake_coords("Cornwall Ontario Canada")
+        assert reply["results"]["Cornwall Ontario Canada"]["latitude"] == \
+            latitude
+        assert reply["results"]["Russia"]["address"] == "Russia"
+
+        rows = [["Inst Name", "City", "Prov./state", "Country"],
+                ["Parks", "Cornwall", "Ontario", "Canada"],
+                ["Parks", "Cornwall", "Ontario", "Canada"],
+                ["Hermitage", "", "", "Russia"]]
+        collection = post(port, "/aggregate", {"rows": rows})
+        places = {feature["properties"]["place"]: feature
+                  for feature in collection["features"]}
+        cornwall = places["Cornwall Ontario Canada"]
+        assert cornwall["properties"]["mag"] == 0.2
+        assert cornwall["properties"]["popupContent"] == {"Parks": 2}
+        assert places["Russia"]["properties"]["mag"] == 0.1
+        # Cornwall was only geocoded once, by the first request
+        assert len(service.geocoder.calls) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_bad_requests(service):
+    server = make_server(service, port=0)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        for (path, body) in [("/geocode", ["Russia"]),
+                             ("/geocode", {"addresses": [["Russia"]]}),
+                             ("/geocode", {"addresses": "Russia"}),
+                             ("/aggregate", {"rows": ["Country", "Russia"]}),
+                             ("/aggregate", {"rows": [["Country"], [{}]]})]:
+            with pytest.raises(urllib.error.HTTPError) as err:
+                post(port, path, body)
+            assert err.value.code == 400
+            err.value.close()
+        # and the service carries on
+        assert post(port, "/geocode", {"addresses": ["Russia"]})["results"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_json_store_saved_on_close(tmp_path):
+    loc_fn = str(tmp_path / "loc.json")
+    with open(loc_fn, 'w') as loc_file:
+        json.dump({"Russia": {"latitude": 61.5}}, loc_file)
+    service = GeocodeService(JSONLocationStore(loc_fn), FakeGeocoder(),
+                             rate=None)
+    service.lookup("Ottawa Canada")
+    service.close()
+    with open(loc_fn) as loc_file:
+        assert sorted(json.load(loc_file)) == ["Ottawa Canada", "Russia"]
+
+
+def test_failures_not_looked_up_again(tmp_path):
+    failures_fn = str(tmp_path / "failures.json")
+    service = GeocodeService(SQLiteLocationStore(str(tmp_path / "l.sqlite")),
+                             FakeGeocoder(no_match=["Nowhere"]), rate=None,
+                             failures=FailureCache(failures_fn))
+    assert service.lookup("Nowhere") is None
+    assert service.lookup_many(["Nowhere", "Ottawa Canada"])["Nowhere"] is None
+    assert service.geocoder.calls == ["Nowhere", "Ottawa Canada"]
+    assert service.failures_skipped == 1
+    service.close()
+    # and it is saved for addLatLong and the next service
+    assert FailureCache(failures_fn).is_quarantined("Nowhere")
+
+
+def test_lookups_per_request_and_day(tmp_path):
+    store = SQLiteLocationStore(str(tmp_path / "l.sqlite"))
+    quota_fn = str(tmp_path / "quota.json")
+    service = GeocodeService(store, FakeGeocoder(), workers=1, rate=None,
+                             quota=GeocodeQuota(quota_fn, daily_limit=5),
+                             max_lookups=3)
+    addrs = ["addr %d" % i for i in range(5)]
+    deferred = []
+    found = service.lookup_many(addrs, deferred)
+    assert service.geocoder.calls == addrs[:3]
+    assert deferred == addrs[3:]
+    assert found["addr 4"] is None
+    # the next request has what is left of the day
+    deferred = []
+    service.lookup_many(addrs + ["addr 5"], deferred)
+    assert deferred == ["addr 5"]
+    assert service.stats()["quota_remaining"] == 0
+    service.close()
+    with open(quota_fn) as json_file:
+        assert json.load(json_file)["used"] == 5
+
+
+def test_json_store_saved_after_each_request(tmp_path):
+    loc_fn = str(tmp_path / "loc.json")
+    with open(loc_fn, 'w') as loc_file:
+        json.dump({}, loc_file)
+    service = GeocodeService(JSONLocationStore(loc_fn), FakeGeocoder(),
+                             rate=None,
+                             failures=FailureCache(str(tmp_path / "f.json")),
+                             quota=GeocodeQuota(str(tmp_path / "q.json")))
+    service.lookup_many(["Ottawa Canada", "Oslo Norway"])
+    # saved before the service is closed, so a crash loses nothing
+    with open(loc_fn) as loc_file:
+        assert sorted(json.load(loc_file)) == ["Oslo Norway", "Ottawa Canada"]
+    assert GeocodeQuota(str(tmp_path / "q.json")).used == 2
+    service.close()
+
+
+def test_sigterm_closes_service(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    loc_fn = str(tmp_path / "loc.json")
+    with open(loc_fn, 'w') as loc_file:
+        json.dump({}, loc_file)
+    proc = subprocess.Popen(
+        [sys.executable, "geoservice.py", "--fake-geocoder", "--rate", "0",
+         "--port", str(port), "--locations", loc_fn,
+         "--failures", str(tmp_path / "f.json"),
+         "--quota", str(tmp_path / "q.json")],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.PIPE)
+    try:
+        # wait for it to listen
+        proc.stdout.readline()
+        post(port, "/geocode", {"addresses": ["Ottawa Canada"]})
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(10) == 0
+        proc.stdout.close()
+    with open(loc_fn) as loc_file:
+        assert list(json.load(loc_file)) == ["Ottawa Canada"]
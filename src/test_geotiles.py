@@ -0,0 +1,86 @@
+
+import json
+import os
+import pytest
+import addLatLong
+import geotiles
+from fakegeocoder import FakeGeocoder
+
+all_data = {
+    "Ottawa Ontario Canada": {"latitude": 45.42, "longitude": -75.69,
+                              "address": "Ottawa, ON, Canada",
+                              "magnitude": 3,
+                              "org names": {"Carleton": 3}},
+    "Gatineau Québec Canada": {"latitude": 45.48, "longitude": -75.70,
+                               "address": "Gatineau, QC, Canada",
+                               "magnitude": 1},
+    "Russia": {"latitude": 61.52, "longitude": 105.32,
+               "address": "Russia", "magnitude": 2},
+    "Unused": {"latitude": 1.0, "longitude": 1.0,
+               "address": "Unused", "magnitude": 0},
+}
+
+
+def test_tile_of():
+    assert geotiles.tile_of(0.0, 0.0, 1) == (1, 1)
+    assert geotiles.tile_of(-180.0, 90.0, 3) == (0, 0)
+    assert geotiles.tile_of(180.0, -90.0, 3) == (7, 7)
+    assert geotiles.tile_of(-75.69, 45.42, 8) == (74, 91)
+
+
+def test_quadkey():
+    assert geotiles.quadkey(3, 5, 3) == "213"
+    assert geotiles.quadkey(0, 0, 1) == "0"
+
+
+def test_parents_match_tile_of():
+    pyramid = geotiles.TilePyramid(1, 6)
+    pyramid.add(-75.69, 45.42, "{}")
+    for (zoom, x, y, indexes) in pyramid.tiles():
+        assert (x, y) == geotiles.tile_of(-75.69, 45.42, zoom)
+
+
+def test_write_tiles(tmp_path):
+    out_dir = str(tmp_path / "tiles")
+    pyramid = geotiles.write_tiles(all_data, out_dir, 2, 6)
+    with open(os.path.join(out_dir, "tiles.json")) as manifest_file:
+        manifest = json.load(manifest_file)
+    assert manifest["count"] == 3
+    assert (manifest["minzoom"], manifest["maxzoom"]) == (2, 6)
+    # every zoom level holds every feature once
+    for zoom in range(2, 7):
+        assert sum(count for (key, count) in manifest["tiles"].items()
+                   if len(key) == zoom) == 3
+    assert manifest == pyramid.manifest()
+
+    (x, y) = geotiles.tile_of(-75.69, 45.42, 6)
+    with open(os.path.join(out_dir, "6", str(x), str(y) + ".geojson"),
+              encoding='utf8') as tile_file:
+        tile = json.load(tile_file)
+    places = sorted(feature["properties"]["place"]
+                    for feature in tile["features"])
+    assert places == ["Gatineau, QC, Canada", "Ottawa, ON, Canada"]
+
+
+def test_blank_coords_left_out(tmp_path):
+    data = dict(all_data)
+    data["Blank"] = {"latitude": "", "longitude": "",
+                     "address": "Blank", "magnitude": 5}
+    pyramid = geotiles.TilePyramid(2, 4)
+    pyramid.add_all(data)
+    assert pyramid.manifest()["count"] == 3
+
+
+def test_tile_zooms_checked(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        addLatLong.parse_args(["--tile-zooms", "0", "3"])
+    assert "--tile-zooms" in capsys.readouterr().err
+
+    # and before any lookups are made
+    a1 = addLatLong.AcqInfo(None, None, None, None, None)
+    a1.geocoder = FakeGeocoder()
+    a1.tilesDir = str(tmp_path / "tiles")
+    (a1.tile_minzoom, a1.tile_maxzoom) = (5, 2)
+    with pytest.raises(ValueError):
+        a1.scan_spreadsheet(str(tmp_path / "input.csv"))
+    assert a1.geocoder.calls == []
@@ -0,0 +1,133 @@
+
+import filecmp
+from shutil import copyfile
+import openpyxl
+import pytest
+from incremental import RunState, row_blocks
+
+
+@pytest.fixture
+def run_once(make_acq, tmp_path):
+    ''' scans a workbook once, with the run state kept in tmp_path,
+    giving the magnitude of addr before the DB is written '''
+    def run(xlsx_fn, addr=None):
+        a1 = make_acq(run_state=RunState(str(tmp_path / "state.json")))
+        a1.scan_spreadsheet(xlsx_fn)
+        magnitude = None
+        if addr is not None and a1.all_data is not None:
+            magnitude = a1.all_data[addr]["magnitude"]
+        a1.write_location_DB()
+        a1.save_run_state()
+        return (a1, magnitude)
+    return run
+
+
+def test_row_blocks():
+    rows = [["row %d" % i, "Canada"] for i in range(2000)]
+    blocks = list(row_blocks(["a", []], rows, 100))
+    assert [row for (digest, chunk) in blocks for row in chunk] == rows
+    assert all(25 <= len(chunk) <= 400 for (digest, chunk) in blocks[:-1])
+    # the hash depends on the sheet
+    assert blocks[0][0] != next(row_blocks(["b", []], rows, 100))[0]
+
+    # a row inserted changes the block it is in, not the ones after it
+    inserted = rows[:1000] + [["new", "Canada"]] + rows[1000:]
+    digests = [digest for (digest, chunk) in blocks]
+    again = [digest for (digest, chunk) in row_blocks(["a", []], inserted,
+                                                      100)]
+    assert len(set(digests) - set(again)) == 1
+
+
+def test_rerun_is_skipped(run_once, tmp_path):
+    (first, magnitude) = run_once("testData/test_B_two.xlsx",
+                                  "Ontario Canada")
+    assert first.run_state.blocks_scanned == 1
+    assert magnitude == 2
+    copyfile(str(tmp_path / "counts.json"), str(tmp_path / "first.json"))
+
+    (second, magnitude) = run_once("testData/test_B_two.xlsx")
+    assert second.skipped
+    assert second.all_data is None
+    assert filecmp.cmp(str(tmp_path / "counts.json"),
+                       str(tmp_path / "first.json"), shallow=False)
+
+
+def test_new_output_option_is_written(run_once, make_acq, tmp_path):
+    run_once("testData/test_B_two.xlsx")
+    a1 = make_acq(run_state=RunState(str(tmp_path / "state.json")))
+    a1.coord_precision = 5
+    a1.binFileName = str(tmp_path / "acq.bin")
+    a1.scan_spreadsheet("testData/test_B_two.xlsx")
+    # the input is unchanged, but the outputs are not those of last run
+    assert not a1.skipped
+    assert (tmp_path / "acq.bin").exists()
+    a1.write_location_DB()
+    a1.save_run_state()
+
+    again = make_acq(run_state=RunState(str(tmp_path / "state.json")))
+    again.coord_precision = 5
+    again.binFileName = str(tmp_path / "acq.bin")
+    again.scan_spreadsheet("testData/test_B_two.xlsx")
+    assert again.skipped
+
+
+def test_changed_input_is_rescanned(run_once, tmp_path):
+    run_once("testData/test_B_one.xlsx")
+    (second, magnitude) = run_once("testData/test_B_two.xlsx",
+                                   "Ontario Canada")
+    assert not second.skipped
+    assert second.run_state.blocks_scanned == 1
+    assert magnitude == 2
+    assert filecmp.cmp(str(tmp_path / "counts.json"),
+                       "testData/test_B_twoLocCountsRef.json", shallow=False)
+
+
+def test_unchanged_blocks_are_reused(run_once, tmp_path):
+    run_once("testData/test_C_two.xlsx")
+    # a missing output file means the run cannot be skipped,
+    #   but the unchanged rows need not be extracted again
+    (tmp_path / "counts.json").unlink()
+    (second, magnitude) = run_once("testData/test_C_two.xlsx",
+                                   "Cornwall Ontario Canada")
+    assert not second.skipped
+    assert second.run_state.blocks_reused == 1
+    assert second.run_state.blocks_scanned == 0
+    assert magnitude == 2
+    assert filecmp.cmp(str(tmp_path / "counts.json"),
+                       "testData/test_C_twoLocCountsRef.json", shallow=False)
+
+
+def write_workbook(filename, sheets):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for (title, rows) in sheets:
+        sheet = workbook.create_sheet(title)
+        sheet.append(["Inst Name", "City", "Country"])
+        for row in rows:
+            sheet.append(row)
+    workbook.save(filename)
+
+
+def test_unchanged_sheets_not_read(run_once, make_acq, tmp_path):
+    xlsx_fn = str(tmp_path / "input.xlsx")
+    ottawa = [["Parks", "Ottawa", "Canada"]] * 3
+    write_workbook(xlsx_fn, [("one", ottawa), ("two", ottawa)])
+    run_once(xlsx_fn)
+
+    # the same file: no sheet is opened
+    a1 = make_acq(run_state=RunState(str(tmp_path / "state.json")))
+    a1.reader = "no such reader"
+    (tmp_path / "counts.json").unlink()
+    a1.scan_spreadsheet(xlsx_fn)
+    assert a1.all_data["Ottawa Canada"]["magnitude"] == 6
+    a1.write_location_DB()
+    a1.save_run_state()
+
+    # only the sheet which changed is read
+    write_workbook(xlsx_fn, [("one", ottawa),
+                             ("two", ottawa + [["Parks", "Oslo", "Norway"]])])
+    (second, magnitude) = run_once(xlsx_fn, "Ottawa Canada")
+    assert magnitude == 6
+    assert "Oslo Norway" in second.all_data
+    assert second.run_state.blocks_reused == 1
+    assert second.run_state.blocks_scanned == 1
@@ -0,0 +1,123 @@
+import filecmp
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import addLatLong
+import locationstore
+from fakegeocoder import FakeGeocoder, fake_coords
+
+test_initlocFileName = "testData/testInitLoc.json"
+
+
+def new_sqlite_store(tmp_path):
+    store = locationstore.SQLiteLocationStore(str(tmp_path / "loc.sqlite"))
+    store.import_json(test_initlocFileName)
+    return store
+
+
+def test_import_export_round_trip(tmp_path):
+    store = new_sqlite_store(tmp_path)
+    assert store.get("Russia") == {"latitude": 61.52401,
+                                   "longitude": 105.318756,
+                                   "address": "Russia"}
+    assert store.get("Atlantis") is None
+    assert set(store.get_many(["Russia", "Atlantis"])) == {"Russia"}
+
+    exported = str(tmp_path / "loc.json")
+    assert store.export_json(exported) == 7
+    assert filecmp.cmp(exported, test_initlocFileName, shallow=False)
+    store.close()
+
+
+def test_scan_with_sqlite_store(tmp_path):
+    new_sqlite_store(tmp_path).close()
+    a1 = addLatLong.AcqInfo(str(tmp_path / "loc.sqlite"),
+                            str(tmp_path / "counts.json"),
+                            str(tmp_path / "counts.geojson"),
+                            str(tmp_path / "inst.json"),
+                            str(tmp_path / "inst.geojson"))
+    a1.locExportFileName = str(tmp_path / "loc.json")
+    a1.geocoder = FakeGeocoder()
+
+    a1.scan_spreadsheet("testData/test_C_one.xlsx")
+    # only the addresses in the spreadsheet are read from the DB
+    assert list(a1.all_data) == ["Cornwall Ontario Canada"]
+    assert a1.all_data["Cornwall Ontario Canada"]["magnitude"] == 1
+    assert a1.all_data["Cornwall Ontario Canada"]["latitude"] == 45.0212762
+    assert a1.geocoder.calls == []
+    a1.write_location_DB()
+    assert filecmp.cmp(str(tmp_path / "loc.json"),
+                       test_initlocFileName, shallow=False)
+
+
+def test_geocodes_are_committed(tmp_path):
+    new_sqlite_store(tmp_path).close()
+    a1 = addLatLong.AcqInfo(str(tmp_path / "loc.sqlite"),
+                            None, None, None, None)
+    a1.open_location_store()
+    a1.all_data = {"Ottawa Canada": {"magnitude": 1}}
+    a1.geocoder = FakeGeocoder()
+    a1.get_info()
+
+    other = locationstore.SQLiteLocationStore(str(tmp_path / "loc.sqlite"))
+    rec = other.get("Ottawa Canada")
+    assert (rec["latitude"], rec["longitude"]) == fake_coords("Ottawa Canada")
+
+
+def new_json_store(tmp_path):
+    filename = str(tmp_path / "loc.json")
+    shutil.copyfile(test_initlocFileName, filename)
+    return locationstore.JSONLocationStore(filename)
+
+
+def test_json_writers_merge(tmp_path):
+    first = new_json_store(tmp_path)
+    second = locationstore.JSONLocationStore(first.filename)
+    ours = dict(first.load_all())
+    theirs = dict(second.load_all())
+    ours["Ottawa Canada"] = {"latitude": 45.4, "longitude": -75.7}
+    theirs["Oslo Norway"] = {"latitude": 59.9, "longitude": 10.7}
+    second.save_all(theirs)
+    # the first writer keeps the second one's new address
+    first.save_all(ours)
+
+    with open(first.filename) as json_file:
+        saved = json.load(json_file)
+    assert list(saved)[-2:] == ["Ottawa Canada", "Oslo Norway"]
+    assert len(saved) == 9
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_merge_records():
+    loaded = {"a": {}, "b": {"latitude": 1}, "c": {"latitude": 2}}
+    on_disk = {"a": {"latitude": 3}, "b": {"latitude": 4},
+               "c": {"latitude": 5}, "d": {"latitude": 6}}
+    ours = {"a": {}, "b": {"latitude": 1}, "c": {"latitude": 7}}
+    merged = locationstore.merge_records(ours, loaded, on_disk)
+    # an address this process could not locate, or did not change, is
+    # taken from disk; its own new geocode is kept
+    assert merged == {"a": {"latitude": 3}, "b": {"latitude": 4},
+                      "c": {"latitude": 7}, "d": {"latitude": 6}}
+    assert locationstore.merge_records(ours, loaded, loaded) is ours
+
+
+def add_locations(job):
+    (filename, prefix) = job
+    store = locationstore.JSONLocationStore(filename)
+    for i in range(5):
+        all_data = dict(store.load_all())
+        all_data["{0} {1}".format(prefix, i)] = {"latitude": float(i),
+                                                 "longitude": 0.0}
+        store.save_all(all_data)
+
+
+def test_json_writers_in_parallel(tmp_path):
+    filename = new_json_store(tmp_path).filename
+    prefixes = ["first", "second", "third", "fourth"]
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        list(pool.map(add_locations, [(filename, p) for p in prefixes]))
+
+    with open(filename) as json_file:
+        saved = json.load(json_file)
+    assert len(saved) == 7 + 4 * 5
+    assert all("{0} 4".format(p) in saved for p in prefixes)
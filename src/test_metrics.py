@@ -0,0 +1,59 @@
+
+import json
+from fakegeocoder import FakeGeocoder
+from metrics import Histogram, Metrics, NULL_METRICS
+
+
+def test_histogram_buckets():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    report = histogram.report()
+    assert report["count"] == 4
+    assert report["max"] == 3.0
+    assert [count for (label, count) in report["buckets"]] == [2, 1, 1]
+
+
+def test_phases_add_up():
+    metrics = Metrics()
+    for i in range(3):
+        with metrics.phase("read"):
+            pass
+    metrics.count("rows scanned", 5)
+    metrics.count("rows scanned", 2)
+    report = metrics.report()
+    assert report["phases"]["read"] >= 0.0
+    assert report["counters"]["rows scanned"] == 7
+
+
+def test_null_metrics_do_nothing():
+    with NULL_METRICS.phase("read"):
+        NULL_METRICS.count("rows scanned")
+        NULL_METRICS.observe("geocoder seconds", 1.0)
+    assert not NULL_METRICS.enabled
+
+
+def test_run_metrics(make_acq, tmp_path):
+    # an empty locations DB, so the address is looked up
+    with open(str(tmp_path / "loc.json"), 'w') as loc_file:
+        loc_file.write("{}")
+    a1 = make_acq(geocoder=FakeGeocoder(failures={"Ontario Canada": 1}),
+                  geocode_rate=None,
+                  metrics=Metrics())
+    a1.scan_spreadsheet("testData/test_B_two.xlsx")
+    a1.write_location_DB()
+    metrics_fn = str(tmp_path / "metrics.json")
+    a1.metrics.write(metrics_fn)
+
+    with open(metrics_fn) as json_file:
+        report = json.load(json_file)
+    counters = report["counters"]
+    assert counters["rows scanned"] == 2
+    assert counters["unique addresses"] == 1
+    assert counters["locations DB misses"] == 1
+    assert counters["geocoder calls"] == 2
+    assert counters["geocoder retries"] == 1
+    assert counters["output bytes"] > 0
+    assert report["histograms"]["geocoder seconds"]["count"] == 1
+    for phase in ("read", "geocode", "write outputs", "write locations"):
+        assert phase in report["phases"]
@@ -0,0 +1,37 @@
+
+import gzip
+import precompress
+
+
+def test_gzip_copy(tmp_path):
+    filename = str(tmp_path / "a.geojson")
+    data = b'{"type":"FeatureCollection","features":[]}' * 100
+    with open(filename, 'wb') as out_file:
+        out_file.write(data)
+    sizes = precompress.precompress(filename)
+    assert sizes[""] == len(data)
+    assert sizes[".gz"] < len(data)
+    with gzip.open(filename + ".gz") as gz_file:
+        assert gz_file.read() == data
+    # the copy is the same on every run
+    first = open(filename + ".gz", 'rb').read()
+    precompress.precompress(filename)
+    assert open(filename + ".gz", 'rb').read() == first
+    lines = precompress.report(filename, sizes)
+    assert lines[1].split()[0] == ".gz"
+
+
+def test_stale_copies_removed(tmp_path):
+    filename = str(tmp_path / "a.geojson")
+    with open(filename, 'wb') as out_file:
+        out_file.write(b'{}')
+    # a .br left by a run which had brotli
+    with open(filename + ".br", 'wb') as br_file:
+        br_file.write(b'old')
+    sizes = precompress.precompress(filename)
+    assert (tmp_path / "a.geojson.br").exists() == (".br" in sizes)
+
+    removed = precompress.remove_stale(filename)
+    assert removed == [filename + ".gz"] + ([filename + ".br"]
+                                            if ".br" in sizes else [])
+    assert not (tmp_path / "a.geojson.gz").exists()
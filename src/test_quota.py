@@ -0,0 +1,95 @@
+import json
+import addLatLong
+import quota
+from fakegeocoder import FakeGeocoder
+
+DAY = 86400.0
+
+
+class Clock:
+    def __init__(self):
+        # noon, so a day later is another date in any time zone
+        self.now = 1577880000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_order_pending():
+    all_data = {"one": {"magnitude": 1}, "big": {"magnitude": 400},
+                "old": {"magnitude": 1}, "other": {"magnitude": 1}}
+    waiting = {"one": 20.0, "old": 10.0}
+    assert quota.order_pending(list(all_data), all_data, waiting) == [
+        "big", "old", "one", "other"]
+
+
+def test_daily_limit_over_runs(tmp_path):
+    clock = Clock()
+    filename = str(tmp_path / "quota.json")
+    first = quota.GeocodeQuota(filename, daily_limit=25, clock=clock)
+    assert first.budget(10) == 10
+    first.use(10)
+    first.save()
+    # another run the same day, started before the first saved
+    second = quota.GeocodeQuota(filename, daily_limit=25, clock=clock)
+    second.use(12)
+    second.save()
+    assert second.used == 22
+
+    third = quota.GeocodeQuota(filename, daily_limit=25, clock=clock)
+    assert third.budget(10) == 3
+    assert third.projection(40, 10) == {"remaining": 40, "runs": 4,
+                                        "days": 2}
+    clock.now += DAY
+    assert quota.GeocodeQuota(filename, 25, clock=clock).budget(10) == 10
+    # a service started yesterday has the new day's limit too
+    assert third.remaining_today() == 25
+    third.use(3)
+    third.save()
+    assert third.used == 3
+
+
+def test_get_info_most_used_first(tmp_path):
+    a1 = addLatLong.AcqInfo(None, None, None, None, None)
+    a1.all_data = {"addr %d" % i: {"magnitude": i % 7} for i in range(30)}
+    a1.geocoder = FakeGeocoder()
+    a1.geocode_workers = 1
+    a1.geocode_limit = 5
+    a1.geocode_daily_limit = 8
+    a1.quotaFileName = str(tmp_path / "quota.json")
+    a1.get_info()
+    assert a1.geocoder.calls == ["addr 6", "addr 13", "addr 20", "addr 27",
+                                 "addr 5"]
+
+    a2 = addLatLong.AcqInfo(None, None, None, None, None)
+    a2.all_data = a1.all_data
+    a2.geocoder = FakeGeocoder()
+    a2.geocode_limit = 5
+    a2.geocode_daily_limit = 8
+    a2.quotaFileName = a1.quotaFileName
+    a2.get_info()
+    # only what is left of the day
+    assert a2.geocoder.calls == ["addr 12", "addr 19", "addr 26"]
+    with open(a1.quotaFileName) as json_file:
+        state = json.load(json_file)
+    assert state["used"] == 8
+    # the located addresses stop waiting
+    assert len(state["waiting"]) == 30 - 8
+
+
+def test_waiting_merged_over_runs(tmp_path):
+    clock = Clock()
+    filename = str(tmp_path / "quota.json")
+    first = quota.GeocodeQuota(filename, clock=clock)
+    second = quota.GeocodeQuota(filename, clock=clock)
+    first.note_waiting(["a", "b"])
+    clock.now += 60
+    second.note_waiting(["b", "c"], seen=["a", "b", "c"])
+    first.save()
+    # a, located by the second run, is dropped; b keeps the first start
+    second.save()
+    start = clock.now - 60
+    assert second.waiting == {"b": start, "c": clock.now}
+    # and a service which read the file at start does not wipe it out
+    first.save()
+    assert quota.GeocodeQuota(filename).waiting == second.waiting
@@ -0,0 +1,70 @@
+import json
+import threading
+import pytest
+from records import LocRecord, SMALL_ORG_COUNTS
+from records import OrgNameTable, org_name_table, record_class
+
+
+def test_reads_like_a_dict():
+    geo_loc = {"latitude": 61.52401, "longitude": 105.318756,
+               "address": "Russia", "place_id": "xyz"}
+    rec = LocRecord.from_dict(geo_loc)
+    assert dict(rec.items()) == geo_loc
+    assert "latitude" in rec and "magnitude" not in rec
+    assert rec.get("magnitude") is None
+    with pytest.raises(KeyError):
+        rec["magnitude"]
+
+    rec["magnitude"] = 0
+    rec["magnitude"] += 1
+    assert rec.pop("magnitude") == 1
+    assert rec.pop("org names", None) is None
+    assert json.dumps(dict(rec.items())) == json.dumps(geo_loc)
+
+
+def test_org_names():
+    rec = LocRecord()
+    for name in ["Parks Canada", "", "Parks Canada"]:
+        rec.add_org_name(name)
+    assert rec["org names"] == {"Parks Canada": 2, "": 1}
+
+    # many org names move from the small list to a dict, in the same order
+    names = ["Org {0}".format(i) for i in range(SMALL_ORG_COUNTS + 3)]
+    for name in names:
+        rec.add_org_name(name)
+    rec.add_org_name("Org 0")
+    assert list(rec["org names"]) == ["Parks Canada", ""] + names
+    assert rec["org names"]["Org 0"] == 2
+
+    rec["org names"] = {"Parks Russia": 1}
+    assert rec["org names"] == {"Parks Russia": 1}
+
+
+def test_org_name_ids_across_threads():
+    table = OrgNameTable()
+    barrier = threading.Barrier(8)
+
+    def add(i):
+        barrier.wait()
+        for n in range(200):
+            table.id_of("org {0}".format((n * (i + 1)) % 300))
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # every name has its own id
+    assert len(set(table.names)) == len(table.names) == len(table.ids)
+    assert all(table.names[org_id] == name
+               for (name, org_id) in table.ids.items())
+
+
+def test_record_class_has_own_table():
+    table = OrgNameTable()
+    Record = record_class(table)
+    rec = Record()
+    rec.add_org_name("only in this table", 2)
+    assert rec["org names"] == {"only in this table": 2}
+    assert table.names == ["only in this table"]
+    assert "only in this table" not in org_name_table.ids
+    assert isinstance(rec, LocRecord)
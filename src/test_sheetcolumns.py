@@ -0,0 +1,61 @@
+import sheetcolumns
+
+
+def test_join_addresses():
+    # columns are city, prov, country in spreadsheet order
+    columns = [["Cornwall", "", "St. Petersburg"],
+               ["Ontario", "Ontario", ""],
+               ["Canada", "Canada", "Russia"]]
+    addrs = sheetcolumns.join_addresses(columns, 3)
+    assert addrs == ["Cornwall Ontario Canada",
+                     "Ontario Canada",
+                     "St. Petersburg  Russia"]
+
+
+def test_join_addresses_number_cell():
+    # a numeric cell ends the address, as the per-cell reader did
+    columns = [["Cornwall"], [1867.0], ["Canada"]]
+    assert sheetcolumns.join_addresses(columns, 1) == ["Cornwall"]
+
+
+def test_join_org_names():
+    depts = ["Biology", "", "Geology"]
+    names = ["Parks Russia", "Parks Canada", ""]
+    assert sheetcolumns.join_org_names(depts, names, True, 3) == \
+        ["Biology, Parks Russia", "Parks Canada", "Geology, "]
+    assert sheetcolumns.join_org_names(None, names, True, 3) == \
+        ["Parks Russia", "Parks Canada", ""]
+
+
+def test_classify_header():
+    hdr = ["Inst Dept", "Inst Name", "City/town", "Province", "Country",
+           "Latitude", "Longitude", 1993.0]
+    (addrCols, orgCols, coordsCols) = sheetcolumns.classify_header(hdr)
+    assert addrCols == (None, 2, 3, 4)
+    assert orgCols == (0, 1)
+    assert coordsCols == (5, 6)
+
+    # a lone Latitude is not enough for coords
+    assert sheetcolumns.classify_header(["Country", "Latitude"]) == \
+        ((None, None, None, 0), None, None)
+
+
+def test_find_header_window():
+    rows = [["Acquisitions since 1993"], [""],
+            ["Inst Name", "Country"], ["x", "Russia"]]
+    data = iter(rows)
+    assert sheetcolumns.find_header(data) == (2, (None, None, None, 1),
+                                              (None, 0), None)
+    # the rows are left at the first data row
+    assert next(data) == ["x", "Russia"]
+    # the header is past the search window, so the sheet is skipped
+    assert sheetcolumns.find_header(iter(rows), max_rows=2) is None
+
+
+def test_chunks_and_columns():
+    rows = iter([["a", 1.0], ["b"], ["c", 3.0]])
+    chunks = list(sheetcolumns.row_chunks(rows, 2))
+    assert len(chunks) == 2
+    # short rows read as blank cells
+    assert sheetcolumns.column_values(chunks[0], 1) == [1.0, ""]
+    assert sheetcolumns.column_values(chunks[1], None) is None
@@ -0,0 +1,56 @@
+import filecmp
+import glob
+from shutil import copyfile
+import pytest
+import addLatLong
+import sheetreader
+import synthdata
+
+
+def all_rows(filename, reader):
+    wb = sheetreader.open_reader(filename, reader)
+    sheets = [(sheet.name, list(sheet.iter_rows())) for sheet in wb.sheets()]
+    wb.close()
+    return sheets
+
+
+@pytest.mark.parametrize("filename", sorted(glob.glob("testData/*.xlsx")))
+def test_streaming_reader_matches_xlrd(filename):
+    pytest.importorskip("openpyxl")
+    assert all_rows(filename, "openpyxl") == all_rows(filename, "xlrd")
+
+
+def test_auto_reader():
+    pytest.importorskip("openpyxl")
+    wb = sheetreader.open_reader("testData/test_A_one.xlsx")
+    assert isinstance(wb, sheetreader.OpenpyxlReader)
+    wb.close()
+
+
+@pytest.mark.parametrize("suffix", ["csv", "parquet"])
+def test_csv_and_parquet_inputs(tmp_path, suffix):
+    if suffix == "parquet":
+        pytest.importorskip("pyarrow")
+    # the same rows as the xlsx test file, in another format
+    ((name, rows),) = all_rows("testData/test_C_two.xlsx", "xlrd")
+    # parquet columns need distinct names and one type each
+    rows[0] = ["{0} {1}".format(hdr, i) if hdr == " " else hdr
+               for (i, hdr) in enumerate(rows[0])]
+    rows[1:] = [[str(cell) for cell in row] for row in rows[1:]]
+    filename = str(tmp_path / ("input." + suffix))
+    if suffix == "csv":
+        synthdata.write_csv(filename, rows)
+    else:
+        synthdata.write_parquet(filename, rows)
+
+    copyfile("testData/testInitLoc.json", str(tmp_path / "loc.json"))
+    a1 = addLatLong.AcqInfo(str(tmp_path / "loc.json"),
+                            str(tmp_path / "counts.json"),
+                            str(tmp_path / "counts.geojson"),
+                            str(tmp_path / "inst.json"),
+                            str(tmp_path / "inst.geojson"))
+    a1.scan_spreadsheet(filename)
+    assert filecmp.cmp(str(tmp_path / "counts.json"),
+                       "testData/test_C_twoLocCountsRef.json", shallow=False)
+    assert filecmp.cmp(str(tmp_path / "inst.json"),
+                       "testData/test_C_twoLocInstRef.json", shallow=False)
@@ -0,0 +1,47 @@
+
+import filecmp
+import os
+from shutil import copyfile
+from watch import Watcher
+
+
+def make_watcher(make_acq, tmp_path):
+    input_fn = str(tmp_path / "input.xlsx")
+    copyfile("testData/test_B_one.xlsx", input_fn)
+    return Watcher(make_acq, input_fn, settle=0.0, sleep=lambda s: None)
+
+
+def save_input(tmp_path, xlsx_fn, mtime):
+    input_fn = str(tmp_path / "input.xlsx")
+    copyfile(xlsx_fn, input_fn)
+    os.utime(input_fn, (mtime, mtime))
+
+
+def test_rebuilds_on_save(make_acq, tmp_path):
+    watcher = make_watcher(make_acq, tmp_path)
+    watcher.run(max_rebuilds=1)
+    assert filecmp.cmp(str(tmp_path / "counts.json"),
+                       "testData/test_B_oneLocCountsRef.json", shallow=False)
+    store = watcher.location_store
+    assert watcher.last_latency is not None
+
+    # nothing saved since, so nothing to do
+    assert not watcher.poll()
+
+    save_input(tmp_path, "testData/test_B_two.xlsx", 1600000000)
+    assert watcher.poll()
+    assert watcher.rebuilds == 2
+    assert filecmp.cmp(str(tmp_path / "counts.json"),
+                       "testData/test_B_twoLocCountsRef.json", shallow=False)
+    # the same location store was used again
+    assert watcher.location_store is store
+
+
+def test_bad_save_keeps_watching(make_acq, tmp_path):
+    watcher = make_watcher(make_acq, tmp_path)
+    watcher.run(max_rebuilds=1)
+    with open(str(tmp_path / "input.xlsx"), 'wb') as bad_file:
+        bad_file.write(b"not a workbook")
+    assert not watcher.poll()
+    save_input(tmp_path, "testData/test_B_two.xlsx", 1600000000)
+    assert watcher.poll()
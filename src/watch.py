@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Watch the input workbook, and rebuild the outputs each time it is saved.
+  the input is polled for a new size or mtime, and read once the save
+    has settled
+  between rebuilds the locations DB, the gazetteer, the geocoder and
+    the counts of each block of rows (see incremental.py) stay in
+    memory, so only the changed rows are read again and the outputs
+    are only written when the counts change
+  each rebuild reports the time from the save to the updated outputs
+"""
+
+__author__ = "Richard Leir"
+__copyright__ = "Copyright 2019, Richard Leir"
+__credits__ = ["Sean Tudor", "Mike Bostock"]
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Richard Leir"
+__email__ = "rleir at leirtech ddot com"
+__status__ = "Production"
+
+from typing import Dict, Optional
+import time
+from incremental import RunState, file_stamp
+
+default_interval = 1.0   # seconds between polls
+default_settle = 0.5     # seconds the input must be unchanged to be read
+
+
+class Watcher:
+    ''' rebuilds with a new AcqInfo from make_acq whenever input changes '''
+
+    def __init__(self, make_acq, input_filename,
+                 interval=default_interval, settle=default_settle,
+                 state_filename=None, sleep=time.sleep):
+        self.make_acq = make_acq
+        self.input_filename = input_filename
+        self.interval = interval
+        self.settle = settle
+        self.state_filename = state_filename
+        self.sleep = sleep
+        self.stamp = None
+        self.last_state = None  # type: Optional[Dict]
+        # kept warm between rebuilds
+        self.location_store = None
+        self.gazetteer = None
+        self.geocoder = None
+        self.rebuilds = 0
+        self.last_latency = None  # type: Optional[float]
+
+    def changed(self) -> bool:
+        ''' has the input been saved since the last rebuild '''
+        stamp = file_stamp(self.input_filename)
+        if stamp is None or stamp == self.stamp:
+            return False
+        # a save in progress keeps changing the file, wait for it to end
+        self.sleep(self.settle)
+        if file_stamp(self.input_filename) != stamp:
+            return False
+        self.stamp = stamp
+        return True
+
+    def rebuild(self) -> None:
+        started = time.time()
+        acq = self.make_acq()
+        if self.location_store is not None:
+            acq.location_store = self.location_store
+        if self.gazetteer is not None:
+            acq.gazetteer = self.gazetteer
+        if self.geocoder is not None:
+            acq.geocoder = self.geocoder
+        acq.run_state = RunState(self.state_filename, self.last_state)
+
+        acq.scan_spreadsheet(self.input_filename)
+        acq.write_location_DB()
+        acq.save_run_state()
+
+        if acq.run_state.saved is not None:
+            self.last_state = acq.run_state.saved
+        self.location_store = acq.location_store
+        self.gazetteer = acq.gazetteer
+        self.geocoder = acq.geocoder
+        self.rebuilds += 1
+
+        done = time.time()
+        # the stamp is the size and mtime in ns of the input
+        self.last_latency = done - self.stamp[1] / 1e9
+        print("rebuilt in {0:.3f}s, {1:.3f}s after the save".format(
+            done - started, self.last_latency))
+
+    def poll(self) -> bool:
+        ''' rebuild if the input changed, returns whether it did '''
+        if not self.changed():
+            return False
+        try:
+            self.rebuild()
+        except Exception as err:
+            # a bad save should not stop the watch, the next one may do
+            print("rebuild failed: {0}".format(err))
+            return False
+        return True
+
+    def run(self, max_rebuilds=None) -> None:
+        print("watching {0}, ^C to stop".format(self.input_filename))
+        try:
+            while max_rebuilds is None or self.rebuilds < max_rebuilds:
+                if not self.poll():
+                    self.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass